@@ -1,8 +1,327 @@
-import whisper
-import torch
-
-def transcribe_audio(audio_file, model_size="small"):
-    model = whisper.load_model(model_size)  # Escolha: tiny, base, small, medium, large
-    model = model.to(dtype=torch.float32)  # Converte os pesos do modelo para FP32
-    result = model.transcribe(audio_file)
-    return result["text"]
\ No newline at end of file
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lazy import lazy_import
+from tracing import span
+from vad import make_vad
+
+# whisper e torch levam segundos para importar; só são carregados quando um modelo é usado
+whisper = lazy_import("whisper")
+torch = lazy_import("torch")
+
+# Registro de modelos carregados no processo, chaveado por (tamanho, device, dtype).
+# A ordem do OrderedDict é a ordem de uso (o último é o mais recente).
+_MODEL_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_LOAD_LOCKS = {}
+
+# Limites do cache: quantidade máxima de modelos residentes e memória máxima (em bytes).
+# None desativa o limite correspondente.
+_MAX_MODELS = 2
+_MAX_BYTES = None
+
+
+def set_cache_limits(max_models=2, max_bytes=None):
+    """
+    Configura os limites do cache de modelos e descarta o excedente imediatamente.
+
+    Parâmetros:
+     - max_models: Quantidade máxima de modelos mantidos em memória (None = sem limite).
+     - max_bytes: Soma máxima do tamanho dos pesos em bytes (None = sem limite).
+    """
+    global _MAX_MODELS, _MAX_BYTES
+    with _CACHE_LOCK:
+        _MAX_MODELS = max_models
+        _MAX_BYTES = max_bytes
+        _evict_locked()
+
+
+def _default_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _model_bytes(model):
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+def _evict_locked():
+    # Remove os modelos menos usados até respeitar os limites; o mais recente nunca é removido.
+    while len(_MODEL_CACHE) > 1:
+        over_count = _MAX_MODELS is not None and len(_MODEL_CACHE) > _MAX_MODELS
+        over_bytes = _MAX_BYTES is not None and sum(size for _, size in _MODEL_CACHE.values()) > _MAX_BYTES
+        if not (over_count or over_bytes):
+            break
+        _MODEL_CACHE.popitem(last=False)
+
+
+def get_model(model_size="small", device=None, dtype=None):
+    """
+    Retorna o modelo Whisper correspondente, carregando-o apenas na primeira chamada.
+
+    Parâmetros:
+     - model_size: tiny, base, small, medium ou large.
+     - device: "cpu" ou "cuda". Se None, usa CUDA quando disponível.
+     - dtype: Tipo dos pesos do modelo (padrão torch.float32).
+    """
+    if device is None:
+        device = _default_device()
+    if dtype is None:
+        dtype = torch.float32
+    key = (model_size, str(device), dtype)
+
+    with _CACHE_LOCK:
+        if key in _MODEL_CACHE:
+            _MODEL_CACHE.move_to_end(key)
+            return _MODEL_CACHE[key][0]
+        load_lock = _LOAD_LOCKS.setdefault(key, threading.Lock())
+
+    # Um lock por chave evita que duas threads carreguem o mesmo modelo em paralelo
+    with load_lock:
+        with _CACHE_LOCK:
+            if key in _MODEL_CACHE:
+                _MODEL_CACHE.move_to_end(key)
+                return _MODEL_CACHE[key][0]
+
+        model = whisper.load_model(model_size, device=device)
+        model = model.to(dtype=dtype)
+
+        with _CACHE_LOCK:
+            _MODEL_CACHE[key] = (model, _model_bytes(model))
+            _evict_locked()
+    return model
+
+
+def preload_models(model_sizes=("small",), device=None, dtype=None):
+    """
+    Carrega os modelos em uma thread de fundo (daemon) e retorna a thread.
+    """
+    if isinstance(model_sizes, str):
+        model_sizes = (model_sizes,)
+
+    def _load():
+        for size in model_sizes:
+            try:
+                get_model(size, device=device, dtype=dtype)
+            except Exception as e:
+                print(f"Erro ao pré-carregar o modelo Whisper '{size}': {e}")
+
+    thread = threading.Thread(target=_load, name="whisper-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def clear_model_cache():
+    """Descarta todos os modelos carregados."""
+    with _CACHE_LOCK:
+        _MODEL_CACHE.clear()
+        _LOAD_LOCKS.clear()
+
+
+def cached_models():
+    """Lista as chaves (tamanho, device, dtype) dos modelos residentes, do menos ao mais recente."""
+    with _CACHE_LOCK:
+        return list(_MODEL_CACHE.keys())
+
+
+def transcribe_audio(audio_file, model_size="small", device=None):
+    # audio_file pode ser o caminho de um arquivo ou um array float32 mono a 16 kHz (ver readMic.to_whisper_input)
+    with span("stt", "transcribe_audio", model_size=model_size) as s:
+        model = get_model(model_size, device=device)  # Escolha: tiny, base, small, medium, large
+        result = model.transcribe(audio_file)
+        if not isinstance(audio_file, str):
+            s.set(audio_s=len(audio_file) / 16000)
+        return result["text"]
+
+
+# --- Transcrição de áudio longo -------------------------------------------------------------------------------
+
+SAMPLE_RATE = 16000
+# O Whisper decodifica janelas de até 30 s; janelas maiores seriam cortadas pelo próprio modelo
+MAX_WINDOW_S = 30.0
+
+_FASTER_WHISPER_MODELS = {}
+# Threads por processo do pool de decodificação (0 = padrão da biblioteca)
+_WORKER_THREADS = 0
+
+
+def load_audio(audio_file):
+    """Caminho de arquivo (decodificado pelo ffmpeg do whisper) ou array -> array float32 mono a 16 kHz."""
+    if isinstance(audio_file, str):
+        return whisper.load_audio(audio_file)
+    return np.asarray(audio_file, dtype=np.float32).reshape(-1)
+
+
+def split_on_silence(audio, sample_rate=SAMPLE_RATE, window_s=MAX_WINDOW_S, overlap_s=1.0, min_silence_ms=300,
+                     frame_ms=30):
+    """
+    Divide o áudio em janelas (início, fim), em amostras, de até window_s segundos cortadas no silêncio mais
+    longo da segunda metade; cada janela começa overlap_s antes do corte anterior.
+    """
+    window = int(window_s * sample_rate)
+    overlap = int(overlap_s * sample_rate)
+    if len(audio) <= window:
+        return [(0, len(audio))]
+
+    vad = make_vad(sample_rate, frame_ms, backend="energy")
+    frame = vad.frame_length
+    speech = np.array([vad.is_speech(audio[i:i + frame]) for i in range(0, len(audio) - frame + 1, frame)])
+    min_silence = max(1, int(min_silence_ms / frame_ms))
+
+    windows = []
+    start = 0
+    while start + window < len(audio):
+        # Procura, em quadros, o trecho de silêncio mais longo entre a metade e o fim da janela
+        first, last = (start + window // 2) // frame, (start + window) // frame
+        best, run_start = None, None
+        for f in range(first, min(last, len(speech)) + 1):
+            silent = f < last and f < len(speech) and not speech[f]
+            if silent and run_start is None:
+                run_start = f
+            elif not silent and run_start is not None:
+                if f - run_start >= min_silence and (best is None or f - run_start >= best[1] - best[0]):
+                    best = (run_start, f)
+                run_start = None
+        end = (best[0] + best[1]) // 2 * frame if best else start + window
+        windows.append((start, end))
+        start = max(end - overlap, start + 1)
+    windows.append((start, len(audio)))
+    return windows
+
+
+def _init_worker(threads):
+    # Cada processo usa poucas threads; o paralelismo vem da quantidade de processos
+    global _WORKER_THREADS
+    _WORKER_THREADS = threads
+
+
+def _decode_whisper(audio, model_size, language, device):
+    # Roda nos processos do pool: o get_model guarda o modelo no cache de cada processo
+    if _WORKER_THREADS:
+        torch.set_num_threads(_WORKER_THREADS)
+    model = get_model(model_size, device=device)
+    result = model.transcribe(audio, language=language, condition_on_previous_text=False,
+                              fp16=str(device).startswith("cuda"))
+    return [(s["start"], s["end"], s["text"]) for s in result["segments"]]
+
+
+def _decode_faster_whisper(audio, model_size, language, device):
+    # Backend quantizado (int8) em CPU, opcional: pip install faster-whisper
+    model = _FASTER_WHISPER_MODELS.get(model_size)
+    if model is None:
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError("faster-whisper não está instalado. Use 'pip install faster-whisper' "
+                              "ou o backend 'whisper'.")
+        model = _FASTER_WHISPER_MODELS[model_size] = WhisperModel(
+            model_size, device=device or "cpu", compute_type="int8",
+            cpu_threads=_WORKER_THREADS or 0)
+    segments, _ = model.transcribe(audio, language=language, beam_size=1, condition_on_previous_text=False)
+    return [(s.start, s.end, s.text) for s in segments]
+
+
+_DECODERS = {
+    "whisper": _decode_whisper,
+    "faster-whisper": _decode_faster_whisper,
+}
+
+
+def _merge_overlap(previous, text, max_words=8):
+    """Remove do começo de text as palavras (ao menos 2) que repetem o fim de previous, vindas da sobreposição."""
+    normalize = lambda w: w.strip(".,;:!?\"'").lower()
+    prev_words = [normalize(w) for w in previous.split()[-max_words:]]
+    words = text.split()
+    for n in range(min(max_words, len(prev_words), len(words)), 1, -1):
+        if prev_words[-n:] == [normalize(w) for w in words[:n]]:
+            return " ".join(words[n:])
+    return text.strip()
+
+
+def _ordered_results(executor, decode, chunks, args, ahead):
+    # Mantém até `ahead` janelas decodificando e devolve os resultados na ordem das janelas
+    if executor is None:
+        for chunk in chunks:
+            yield decode(chunk, *args)
+        return
+    pending = []
+    chunks = iter(chunks)
+    for chunk in chunks:
+        pending.append(executor.submit(decode, chunk, *args))
+        if len(pending) >= ahead:
+            break
+    while pending:
+        result = pending.pop(0).result()
+        for chunk in chunks:
+            pending.append(executor.submit(decode, chunk, *args))
+            break
+        yield result
+
+
+def transcribe_long(audio_file, model_size="small", backend="whisper", workers=None, window_s=MAX_WINDOW_S,
+                    overlap_s=1.0, language=None, device=None):
+    """
+    Transcreve áudio longo em janelas cortadas nos silêncios, decodificadas em paralelo por processos.
+    Gera, na ordem do áudio, um dict por janela com "start", "end", "text" e "transcript" (texto acumulado).
+
+    Parâmetros:
+     - audio_file: Caminho do arquivo ou array float32 mono a 16 kHz.
+     - model_size: tiny, base, small, medium ou large.
+     - backend: "whisper" ou "faster-whisper" (int8 em CPU, opcional).
+     - workers: Processos decodificando (None = metade dos núcleos, 0 = nenhum); exige o guard de __main__.
+     - window_s: Duração máxima de cada janela, em segundos.
+     - overlap_s: Sobreposição entre janelas vizinhas, em segundos.
+     - language: Idioma falado (ex.: "pt"). Se None, detectado em cada janela.
+     - device: "cpu" ou "cuda". Se None, usa CUDA quando disponível (só no backend whisper).
+    """
+    if backend not in _DECODERS:
+        raise ValueError(f"Backend desconhecido: {backend}. Use um de {', '.join(_DECODERS)}.")
+    if device is None:
+        device = _default_device() if backend == "whisper" else "cpu"
+    if workers is None:
+        workers = 0 if str(device).startswith("cuda") else min(4, max(1, (os.cpu_count() or 2) // 2))
+
+    audio = load_audio(audio_file)
+    windows = split_on_silence(audio, SAMPLE_RATE, window_s, overlap_s)
+    # Cada janela fica com os segmentos que terminam de ser falados antes do meio da sobreposição com a seguinte
+    bounds = [0.0] + [(windows[i][1] + windows[i + 1][0]) / 2 / SAMPLE_RATE for i in range(len(windows) - 1)]
+    bounds.append(float("inf"))
+
+    executor = None
+    if workers:
+        threads = max(1, (os.cpu_count() or workers) // workers)
+        # spawn, não fork: o processo pai já tem threads (preload_models, OpenMP do torch, microfone) e um fork
+        # copia locks presos por elas, travando o worker; cada worker importa este módulo e carrega o modelo do zero
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(threads,))
+    transcript = ""
+    try:
+        with span("stt", "transcribe_long", model_size=model_size, backend=backend, workers=workers,
+                  windows=len(windows), audio_s=len(audio) / SAMPLE_RATE):
+            chunks = (audio[start:end] for start, end in windows)
+            results = _ordered_results(executor, _DECODERS[backend], chunks, (model_size, language, device),
+                                       ahead=2 * max(workers, 1))
+            for index, segments in enumerate(results):
+                offset = windows[index][0] / SAMPLE_RATE
+                texts = [text for seg_start, seg_end, text in segments
+                         if bounds[index] <= offset + (seg_start + seg_end) / 2 < bounds[index + 1]]
+                text = _merge_overlap(transcript, " ".join(t.strip() for t in texts if t.strip()))
+                if text:
+                    transcript = f"{transcript} {text}" if transcript else text
+                yield {"index": index, "windows": len(windows), "start": offset,
+                       "end": windows[index][1] / SAMPLE_RATE, "text": text, "transcript": transcript}
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def transcribe_long_text(audio_file, **kwargs):
+    """Transcrição completa de um áudio longo (consome o gerador transcribe_long)."""
+    transcript = ""
+    for partial in transcribe_long(audio_file, **kwargs):
+        transcript = partial["transcript"]
+    return transcript
@@ -1,23 +1,155 @@
-from transformers import pipeline
+import re
+import threading
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import scipy.io.wavfile as wav
 
+from lazy import lazy_import
+from tracing import span
+
+# transformers (e o torch, que vem junto) só é importado quando o pipeline é criado
+transformers = lazy_import("transformers")
+
+TTS_MODEL = "facebook/mms-tts-por"
+
+# Pipelines carregados no processo, por nome de modelo
+_PIPELINES = {}
+_PIPELINE_LOCK = threading.Lock()
+
+# Quebra após ., !, ? ou ; seguidos de espaço, e em quebras de linha
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+|\n+")
+# Abreviações cujo ponto não termina a frase (ex.: "Sr. Silva", "Dra. Ana", "Av. Paulista")
+_ABBREVIATIONS = {"sr", "sra", "srta", "srs", "sras", "dr", "dra", "drs", "dras", "prof", "profa", "profs", "eng",
+                  "exmo", "exma", "av", "pág", "págs", "art", "cap", "vol", "tel", "nº", "jr", "sto", "sta", "ltda"}
+
+
+def _ends_with_abbreviation(piece):
+    word = piece.rsplit(None, 1)[-1] if piece.strip() else ""
+    # Iniciais de nomes ("J. Silva") também não terminam a frase
+    return word.endswith(".") and (word[:-1].lower() in _ABBREVIATIONS or (len(word) == 2 and word[0].isupper()))
+
+
+def get_pipeline(model=TTS_MODEL):
+    """Retorna o pipeline de TTS do modelo, criando-o apenas na primeira chamada."""
+    with _PIPELINE_LOCK:
+        if model not in _PIPELINES:
+            _PIPELINES[model] = transformers.pipeline("text-to-speech", model=model)
+        return _PIPELINES[model]
+
+
+def preload_pipeline(model=TTS_MODEL):
+    """Carrega o pipeline em uma thread de fundo; retorna a thread iniciada."""
+    thread = threading.Thread(target=get_pipeline, args=(model,), name="tts-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def split_sentences(text, max_chars=250):
+    """Divide o texto em frases de até max_chars para síntese incremental."""
+    pieces = []
+    for piece in _SENTENCE_END.split(text):
+        if pieces and _ends_with_abbreviation(pieces[-1]):
+            pieces[-1] = f"{pieces[-1]} {piece}"
+        else:
+            pieces.append(piece)
+
+    sentences = []
+    for sentence in pieces:
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(",", 0, max_chars)
+            if cut <= 0:
+                cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            sentences.append(sentence[:cut + 1].strip())
+            sentence = sentence[cut + 1:].strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def time_stretch(audio, speed_factor, sample_rate, frame_ms=30, tolerance_ms=10):
+    """
+    Altera a velocidade do áudio sem mudar o tom (WSOLA: overlap-add com alinhamento por correlação).
+
+    Parâmetros:
+     - audio: Array float32 mono.
+     - speed_factor: > 1 acelera, < 1 desacelera.
+     - sample_rate: Taxa de amostragem do áudio.
+     - frame_ms: Tamanho da janela de análise.
+     - tolerance_ms: Deslocamento máximo buscado para alinhar cada janela com a anterior.
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    if speed_factor <= 0:
+        raise ValueError("speed_factor deve ser positivo.")
+    if speed_factor == 1.0 or len(audio) == 0:
+        return audio
+
+    # Janela com 75% de sobreposição: o overlap-add vira 4 somas deslocadas
+    frame_length = max(4, int(sample_rate * frame_ms / 1000) // 4 * 4)
+    hop_out = frame_length // 4
+    hop_in = hop_out * speed_factor
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+    overlap = frame_length - hop_out
+
+    n_frames = max(1, int(np.ceil(len(audio) / hop_in)))
+    padded = np.pad(audio, (tolerance, frame_length + 2 * tolerance + int(np.ceil(hop_in)) + 1))
+    windows = sliding_window_view(padded, frame_length)
+    nominal = np.round(np.arange(n_frames) * hop_in).astype(np.int64)
+
+    # Cada janela é deslocada em até ±tolerance para continuar a forma de onda da janela anterior
+    starts = np.empty(n_frames, dtype=np.int64)
+    starts[0] = tolerance
+    candidates = windows[:, :overlap]
+    for i in range(1, n_frames):
+        reference = padded[starts[i - 1] + hop_out:starts[i - 1] + hop_out + overlap]
+        lo = nominal[i]
+        starts[i] = lo + int(np.argmax(candidates[lo:lo + 2 * tolerance + 1] @ reference))
+
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame_length) / frame_length)).astype(np.float32)
+    segments = (windows[starts] * window).reshape(n_frames, 4, hop_out)
+    window_segments = window.reshape(4, hop_out)
+
+    out = np.zeros((n_frames + 3, hop_out), dtype=np.float32)
+    norm = np.zeros((n_frames + 3, hop_out), dtype=np.float32)
+    for k in range(4):
+        out[k:k + n_frames] += segments[:, k]
+        norm[k:k + n_frames] += window_segments[k]
+    out = (out / np.maximum(norm, 1e-3)).reshape(-1)
+    return out[:int(round(len(audio) / speed_factor))]
+
+
+def synthesize(text, model=TTS_MODEL, speed_factor=1.0):
+    """Sintetiza um trecho de texto e retorna (audio float32, sample_rate)."""
+    with span("tts", "synthesize", chars=len(text), speed_factor=speed_factor) as s:
+        result = get_pipeline(model)(text)
+        # Converte a saída em um array NumPy de float32 (mono)
+        audio_array = np.asarray(result["audio"], dtype=np.float32).reshape(-1)
+        sample_rate = result["sampling_rate"]
+        if speed_factor != 1.0:
+            audio_array = time_stretch(audio_array, speed_factor, sample_rate)
+        s.set(audio_s=len(audio_array) / sample_rate)
+        return audio_array, sample_rate
+
+
+def synthesize_sentences(text, model=TTS_MODEL, speed_factor=1.0):
+    """Gera (audio, sample_rate) frase a frase, para a reprodução começar na primeira frase."""
+    for sentence in split_sentences(text):
+        yield synthesize(sentence, model, speed_factor)
+
+
 def text_to_speech(text, audio_path="output.wav", speed_factor=1.0):
-    tts = pipeline("text-to-speech", model="facebook/mms-tts-por")
-    result = tts(text)
-    
-    audio_bytes = result["audio"]
-    original_sample_rate = result["sampling_rate"]
-    
-    # Converte os bytes em um array NumPy de float32
-    audio_array = np.frombuffer(audio_bytes, dtype=np.float32)
-    
-    # Se speed_factor > 1, o áudio será reproduzido mais rápido
-    new_sample_rate = int(original_sample_rate * speed_factor)
-    
-    # Salva como WAV (aqui, o áudio é tocado mais rápido devido ao sample_rate aumentado)
-    wav.write(audio_path, new_sample_rate, audio_array)
-    
-    print(f"Áudio salvo em '{audio_path}' com sample_rate {new_sample_rate}.")
-    
+    # Se speed_factor > 1, o áudio será reproduzido mais rápido (sem alterar o tom)
+    chunks = list(synthesize_sentences(text, speed_factor=speed_factor))
+    if not chunks:
+        return None
+    sample_rate = chunks[0][1]
+    audio_array = np.concatenate([audio for audio, _ in chunks])
+
+    wav.write(audio_path, sample_rate, audio_array)
+
+    print(f"Áudio salvo em '{audio_path}' com sample_rate {sample_rate}.")
+
     return audio_path
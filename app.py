@@ -1,85 +1,127 @@
-from smolagents import CodeAgent, HfApiModel,load_tool
-import yaml
-from tools.final_answer import FinalAnswerTool
-from mytools import *
-import os,subprocess,sys
-
-
-# Imports para melhorar a interação com o agent:
-from readMic import ReadMic, read_audio
-from STT import transcribe_audio
-from TTS import text_to_speech
-from time import time
-
-
-final_answer = FinalAnswerTool()
-
-# If the agent does not answer, the model is overloaded, please use another model or the following Hugging Face Endpoint that also contains qwen2.5 coder:
-# model_id='https://pflgm2locj2t89co.us-east-1.aws.endpoints.huggingface.cloud' 
-
-model = HfApiModel(
-    max_tokens=2096,
-    temperature=0.5,
-    # model_id='Qwen/Qwen2.5-Coder-32B-Instruct',# it is possible that this model may be overloaded
-    model_id='https://pflgm2locj2t89co.us-east-1.aws.endpoints.huggingface.cloud',
-    custom_role_conversions=None,
-)
-
-
-# Import tool from Hub
-image_generation_tool = load_tool("agents-course/text-to-image", trust_remote_code=True)
-
-# Carrega templates do prompt
-with open(r"C:\Users\amori\Documents\Codigos\Assistent\Agent\prompts.yaml", "r") as stream:
-    prompt_templates = yaml.safe_load(stream)
-
-    
-agent = CodeAgent(
-    model=model,
-    tools=[final_answer, image_generation_tool, ## add your tools here (don't remove final answer)
-           get_current_time_in_timezone,math_operation,
-           internet_search, get_stock_info,
-           get_stock_price, compare_stocks,
-           get_index_price], 
-    max_steps=6,
-    verbosity_level=1,
-    grammar=None,
-    planning_interval=None,
-    name=None,
-    description=None,
-    prompt_templates=prompt_templates
-)
+import os
+
+
+# Imports para melhorar a interação com o agent (leves: modelos e bibliotecas pesadas são carregados sob demanda)
+from lazy import Deferred, warm_in_background
+from readMic import ReadMic
+from player import get_player
+from voiceLoop import VoiceLoop
+from promptCache import load_prompt_templates
+from STT import transcribe_audio, preload_models
+from TTS import synthesize_sentences, preload_pipeline
+import asyncio
+
+
+# Defina AGENT_PARALLEL_TOOLS=1 para habilitar a execução de tools em paralelo
+PARALLEL_TOOLS = os.environ.get("AGENT_PARALLEL_TOOLS") == "1"
+# Defina AGENT_LOCAL_MODEL para rotear os passos simples a um modelo local do Ollama (ver modelRouter.py)
+LOCAL_MODEL = os.environ.get("AGENT_LOCAL_MODEL")
+
+
+def build_agent():
+    """Monta o agente (modelo, tools e caches). Os imports pesados ficam aqui para não atrasar a abertura do microfone."""
+    from smolagents import CodeAgent
+    try:
+        from smolagents import HfApiModel
+    except ImportError:  # smolagents >= 1.14: HfApiModel passou a se chamar InferenceClientModel
+        from smolagents import InferenceClientModel as HfApiModel
+    try:
+        from tools.final_answer import FinalAnswerTool
+    except ImportError:  # pasta tools/ do template do curso ausente: o smolagents tem a mesma tool
+        from smolagents import FinalAnswerTool
+    import hubTools
+    from mytools import (get_current_time_in_timezone, math_operation, internet_search, get_stock_info,
+                         get_stock_price, compare_stocks, get_index_price)
+    from promptCache import install_prompt_cache
+    from responseCache import CachedModel
+    from memoryCompaction import CompactingModel
+    from toolCache import install_run_scope
+    from tracing import install_tracing
+    from parallelTools import ParallelToolExecutor
+
+    final_answer = FinalAnswerTool()
+
+    # If the agent does not answer, the model is overloaded, please use another model or the following Hugging Face Endpoint that also contains qwen2.5 coder:
+    # model_id='https://pflgm2locj2t89co.us-east-1.aws.endpoints.huggingface.cloud'
+
+    model = HfApiModel(
+        max_tokens=2096,
+        temperature=0.5,
+        # model_id='Qwen/Qwen2.5-Coder-32B-Instruct',# it is possible that this model may be overloaded
+        model_id='https://pflgm2locj2t89co.us-east-1.aws.endpoints.huggingface.cloud',
+        custom_role_conversions=None,
+    )
+    # Opcional (AGENT_LOCAL_MODEL=modelo do Ollama, ex.: llama3.2:3b): passos simples vão para o modelo local
+    if LOCAL_MODEL:
+        from ollamaModel import OllamaChatbotModel
+        from modelRouter import hybrid_model
+
+        model = hybrid_model(OllamaChatbotModel(max_tokens=2096, temperature=0.5, model_id=LOCAL_MODEL), model)
+    # Respostas já vistas (mesmas mensagens e configurações) saem do cache em disco, sem chamar o endpoint
+    model = CachedModel(model)
+    # Observações antigas e repetidas são compactadas antes de cada chamada
+    model = CompactingModel(model, budget=6000)
+
+    # Tool do Hub: metadados declarados localmente, download e carregamento em segundo plano
+    image_generation_tool = hubTools.image_generation_tool()
+    image_generation_tool.warm()
+
+    # Carrega templates do prompt (AGENT_PROMPTS_FILE ou o prompts.yaml do projeto)
+    prompt_templates = load_prompt_templates()
+
+    tools = [final_answer, image_generation_tool, ## add your tools here (don't remove final answer)
+             get_current_time_in_timezone,math_operation,
+             internet_search, get_stock_info,
+             get_stock_price, compare_stocks,
+             get_index_price]
+
+    # Opcional: expõe parallel_map para o agente disparar chamadas independentes de tools em paralelo
+    if PARALLEL_TOOLS:
+        tools.append(ParallelToolExecutor(tools, per_tool_limits={"internet_search": 2}).as_tool())
+
+    agent = CodeAgent(
+        model=model,
+        tools=tools,
+        max_steps=6,
+        verbosity_level=1,
+        grammar=None,
+        planning_interval=None,
+        name=None,
+        description=None,
+        prompt_templates=prompt_templates
+    )
+    # Reaproveita o system prompt renderizado entre runs (prefixo estável para o cache KV do servidor)
+    install_prompt_cache(agent)
+    # Cada run começa com os caches de tools por run vazios
+    install_run_scope(agent)
+    # Spans de modelo, tools e execução de código (ligados com AGENT_TRACE=arquivo.jsonl ou .json)
+    install_tracing(agent)
+    return agent
+
 
 def main():
     print("=== Bem-vindo ao Agente Interativo ===")
+    # Whisper, TTS e o agente carregam em segundo plano enquanto o microfone é aberto e o usuário começa a falar
+    preload_models("small")
+    preload_pipeline()
+    agent = Deferred(warm_in_background(build_agent))
+
     # Cria a instância com o dispositivo correto (índice 2 para o microfone do headset)
     read_mic = ReadMic(device_index=3, output_file="audio_gravado.wav", duration=5, sample_rate=44100, channels=1)
     print("Mic conectado")
 
-    # Grava o áudio e salva no arquivo "audio_gravado.wav"
-    read_mic.gravar_com_dispositivo(indice_dispositivo=3)
-    print("Áudio gravado")
-
-    # Transcreve o áudio utilizando o arquivo salvo
-    entry = transcribe_audio(read_mic.output_file)
-    print("Áudio transcrito")
-
-
-    response = agent.run(entry)
-    print("\nResposta do agente:")
-    print(response)
-
-    if isinstance(response, list):  # Verifica se é uma lista
-        text = "\n".join(response)  # Junta os elementos com quebra de linha
-    else:
-        text = response
+    # Cada fala vai do início detectado até 700 ms de silêncio; enquanto a resposta toca, o próximo turno já é gravado
+    loop = VoiceLoop(agent, read_mic, transcribe_audio, synthesize_sentences, get_player(),
+                     capture_kwargs={"silence_ms": 700, "max_duration": 15})
+    try:
+        asyncio.run(loop.run())
+    except KeyboardInterrupt:
+        pass
 
-    audio_path = text_to_speech(text, "output.wav")
-    print("Áudio gerado")
-    
-    if audio_path:
-        read_audio(audio_path)
+    print("\nLatência por etapa (s):")
+    print(loop.metrics.report())
+    print(f"Etapa mais lenta: {loop.bottleneck()}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import importlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, time
+
+from metrics import MetricsRegistry
+
+# Campos aceitos como identificador e como texto da tarefa em cada linha do JSONL
+ID_FIELDS = ("id", "task_id", "request_id")
+TEXT_FIELDS = ("task", "prompt", "question")
+
+
+def task_id(record, line_number):
+    for field in ID_FIELDS:
+        if record.get(field) is not None:
+            return str(record[field])
+    return f"line-{line_number}"
+
+
+def task_text(record):
+    for field in TEXT_FIELDS:
+        if record.get(field):
+            return record[field]
+    # Formato do requests.jsonl: título e corpo
+    return "\n\n".join(record[field] for field in ("title", "body") if record.get(field))
+
+
+def read_tasks(path):
+    """Lê as tarefas do JSONL sob demanda. Gera dicts {"id", "task", "record"}; linhas vazias são ignoradas."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"task": record}
+            yield {"id": task_id(record, line_number), "task": task_text(record), "record": record}
+
+
+def completed_ids(output_file, retry_errors=False):
+    """Ids já registrados no arquivo de resultados (checkpoint); com retry_errors, sem os que deram erro."""
+    done = set()
+    if not os.path.exists(output_file):
+        return done
+    with open(output_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get("status") == "ok" or not retry_errors:
+                done.add(result["id"])
+            else:
+                done.discard(result["id"])
+    return done
+
+
+def _run_stats(agent):
+    # Tokens e passos do último run, quando o agente expõe essas informações (CodeAgent do smolagents)
+    stats = {}
+    monitor = getattr(agent, "monitor", None)
+    if monitor is not None and hasattr(monitor, "get_total_token_counts"):
+        usage = monitor.get_total_token_counts()
+        stats["input_tokens"] = usage.input_tokens
+        stats["output_tokens"] = usage.output_tokens
+    memory = getattr(agent, "memory", None)
+    if memory is not None and hasattr(memory, "steps"):
+        stats["steps"] = len(memory.steps)
+    return stats
+
+
+class BatchRunner:
+    """
+    Executa tarefas em lote com um pool de workers, cada um com o seu próprio agente. O JSONL de saída também
+    serve de checkpoint: uma nova execução pula as tarefas que já estão nele.
+    """
+
+    def __init__(self, agent_factory, workers=4, output_file="results.jsonl", retry_errors=False, metrics=None):
+        """
+        Parâmetros:
+         - agent_factory: Função sem argumentos que cria um agente (ex.: main.build_agent).
+         - workers: Quantidade de agentes rodando tarefas ao mesmo tempo.
+         - output_file: JSONL de resultados (um registro por tarefa, na ordem de término).
+         - retry_errors: Refaz as tarefas que terminaram em erro em uma execução anterior.
+         - metrics: MetricsRegistry compartilhado. Se None, cria um novo.
+        """
+        self.agent_factory = agent_factory
+        self.workers = workers
+        self.output_file = output_file
+        self.retry_errors = retry_errors
+        self.metrics = metrics or MetricsRegistry()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def _agent(self):
+        agent = getattr(self._local, "agent", None)
+        if agent is None:
+            start = perf_counter()
+            agent = self._local.agent = self.agent_factory()
+            self.metrics.observe("agent_build", perf_counter() - start)
+        return agent
+
+    def _write(self, result):
+        line = json.dumps(result, ensure_ascii=False, default=str)
+        with self._write_lock:
+            with open(self.output_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _terminate_partial_line(self):
+        # Uma queda no meio de uma escrita deixa a última linha sem "\n"; o próximo registro começa em linha nova
+        if not os.path.exists(self.output_file) or os.path.getsize(self.output_file) == 0:
+            return
+        with open(self.output_file, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def _run_task(self, task):
+        result = {"id": task["id"], "task": task["task"], "worker": threading.current_thread().name}
+        start = perf_counter()
+        try:
+            agent = self._agent()
+            response = agent.run(task["task"])
+            result.update(status="ok", result=response, **_run_stats(agent))
+            self.metrics.incr("tasks_ok")
+        except Exception as e:
+            result.update(status="error", error=f"{type(e).__name__}: {e}")
+            self.metrics.incr("tasks_error")
+        result["elapsed_s"] = round(perf_counter() - start, 4)
+        result["finished_at"] = time()
+        self.metrics.observe("task", result["elapsed_s"])
+        self._write(result)
+        return result
+
+    def run(self, tasks, limit=None):
+        """Executa as tarefas ({"id", "task"}) que ainda não estão no arquivo de saída e retorna um resumo."""
+        done = completed_ids(self.output_file, self.retry_errors)
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_file)), exist_ok=True)
+        self._terminate_partial_line()
+        slots = threading.BoundedSemaphore(2 * self.workers)
+        submitted = skipped = 0
+        start = perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent-worker")
+        try:
+            for task in tasks:
+                if task["id"] in done:
+                    skipped += 1
+                    continue
+                if limit is not None and submitted >= limit:
+                    break
+                done.add(task["id"])
+                slots.acquire()
+                future = executor.submit(self._run_task, task)
+                future.add_done_callback(lambda _: slots.release())
+                submitted += 1
+        except KeyboardInterrupt:
+            print("\nInterrompido: aguardando as tarefas em andamento...")
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+
+        elapsed = perf_counter() - start
+        counters = self.metrics.snapshot()["counters"]
+        return {
+            "submitted": submitted,
+            "skipped": skipped,
+            "ok": counters.get("tasks_ok", 0),
+            "errors": counters.get("tasks_error", 0),
+            "elapsed_s": elapsed,
+            "tasks_per_s": submitted / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def load_factory(spec):
+    """Resolve "modulo:função" (ex.: "main:build_agent") para a função."""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "build_agent")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa o agente em lote sobre um arquivo JSONL de tarefas.")
+    parser.add_argument("tasks_file")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL de resultados (e checkpoint).")
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument("--factory", default="main:build_agent", help="Função que cria um agente, em modulo:função.")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de tarefas executadas nesta chamada.")
+    parser.add_argument("--retry-errors", action="store_true", help="Refaz as tarefas que terminaram em erro.")
+    args = parser.parse_args()
+
+    runner = BatchRunner(load_factory(args.factory), workers=args.workers, output_file=args.output,
+                         retry_errors=args.retry_errors)
+    summary = runner.run(read_tasks(args.tasks_file), limit=args.limit)
+    print(f"{summary['submitted']} tarefas executadas ({summary['ok']} ok, {summary['errors']} com erro), "
+          f"{summary['skipped']} já concluídas | {summary['elapsed_s']:.1f}s, {summary['tasks_per_s']:.2f} tarefas/s")
+    print(runner.metrics.report())
+
+
+if __name__ == "__main__":
+    main()
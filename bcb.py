@@ -0,0 +1,147 @@
+import datetime
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cache import SingleFlight, TTLCache
+
+BASE_URL = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados"
+
+# Séries do SGS usadas pelas tools
+SELIC = 11
+CDI = 12
+IPCA = 433
+
+
+class BCBClient:
+    """
+    Cliente da API SGS do Banco Central, com uma sessão HTTP compartilhada e cache diário em disco do último valor
+    de cada série (o valor de um dia anterior é devolvido na hora e atualizado em segundo plano).
+    """
+
+    def __init__(self, base_url=BASE_URL, timeout=(3.05, 10), cache_file=".cache/bcb.json", max_workers=4,
+                 range_ttl=24 * 3600):
+        """
+        Parâmetros:
+         - base_url: URL das séries, com {code} no lugar do código da série.
+         - timeout: Timeout de conexão e de leitura das requisições, em segundos.
+         - cache_file: Arquivo JSON do cache diário. Se None, o cache fica só em memória.
+         - max_workers: Requisições simultâneas ao buscar várias séries.
+         - range_ttl: Validade, em segundos, dos históricos buscados com get_range().
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache_file = cache_file
+        self.session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers + 2, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcb")
+        # Pool separado: atualizações em segundo plano não disputam threads com latest_many, e vice-versa
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bcb-refresh")
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._latest = self._load()
+        self._ranges = TTLCache(maxsize=128, ttl=range_ttl)
+        self.stats = {"fresh": 0, "stale": 0, "fetches": 0}
+
+    def _load(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        if self.cache_file is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self._latest)
+            tmp = self.cache_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.cache_file)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _get(self, code, path="", params=None):
+        self._count("fetches")
+        response = self.session.get(self.base_url.format(code=code) + path, params={"formato": "json", **(params or {})},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _refresh(self, code):
+        def fetch():
+            entry = {"value": self._get(code, "/ultimos/1")[0], "day": datetime.date.today().isoformat()}
+            with self._lock:
+                self._latest[str(code)] = entry
+            self._save()
+            return entry
+        return self._flights.do(("latest", code), fetch)
+
+    def _refresh_in_background(self, code):
+        def run():
+            try:
+                self._refresh(code)
+            except Exception as e:
+                print(f"Erro ao atualizar a série {code} do BCB: {e}")
+        self._refresh_executor.submit(run)
+
+    def latest(self, code):
+        """Último registro da série ({"data": "dd/mm/aaaa", "valor": "..."})."""
+        with self._lock:
+            entry = self._latest.get(str(code))
+        if entry is None:
+            return self._refresh(code)["value"]
+        if entry["day"] == datetime.date.today().isoformat():
+            self._count("fresh")
+        else:
+            # Valor de um dia anterior: responde com ele e atualiza em segundo plano
+            self._count("stale")
+            self._refresh_in_background(code)
+        return entry["value"]
+
+    def latest_many(self, codes):
+        """Último registro de cada série, buscando em paralelo as que não estão em cache. Retorna {code: registro}."""
+        futures = {code: self._executor.submit(self.latest, code) for code in codes}
+        return {code: future.result() for code, future in futures.items()}
+
+    def get_range(self, code, start, end=None):
+        """
+        Registros da série entre as datas start e end (datetime.date ou "dd/mm/aaaa"); end padrão é hoje.
+        """
+        end = end or datetime.date.today()
+        start, end = (d.strftime("%d/%m/%Y") if isinstance(d, datetime.date) else d for d in (start, end))
+        key = (code, start, end)
+        values = self._ranges.get(key)
+        if values is None:
+            values = self._flights.do(("range",) + key, self._get, code, "", {"dataInicial": start, "dataFinal": end})
+            self._ranges.set(key, values)
+        return values
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Retorna o BCBClient compartilhado do processo."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = BCBClient()
+        return _client
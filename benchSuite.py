@@ -0,0 +1,318 @@
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+import tracemalloc
+from time import perf_counter
+
+from fakes import (OllamaStubServer, StubAgent, StubChatModel, StubSynthesizer, StubTranscriber, ToolFixtures,
+                   synthetic_speech)
+from metrics import percentile
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+FIXTURES_FILE = os.path.join(BENCH_DIR, "tool_fixtures.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Tarefas dos cenários do agente; o roteiro do modelo stub é o mesmo para todas
+TASKS = (
+    "Qual o preço da PETR4 hoje e quanto está a Selic?",
+    "Compare PETR4 e VALE3 no último ano.",
+    "Que horas são em São Paulo? Quanto é 1250 vezes 12?",
+)
+
+# Métricas comparadas com o baseline: +1 quanto maior melhor, -1 quanto menor melhor
+COMPARED = {"throughput_per_s": +1, "p50_s": -1, "p95_s": -1, "peak_mb": -1}
+# Diferenças absolutas abaixo destas são ruído de medição
+NOISE_FLOOR = {"throughput_per_s": 0.0, "p50_s": 0.002, "p95_s": 0.005, "peak_mb": 0.5}
+
+
+def _code(tags, code):
+    open_tag, close_tag = tags
+    return f"{open_tag}\n{code}\n{close_tag}"
+
+
+def agent_script(tags):
+    """Roteiro do modelo stub: um passo chamando várias tools e um passo com a resposta final."""
+    return (
+        "Thought: Vou consultar as tools necessárias.\n" + _code(tags, "\n".join((
+            'price = get_stock_price(ticker="PETR4.SA")',
+            "rates = get_interest_rates()",
+            'comparison = compare_stocks(ticker1="PETR4.SA", ticker2="VALE3.SA", period="1y")',
+            'now = get_current_time_in_timezone(timezone="America/Sao_Paulo")',
+            'total = math_operation(arg1=1250, arg2=12, operation="multiply")',
+            "print(price, rates, comparison, now, total)",
+        ))),
+        "Thought: Tenho tudo para responder.\n" + _code(tags, 'final_answer(f"{price}\\n{rates}\\n{total}")'),
+    )
+
+
+_fixtures = None
+
+
+def default_fixtures():
+    """ToolFixtures de replay do FIXTURES_FILE, compartilhado pelos agentes do processo."""
+    global _fixtures
+    if _fixtures is None:
+        _fixtures = ToolFixtures(FIXTURES_FILE)
+    return _fixtures
+
+
+def build_stub_agent(model=None, fixtures=None):
+    """CodeAgent com as tools do mytools.py respondidas pelas fixtures gravadas e um StubChatModel roteirizado."""
+    from smolagents import CodeAgent
+
+    import mytools
+    from promptCache import install_prompt_cache
+    from toolCache import install_run_scope
+
+    tools = [mytools.get_stock_price, mytools.get_interest_rates, mytools.compare_stocks,
+             mytools.get_current_time_in_timezone, mytools.math_operation]
+    (fixtures or default_fixtures()).install(tools)
+    model = model or StubChatModel(latency=0.01)
+    agent = CodeAgent(tools=tools, model=model, max_steps=4, verbosity_level=0)
+    # Versões antigas do smolagents usam blocos ```py ... ```<end_code>
+    model.replies = agent_script(getattr(agent, "code_block_tags", None) or ("Code:\n```py", "```<end_code>"))
+    install_prompt_cache(agent)
+    install_run_scope(agent)
+    return agent
+
+
+def scenario_agent(runs=20, latency=0.01, tokens_per_s=None):
+    """Runs sequenciais do CodeAgent com modelo stub e tools gravadas (overhead do loop do agente)."""
+    agent = build_stub_agent(StubChatModel(latency=latency, tokens_per_s=tokens_per_s))
+    latencies = []
+    for i in range(runs):
+        start = perf_counter()
+        agent.run(TASKS[i % len(TASKS)])
+        latencies.append(perf_counter() - start)
+    usage = agent.monitor.get_total_token_counts() if hasattr(agent, "monitor") else None
+    return {"ops": runs, "latencies": latencies,
+            "input_tokens_per_run": getattr(usage, "input_tokens", None)}
+
+
+def main_agent_script(tags):
+    """Roteiro para o agente do main.py: só tools que não usam a rede, e a resposta final."""
+    return (
+        "Thought: Vou calcular e ver a hora.\n" + _code(tags, "\n".join((
+            'total = math_operation(arg1=1250, arg2=12, operation="multiply")',
+            'now = get_current_time_in_timezone(timezone="America/Sao_Paulo")',
+            "print(total, now)",
+        ))),
+        "Thought: Tenho tudo para responder.\n" + _code(tags, 'final_answer(f"{total}")'),
+    )
+
+
+def scripted_replies(script):
+    """Função messages -> resposta do passo, contado a partir da última tarefa ("New task") da conversa."""
+    def reply(messages):
+        step = 0
+        for m in messages:
+            if m["role"] == "user" and "New task" in m["content"][:100]:
+                step = 0
+            elif m["role"] == "assistant":
+                step += 1
+        return script[min(step, len(script) - 1)]
+
+    return reply
+
+
+def scenario_ollama(runs=10, token_delay=0.0005):
+    """Agente do main.py com o OllamaChatbotModel de verdade, em streaming HTTP com o OllamaStubServer."""
+    from smolagents.monitoring import LogLevel
+
+    import main
+    from ollamaModel import OllamaChatbotModel
+
+    with OllamaStubServer(token_delay=token_delay) as stub:
+        agent = main.build_agent(OllamaChatbotModel(host=stub.url, verbose=False), response_cache=False,
+                                 hub_tools=False)
+        agent.logger.level = LogLevel.OFF
+        stub.replies = scripted_replies(main_agent_script(agent.code_block_tags))
+        latencies = []
+        for i in range(runs):
+            start = perf_counter()
+            result = agent.run(f"Quanto é 1250 vezes 12? ({i})")
+            latencies.append(perf_counter() - start)
+            if str(result) != "15000":
+                raise RuntimeError(f"Resposta inesperada do agente: {result!r}")
+    return {"ops": runs, "latencies": latencies}
+
+
+def scenario_batch(tasks=40, workers=4, latency=0.02):
+    """BatchRunner com `workers` agentes sobre `tasks` tarefas (vazão com vários agentes)."""
+    from batchRunner import BatchRunner
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runner = BatchRunner(lambda: build_stub_agent(StubChatModel(latency=latency)), workers=workers,
+                             output_file=os.path.join(tmp, "results.jsonl"))
+        summary = runner.run({"id": str(i), "task": TASKS[i % len(TASKS)]} for i in range(tasks))
+        with open(runner.output_file, "r", encoding="utf-8") as f:
+            latencies = [json.loads(line)["elapsed_s"] for line in f]
+    return {"ops": summary["ok"], "latencies": latencies, "errors": summary["errors"]}
+
+
+def load_test(url, sessions, requests):
+    """`sessions` clientes simultâneos, cada um com a sua sessão, enviando `requests` tarefas em sequência."""
+    import urllib.error
+    import urllib.request
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def post(path, payload):
+        request = urllib.request.Request(url + path, json.dumps(payload).encode(),
+                                         {"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+
+    def client(i):
+        _, created = post("/sessions", {})
+        for n in range(requests):
+            start = perf_counter()
+            status, _ = post(f"/sessions/{created['session_id']}/run",
+                             {"task": f"Cliente {i}, pergunta {n}: {TASKS[n % len(TASKS)]}"})
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(perf_counter() - start)
+
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(sessions)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return latencies, statuses
+
+
+def scenario_server(sessions=8, requests=4, concurrency=2, latency=0.01, steps=2):
+    """Servidor de sessões com `sessions` clientes simultâneos e `concurrency` chamadas de modelo por vez."""
+    from server import AgentServer, ModelScheduler, SessionManager
+
+    scheduler = ModelScheduler(lambda: StubChatModel(("Thought: ok",), latency=latency),
+                               max_concurrency=concurrency)
+    with AgentServer(SessionManager(lambda model: StubAgent(model, steps), scheduler), port=0) as server:
+        latencies, statuses = load_test(server.url, sessions, requests)
+        max_depth = scheduler.stats()["max_queue_depth"]
+    return {"ops": len(latencies), "latencies": latencies, "statuses": statuses, "max_queue_depth": max_depth}
+
+
+def scenario_voice(turns=3, latency=0.02):
+    """
+    Caminho de voz completo com áudio sintético: ReadMic (VAD) -> STT -> agente -> TTS -> player.
+    A latência é a do turno, do fim da fala até o primeiro áudio da resposta.
+    """
+    import asyncio
+
+    from player import AudioPlayer, NullSink
+    from readMic import ReadMic, SyntheticSource
+    from voiceLoop import VoiceLoop
+
+    sample_rate = 16000
+    signal = synthetic_speech(turns, speech_s=0.6, silence_s=0.8, sample_rate=sample_rate)
+    read_mic = ReadMic(sample_rate=sample_rate, channels=1,
+                       source=SyntheticSource(signal, sample_rate, blocksize=480, realtime=True))
+    agent = StubAgent(StubChatModel(("O preço da PETR4 é R$ 38,20. A Selic está em 10,50% ao ano.",),
+                                    latency=latency), steps=1)
+    loop = VoiceLoop(agent, read_mic, StubTranscriber(), StubSynthesizer(sample_rate), AudioPlayer(NullSink()),
+                     barge_in=False, capture_kwargs={"silence_ms": 500, "max_duration": 5})
+    asyncio.run(loop.run(max_turns=turns))
+    return {"ops": len(loop.metrics.histogram("turn").recent), "latencies": list(loop.metrics.histogram("turn").recent),
+            "bottleneck": loop.bottleneck()}
+
+
+SCENARIOS = {
+    "agent": scenario_agent,
+    "batch": scenario_batch,
+    "ollama": scenario_ollama,
+    "server": scenario_server,
+    "voice": scenario_voice,
+}
+
+
+def run_scenario(name, memory=True):
+    """Roda o cenário uma vez para o tempo e outra, com tracemalloc, para o pico de memória."""
+    start = perf_counter()
+    result = SCENARIOS[name]()
+    elapsed = perf_counter() - start
+    latencies = result.pop("latencies")
+    ops = result.pop("ops")
+    measured = {
+        "ops": ops,
+        "elapsed_s": elapsed,
+        "throughput_per_s": ops / elapsed if elapsed > 0 else None,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "max_s": max(latencies) if latencies else None,
+        **result,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            SCENARIOS[name]()
+            measured["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return measured
+
+
+def run_suite(names=None, memory=True):
+    names = names or list(SCENARIOS)
+    results = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+               "scenarios": {}}
+    for name in names:
+        results["scenarios"][name] = run_scenario(name, memory)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """Retorna as regressões em relação ao baseline: pioras acima de `threshold` e do piso de ruído absoluto."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric, direction in COMPARED.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None or old == 0:
+                continue
+            worse = (old - new) * direction
+            if worse > NOISE_FLOOR[metric] and worse / abs(old) > threshold:
+                regressions.append(f"{name}.{metric}: {old:.4g} -> {new:.4g} ({(new - old) / old:+.0%})")
+    return regressions
+
+
+def report(results, baseline=None):
+    lines = [f"{'cenário':<8} {'ops':>5} {'ops/s':>8} {'p50 (s)':>9} {'p95 (s)':>9} {'pico (MB)':>10}"]
+    fmt = lambda v, spec: format(v, spec) if v is not None else "-".rjust(int(spec.split(".")[0]))
+    for name, s in results["scenarios"].items():
+        lines.append(f"{name:<8} {s['ops']:>5} {fmt(s['throughput_per_s'], '8.2f')} {fmt(s['p50_s'], '9.4f')} "
+                     f"{fmt(s['p95_s'], '9.4f')} {fmt(s.get('peak_mb'), '10.1f')}")
+        if baseline and name in baseline.get("scenarios", {}):
+            b = baseline["scenarios"][name]
+            lines.append(f"{'  base':<8} {b['ops']:>5} {fmt(b.get('throughput_per_s'), '8.2f')} "
+                         f"{fmt(b.get('p50_s'), '9.4f')} {fmt(b.get('p95_s'), '9.4f')} {fmt(b.get('peak_mb'), '10.1f')}")
+    return "\n".join(lines)
+
+
+def save(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+        f.write("\n")
+
+
+def record_fixtures(path=FIXTURES_FILE):
+    """Roda o cenário do agente uma vez com as tools de verdade (rede) e grava as respostas em `path`."""
+    fixtures = ToolFixtures(path, mode="record")
+    agent = build_stub_agent(StubChatModel(), fixtures)
+    for task in TASKS:
+        agent.run(task)
+    fixtures.uninstall()
+    fixtures.save()
+    return fixtures
@@ -0,0 +1,447 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+
+def bench_stt(audio_file, model_size="small", repeats=3):
+    """
+    Mede a latência de transcrição a frio (carregando o modelo) e a quente (modelo já residente no cache).
+    """
+    import STT
+
+    STT.clear_model_cache()
+    start = perf_counter()
+    STT.transcribe_audio(audio_file, model_size=model_size)
+    cold = perf_counter() - start
+
+    warm = []
+    for _ in range(repeats):
+        start = perf_counter()
+        STT.transcribe_audio(audio_file, model_size=model_size)
+        warm.append(perf_counter() - start)
+
+    print(f"STT ({model_size}) | frio: {cold:.2f}s | quente (mediana de {repeats}): {statistics.median(warm):.2f}s")
+    return {"cold_s": cold, "warm_s": warm}
+
+
+def bench_longform(audio_file=None, seconds=300.0, model_size="small", backend="whisper", workers=(0, 2),
+                   window_s=30.0):
+    """
+    Fator de tempo real (RTF) da transcrição de áudio longo para cada quantidade de workers, e o tempo até o
+    primeiro texto parcial. Sem audio_file, usa `seconds` de fala sintética.
+    """
+    import STT
+    from fakes import synthetic_speech
+
+    if audio_file:
+        audio = STT.load_audio(audio_file)
+    else:
+        turns = max(1, int(seconds / 3.5))
+        audio = synthetic_speech(turns, speech_s=2.5, silence_s=1.0)
+    duration = len(audio) / STT.SAMPLE_RATE
+
+    results = {}
+    for n in workers:
+        start = perf_counter()
+        first = None
+        windows = 0
+        for partial in STT.transcribe_long(audio, model_size=model_size, backend=backend, workers=n,
+                                           window_s=window_s, device="cpu"):
+            if first is None:
+                first = perf_counter() - start
+            windows = partial["windows"]
+        elapsed = perf_counter() - start
+        results[n] = {"elapsed_s": elapsed, "rtf": elapsed / duration, "first_partial_s": first}
+        print(f"Longo ({backend}, {model_size}) | {duration:.0f}s de áudio, {windows} janelas, {n} workers "
+              f"| {elapsed:.1f}s | RTF {elapsed / duration:.3f} | primeiro parcial em {first:.1f}s")
+    return results
+
+
+def bench_time_stretch(seconds=60.0, sample_rate=16000, speed_factor=1.25, repeats=3):
+    """
+    Mede a vazão do time-stretch do TTS, em segundos de áudio processados por segundo de CPU.
+    """
+    import numpy as np
+    from TTS import time_stretch
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    # Sinal com harmônicos e ruído, parecido com voz em termos de custo
+    audio = (0.2 * np.sin(2 * np.pi * 180 * t) + 0.1 * np.sin(2 * np.pi * 360 * t)
+             + 0.02 * rng.standard_normal(len(t))).astype(np.float32)
+
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        time_stretch(audio, speed_factor, sample_rate)
+        times.append(perf_counter() - start)
+
+    elapsed = statistics.median(times)
+    throughput = seconds / elapsed
+    print(f"Time-stretch x{speed_factor} | {seconds:.0f}s de áudio em {elapsed:.3f}s "
+          f"| {throughput:.1f}s de áudio por segundo ({throughput:.1f}x tempo real)")
+    return {"elapsed_s": elapsed, "audio_s_per_s": throughput}
+
+
+def _simulated_run(steps, prompts_file="prompts.yaml", observation=None):
+    """Mensagens de cada passo de um run de `steps` passos, com o system prompt real do prompts.yaml."""
+    from types import SimpleNamespace
+
+    import yaml
+    from jinja2 import StrictUndefined, Template
+
+    with open(prompts_file, "r", encoding="utf-8") as stream:
+        templates = yaml.safe_load(stream)
+    tools = {name: SimpleNamespace(name=name, description=f"Tool {name}.", output_type="string",
+                                   inputs={"query": {"type": "string", "description": "Input."}})
+             for name in ("final_answer", "internet_search", "get_stock_price", "get_current_time_in_timezone")}
+    system = Template(templates["system_prompt"], undefined=StrictUndefined).render(
+        tools=tools, managed_agents={}, authorized_imports="['datetime', 'math']")
+
+    messages = [{"role": "system", "content": [{"type": "text", "text": system}]},
+                {"role": "user", "content": [{"type": "text", "text": "New task:\nQual o preço da PETR4 hoje?"}]}]
+    per_step = []
+    for step in range(1, steps + 1):
+        per_step.append([dict(m) for m in messages])
+        messages.append({"role": "assistant", "content": [{"type": "text", "text":
+                         f"Thought: passo {step}.\nCode:\n```py\nprint(get_stock_price(ticker='PETR4.SA'))\n```"}]})
+        text = observation(step) if observation else f"The latest closing price for PETR4.SA is ${30 + step:.2f}."
+        messages.append({"role": "tool-response", "content": [{"type": "text", "text": f"Observation:\n{text}"}]})
+    return per_step
+
+
+def bench_prefix(steps=6, host=None):
+    """
+    Tokens de prompt avaliados por passo com o prompt achatado em str(...) e com as mensagens estáveis.
+    Com host, mede o prompt_eval_count do Ollama.
+    """
+    from ollamaModel import OllamaChatbotModel, to_chat_messages
+    from promptCache import prefix_report, serialize_chat
+
+    per_step = _simulated_run(steps)
+    layouts = {
+        "achatado": [[{"role": "user", "content": str(messages)}] for messages in per_step],
+        "chat": [to_chat_messages(messages) for messages in per_step],
+    }
+
+    results = {}
+    for name, prompts in layouts.items():
+        if host is None:
+            report = prefix_report([serialize_chat(p) for p in prompts])
+            evaluated = [r["evaluated_tokens"] for r in report]
+        else:
+            model = OllamaChatbotModel(max_tokens=1, host=host, verbose=False)
+            evaluated = []
+            for prompt in prompts:
+                model(prompt)
+                evaluated.append(model.last_stats["prompt_tokens"])
+        results[name] = evaluated
+        print(f"{name:<9} tokens avaliados por passo: {evaluated} | total: {sum(evaluated)}")
+
+    saved = [a - b for a, b in zip(results["achatado"], results["chat"])]
+    print(f"Tokens de prompt economizados por passo: {saved} | total: {sum(saved)}")
+    return results
+
+
+def bench_imports(module="main", top=15):
+    """
+    Perfil de importação (python -X importtime) de um módulo: os `top` imports com maior tempo acumulado.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # Formato: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    if result.returncode != 0:
+        print(result.stderr.strip().splitlines()[-1])
+
+    total = sum(cumulative for cumulative, _, name in rows if not name[1:].startswith(" "))
+    print(f"Import de '{module}': {total / 1e6:.3f}s")
+    print(f"{'acumulado (s)':>14} {'próprio (s)':>12}  módulo")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1e6:>14.3f} {self_us / 1e6:>12.3f}  {name.strip()}")
+    return {"total_s": total / 1e6, "top": [(name.strip(), cumulative / 1e6) for cumulative, _, name in
+                                            sorted(rows, reverse=True)[:top]]}
+
+
+def bench_startup(script="main.py", marker="Digite seu comando", repeats=3, timeout=120.0):
+    """Tempo até `marker` (o primeiro prompt) aparecer na saída do script, em um processo novo."""
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        proc = subprocess.Popen([sys.executable, "-u", script], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+        output = b""
+        try:
+            while marker.encode() not in output:
+                chunk = os.read(proc.stdout.fileno(), 4096)
+                if not chunk or perf_counter() - start > timeout:
+                    raise RuntimeError(f"'{marker}' não apareceu na saída de {script}: {output.decode(errors='replace')}")
+                output += chunk
+            times.append(perf_counter() - start)
+            proc.communicate(b"sair\n", timeout=timeout)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    elapsed = statistics.median(times)
+    print(f"Tempo até o primeiro prompt de {script}: {elapsed:.3f}s (mediana de {repeats}; "
+          f"min {min(times):.3f}s, max {max(times):.3f}s)")
+    return {"median_s": elapsed, "times_s": times}
+
+
+def bench_server(sessions=8, requests=4, concurrency=2, max_queue=64, token_delay=0.002):
+    """
+    Teste de carga do server.py com o agente do main.py contra o OllamaStubServer: `sessions` clientes
+    simultâneos, cada um com a sua sessão, enviam `requests` tarefas em sequência.
+    """
+    from smolagents.monitoring import LogLevel
+
+    import main
+    from benchSuite import load_test, main_agent_script, scripted_replies
+    from fakes import OllamaStubServer
+    from metrics import percentile
+    from ollamaModel import OllamaChatbotModel
+    from server import AgentServer, ModelScheduler, SessionManager
+
+    def agent_factory(model):
+        agent = main.build_agent(model, response_cache=False, hub_tools=False)
+        agent.logger.level = LogLevel.OFF
+        stub.replies = scripted_replies(main_agent_script(agent.code_block_tags))
+        return agent
+
+    with OllamaStubServer(token_delay=token_delay) as stub:
+        scheduler = ModelScheduler(lambda: OllamaChatbotModel(host=stub.url, verbose=False),
+                                   max_concurrency=concurrency, max_queue=max_queue)
+        with AgentServer(SessionManager(agent_factory, scheduler), port=0) as server:
+            start = perf_counter()
+            latencies, statuses = load_test(server.url, sessions, requests)
+            elapsed = perf_counter() - start
+            stats = server.scheduler.stats()
+            print(server.metrics.report())
+
+    print(f"{sessions} sessões x {requests} tarefas, {concurrency} chamadas de modelo simultâneas: "
+          f"{len(latencies) / elapsed:.2f} tarefas/s | p50 {percentile(latencies, 50):.3f}s "
+          f"| p95 {percentile(latencies, 95):.3f}s | status {statuses} | fila máx. {stats['max_queue_depth']}")
+    return {"tasks_per_s": len(latencies) / elapsed, "p50_s": percentile(latencies, 50),
+            "p95_s": percentile(latencies, 95), "statuses": statuses, "max_queue_depth": stats["max_queue_depth"]}
+
+
+def _verbose_observation(step):
+    # Como no uso real: resultados de busca longos que se repetem entre passos e resumos de ações
+    results = [f"[{i}] Petrobras (PETR4) - notícia {i % 5}: analistas comentam o resultado trimestral, "
+               f"dividendos e a produção do pré-sal em {2020 + i % 5}. https://example.com/noticia/{i % 5}"
+               for i in range(step, step + 8)]
+    summary = [f"PETR4.SA: fechamento R$ {38 + step * 0.1:.2f}, variação {step * 0.3:+.1f}% no dia",
+               "Setor: Energy | País: Brazil | Valor de mercado: R$ 480 bi | P/L: 4.1"]
+    return "\n".join(results + summary)
+
+
+def _growing_observation(step):
+    # Observação que repete todas as linhas da anterior e acrescenta novas (ex.: um print acumulado a cada passo)
+    return "\n".join(f"[{i}] PETR4.SA: fechamento R$ {38 + i * 0.1:.2f} em 2024-01-{i + 1:02d}, volume {1000 + i}"
+                     for i in range(step * 20))
+
+
+def _missing_lines(original, compacted):
+    """Linhas da última observação que não aparecem no prompt (ela só é truncada se o histórico passar do budget)."""
+    from memoryCompaction import _text, is_observation
+
+    last = [_text(m) for m in original if is_observation(m)][-1]
+    prompt = "\n".join(_text(m) or "" for m in compacted)
+    return sum(1 for line in last.splitlines() if line.strip() and line.strip() not in prompt)
+
+
+def bench_compaction(steps=6, budget=3000, keep_last=1, max_observation_tokens=200):
+    """Tokens enviados por passo, antes e depois da compactação, com observações repetitivas e acumuladas."""
+    from memoryCompaction import CompactingModel
+
+    cases = (("observações repetitivas", _verbose_observation), ("observações acumuladas", _growing_observation))
+    history = {}
+    for label, observation in cases:
+        sent = []
+        model = CompactingModel(lambda messages, **kwargs: sent.append(messages), budget=budget,
+                                keep_last=keep_last, max_observation_tokens=max_observation_tokens)
+        missing = 0
+        for messages in _simulated_run(steps, observation=observation):
+            model(messages)
+            if any(m["role"] == "tool-response" for m in messages):
+                missing += _missing_lines(messages, sent[-1])
+        print(f"\n{label}:")
+        print(model.report())
+        print(f"linhas da observação mais recente ausentes do prompt: {missing}")
+        history[label] = model.history
+    return history
+
+
+def bench_router(runs=20, steps=4, hard_step=2, local_latency=0.01, remote_latency=0.05, error_rate=0.1,
+                 hang_rate=0.05, timeout=0.2):
+    """ModelRouter com um backend local instável e um remoto pago, comparado com usar só o remoto."""
+    from fakes import FlakyModel, StubAgent, StubChatModel
+    from modelRouter import ModelRouter, Route
+
+    def routes(local_route=True):
+        local = FlakyModel(StubChatModel(("local",), latency=local_latency, model_id="local"),
+                           error_rate=error_rate, hang_rate=hang_rate, hang_s=timeout * 5)
+        remote = StubChatModel(("remote",), latency=remote_latency, model_id="remote")
+        selected = [Route("local", local, timeout=timeout)] if local_route else []
+        return selected + [Route("remote", remote, timeout=timeout * 10, cost_per_1k_input=0.5, cost_per_1k_output=1.5)]
+
+    results = {}
+    for label, router in (("roteado", ModelRouter(routes(), hard_step=hard_step, cooldown=1.0)),
+                          ("só remoto", ModelRouter(routes(local_route=False)))):
+        agent = StubAgent(router, steps=steps)
+        start = perf_counter()
+        for i in range(runs):
+            agent.run(f"Tarefa {i}")
+        elapsed = perf_counter() - start
+        cost = sum(s["cost"] for s in router.stats().values())
+        results[label] = {"elapsed_s": elapsed, "cost": cost, "routes": router.stats()}
+        print(f"\n{label}: {runs} runs x {steps} passos em {elapsed:.2f}s | custo {cost:.4f}")
+        print(router.report())
+    return results
+
+
+def bench_suite(scenarios=None, baseline=None, save_baseline=None, output=None, threshold=0.2, memory=True,
+                record=False):
+    """
+    Suíte reproduzível (modelos stub, tools gravadas, áudio sintético) comparada com um baseline salvo.
+    Retorna o número de regressões.
+    """
+    import json
+
+    import benchSuite
+
+    if record:
+        fixtures = benchSuite.record_fixtures()
+        print(f"Fixtures gravadas em {fixtures.path}")
+
+    results = benchSuite.run_suite(scenarios, memory=memory)
+    baseline_file = baseline or benchSuite.BASELINE_FILE
+    previous = None
+    if os.path.exists(baseline_file):
+        with open(baseline_file, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    print(benchSuite.report(results, previous))
+
+    regressions = benchSuite.compare(results, previous, threshold) if previous else []
+    if previous is None:
+        print(f"Sem baseline em {baseline_file} (use --save-baseline para criar um).")
+    elif regressions:
+        print(f"Regressões acima de {threshold:.0%} em relação a {baseline_file}:")
+        for line in regressions:
+            print(f"  {line}")
+    else:
+        print(f"Sem regressões acima de {threshold:.0%} em relação a {baseline_file}.")
+
+    if output:
+        benchSuite.save(results, output)
+    if save_baseline:
+        benchSuite.save(results, save_baseline)
+        print(f"Baseline salvo em {save_baseline}")
+    return len(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do agente.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stt = sub.add_parser("stt", help="Latência de transcrição a frio e a quente.")
+    stt.add_argument("audio_file")
+    stt.add_argument("--model-size", default="small")
+    stt.add_argument("--repeats", type=int, default=3)
+
+    longform = sub.add_parser("longform", help="Fator de tempo real da transcrição de áudio longo em CPU.")
+    longform.add_argument("audio_file", nargs="?", default=None, help="Se omitido, usa fala sintética.")
+    longform.add_argument("--seconds", type=float, default=300.0, help="Duração do áudio sintético.")
+    longform.add_argument("--model-size", default="small")
+    longform.add_argument("--backend", default="whisper", choices=("whisper", "faster-whisper"))
+    longform.add_argument("--workers", default="0,2", help="Quantidades de workers comparadas (ex.: 0,2,4).")
+    longform.add_argument("--window", type=float, default=30.0, help="Duração máxima das janelas (s).")
+
+    stretch = sub.add_parser("stretch", help="Vazão do time-stretch do TTS.")
+    stretch.add_argument("--seconds", type=float, default=60.0)
+    stretch.add_argument("--sample-rate", type=int, default=16000)
+    stretch.add_argument("--speed-factor", type=float, default=1.25)
+
+    prefix = sub.add_parser("prefix", help="Tokens de prompt avaliados por passo (reuso do cache KV).")
+    prefix.add_argument("--steps", type=int, default=6)
+    prefix.add_argument("--host", default=None, help="Servidor Ollama para medir o prompt_eval_count real.")
+
+    imports = sub.add_parser("imports", help="Perfil de importação (python -X importtime) de um módulo.")
+    imports.add_argument("module", nargs="?", default="main")
+    imports.add_argument("--top", type=int, default=15)
+
+    startup = sub.add_parser("startup", help="Tempo até o primeiro prompt do agente interativo.")
+    startup.add_argument("--script", default="main.py")
+    startup.add_argument("--repeats", type=int, default=3)
+
+    server = sub.add_parser("server", help="Teste de carga do servidor de sessões com o modelo stub.")
+    server.add_argument("--sessions", type=int, default=8)
+    server.add_argument("--requests", type=int, default=4)
+    server.add_argument("--concurrency", type=int, default=2)
+    server.add_argument("--max-queue", type=int, default=64)
+    server.add_argument("--token-delay", type=float, default=0.002)
+
+    compaction = sub.add_parser("compaction", help="Tokens por passo antes e depois da compactação do histórico.")
+    compaction.add_argument("--steps", type=int, default=6)
+    compaction.add_argument("--budget", type=int, default=3000)
+    compaction.add_argument("--keep-last", type=int, default=1)
+    compaction.add_argument("--max-observation-tokens", type=int, default=200)
+
+    router = sub.add_parser("router", help="Roteamento entre backends stub (local e remoto) com falhas injetadas.")
+    router.add_argument("--runs", type=int, default=20)
+    router.add_argument("--steps", type=int, default=4)
+    router.add_argument("--hard-step", type=int, default=2)
+    router.add_argument("--error-rate", type=float, default=0.1)
+    router.add_argument("--hang-rate", type=float, default=0.05)
+    router.add_argument("--timeout", type=float, default=0.2, help="Timeout da rota local (s).")
+
+    suite = sub.add_parser("suite", help="Suíte reproduzível com modelos stub, comparada com um baseline.")
+    suite.add_argument("--scenarios", default=None, help="Cenários separados por vírgula (agent,batch,server,voice).")
+    suite.add_argument("--baseline", default=None, help="Baseline para comparar (padrão: benchmarks/baseline.json).")
+    suite.add_argument("--save-baseline", default=None, help="Grava os resultados como novo baseline neste arquivo.")
+    suite.add_argument("--output", default=None, help="Grava os resultados em JSON.")
+    suite.add_argument("--threshold", type=float, default=0.2, help="Piora relativa considerada regressão.")
+    suite.add_argument("--no-memory", action="store_true", help="Pula a medição de pico de memória.")
+    suite.add_argument("--record-fixtures", action="store_true",
+                       help="Grava de novo as respostas das tools chamando-as de verdade (usa a rede).")
+
+    args = parser.parse_args()
+    if args.command == "stt":
+        bench_stt(args.audio_file, model_size=args.model_size, repeats=args.repeats)
+    elif args.command == "longform":
+        bench_longform(args.audio_file, args.seconds, args.model_size, args.backend,
+                       [int(n) for n in args.workers.split(",")], args.window)
+    elif args.command == "stretch":
+        bench_time_stretch(args.seconds, args.sample_rate, args.speed_factor)
+    elif args.command == "prefix":
+        bench_prefix(args.steps, args.host)
+    elif args.command == "imports":
+        bench_imports(args.module, args.top)
+    elif args.command == "startup":
+        bench_startup(args.script, repeats=args.repeats)
+    elif args.command == "server":
+        bench_server(args.sessions, args.requests, args.concurrency, args.max_queue, args.token_delay)
+    elif args.command == "compaction":
+        bench_compaction(args.steps, args.budget, args.keep_last, args.max_observation_tokens)
+    elif args.command == "router":
+        bench_router(args.runs, args.steps, args.hard_step, error_rate=args.error_rate, hang_rate=args.hang_rate,
+                     timeout=args.timeout)
+    elif args.command == "suite":
+        scenarios = args.scenarios.split(",") if args.scenarios else None
+        regressions = bench_suite(scenarios, args.baseline, args.save_baseline, args.output, args.threshold,
+                                  memory=not args.no_memory, record=args.record_fixtures)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
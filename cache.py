@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Sentinela para "não encontrado" (None pode ser um valor válido no cache)
+MISSING = object()
+
+
+class TTLCache:
+    """Cache em memória, seguro entre threads, com validade (TTL) por entrada e limite de tamanho (LRU)."""
+
+    def __init__(self, maxsize=256, ttl=300):
+        """
+        Parâmetros:
+         - maxsize: Quantidade máxima de entradas (None = sem limite).
+         - ttl: Validade padrão das entradas em segundos (None = não expiram).
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    def get(self, key, default=None, count=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    if count:
+                        self.hits += 1
+                    return value
+                del self._data[key]
+            if count:
+                self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+            self._data.move_to_end(key)
+            while self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[0] if entry is not None else default
+
+    def remove_if(self, predicate):
+        """Remove as entradas cujas chaves satisfazem predicate(chave). Retorna quantas foram removidas."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+class SingleFlight:
+    """
+    Junta chamadas concorrentes para a mesma chave: só a primeira executa, as demais esperam o mesmo resultado.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def begin(self, key):
+        """Retorna (future, leader); o leader produz o valor e chama finish(), os demais esperam o future."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def finish(self, key, value=None, error=None):
+        with self._lock:
+            future = self._inflight.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Executa fn(*args, **kwargs) uma única vez para chamadas simultâneas com a mesma chave."""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result()
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, value)
+        return value
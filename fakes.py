@@ -0,0 +1,434 @@
+import datetime
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from promptCache import estimate_tokens
+from responseCache import normalize_messages
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Conexões fechadas pelo cliente (ex.: fim de um teste de carga) não imprimem traceback
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class _StubServer:
+    """Base dos servidores locais: sobe um ThreadingHTTPServer em uma porta livre, em thread de fundo."""
+
+    handler_class = None
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.requests = []
+        self._server = _QuietHTTPServer((host, port), self.handler_class)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        stub.requests.append({"path": self.path, "body": body})
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+
+        messages = body.get("messages", [])
+        options = body.get("options") or {}
+        reply = stub.reply_for(messages) if messages else ""
+        tokens = re.findall(r"\S+\s*|\s+", reply)[:options.get("num_predict") or None]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = ""
+        try:
+            stops = (options.get("stop") or []) if stub.honor_stop else []
+            for token in tokens:
+                hits = [(sent + token).index(s) for s in stops if s in sent + token]
+                if hits:
+                    # Envia só o texto anterior ao marcador de parada, como o Ollama
+                    token = (sent + token)[:min(hits)][len(sent):]
+                    tokens = []
+                time.sleep(stub.token_delay)
+                sent += token
+                chunk = {"model": body.get("model"), "message": {"role": "assistant", "content": token}, "done": False}
+                self._send_chunk(json.dumps(chunk).encode() + b"\n")
+                if not tokens:
+                    break
+            prompt_tokens = sum(len(m.get("content", "").split()) for m in messages)
+            final = {"model": body.get("model"), "message": {"role": "assistant", "content": ""}, "done": True,
+                     "prompt_eval_count": prompt_tokens, "eval_count": len(re.findall(r"\S+\s*|\s+", sent))}
+            self._send_chunk(json.dumps(final).encode() + b"\n")
+            self._send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # O cliente fechou o stream (parada antecipada)
+            stub.cancelled += 1
+
+
+class OllamaStubServer(_StubServer):
+    """
+    Servidor local que imita o endpoint /api/chat do Ollama, com respostas em streaming (NDJSON).
+
+    Parâmetros:
+     - replies: Lista de respostas devolvidas em ordem (a última se repete), ou função messages -> texto.
+     - token_delay: Atraso por token, em segundos, para simular a velocidade de geração.
+     - honor_stop: Se False, ignora options["stop"] (para exercitar a parada feita pelo cliente).
+    """
+
+    handler_class = _OllamaHandler
+
+    def __init__(self, replies=("Thought: ok\nCode:\n```py\nfinal_answer('ok')\n```<end_code>",), token_delay=0.0,
+                 honor_stop=True, **kwargs):
+        super().__init__(**kwargs)
+        self.replies = replies
+        self.token_delay = token_delay
+        self.honor_stop = honor_stop
+        self.cancelled = 0
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def reply_for(self, messages):
+        if callable(self.replies):
+            return self.replies(messages)
+        with self._lock:
+            reply = self.replies[min(self._calls, len(self.replies) - 1)]
+            self._calls += 1
+        return reply
+
+
+class StubAgent:
+    """Agente mínimo para testes de carga do servidor: cada run chama o modelo `steps` vezes, como um CodeAgent."""
+
+    def __init__(self, model, steps=2, system_prompt="You are a helpful assistant."):
+        self.model = model
+        self.steps = steps
+        self.system_prompt = system_prompt
+        self.messages = []
+
+    def run(self, task, reset=True):
+        if reset or not self.messages:
+            self.messages = [{"role": "system", "content": self.system_prompt}]
+        self.messages.append({"role": "user", "content": task})
+        text = ""
+        for step in range(1, self.steps + 1):
+            output = self.model(list(self.messages), stop_sequences=["Observation:"])
+            text = output["generated_text"] if isinstance(output, dict) else getattr(output, "content", output)
+            self.messages.append({"role": "assistant", "content": text})
+            self.messages.append({"role": "user", "content": f"Observation: passo {step} ok"})
+        return text
+
+
+class StubChatModel:
+    """
+    Substituto determinístico do OllamaChatbotModel/HfApiModel para benchmarks e testes; a resposta depende só
+    do passo do run.
+
+    Parâmetros:
+     - replies: Respostas por passo (a última se repete), ou função messages -> texto.
+     - latency: Atraso fixo de cada chamada, em segundos.
+     - tokens_per_s: Velocidade de geração simulada. Se None, a geração é instantânea.
+    """
+
+    def __init__(self, replies=("Thought: ok\n<code>\nfinal_answer('ok')\n</code>",), latency=0.0, tokens_per_s=None,
+                 model_id="stub-model"):
+        self.replies = replies
+        self.latency = latency
+        self.tokens_per_s = tokens_per_s
+        self.model_id = model_id
+        self.calls = 0
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+
+    def reply_for(self, messages):
+        if callable(self.replies):
+            return self.replies(messages)
+        step = sum(1 for m in messages if m["role"] == "assistant")
+        return self.replies[min(step, len(self.replies) - 1)]
+
+    def generate(self, messages, stop_sequences=None, **kwargs):
+        from smolagents.models import ChatMessage, MessageRole
+        from smolagents.monitoring import TokenUsage
+
+        messages = normalize_messages(messages)
+        text = self.reply_for(messages)
+        for stop in stop_sequences or []:
+            if stop in text:
+                text = text[:text.index(stop)]
+        input_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        output_tokens = estimate_tokens(text)
+        delay = self.latency + (output_tokens / self.tokens_per_s if self.tokens_per_s else 0.0)
+        if delay:
+            time.sleep(delay)
+        self.calls += 1
+        self.last_input_token_count = input_tokens
+        self.last_output_token_count = output_tokens
+        return ChatMessage(role=MessageRole.ASSISTANT, content=text,
+                           token_usage=TokenUsage(input_tokens=input_tokens, output_tokens=output_tokens))
+
+    def __call__(self, messages, **kwargs):
+        return self.generate(messages, **kwargs)
+
+
+class FlakyModel:
+    """
+    Envolve um modelo e injeta falhas (error_rate levanta ConnectionError, hang_rate demora hang_s a mais),
+    com semente fixa. Aceita deadline, como o OllamaChatbotModel.
+    """
+
+    supports_deadline = True
+
+    def __init__(self, model, error_rate=0.0, hang_rate=0.0, hang_s=5.0, seed=0):
+        import random
+
+        self.model = model
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_s = hang_s
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def generate(self, messages, deadline=None, **kwargs):
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.error_rate:
+            raise ConnectionError("Falha simulada do backend.")
+        if draw < self.error_rate + self.hang_rate:
+            if deadline is not None and time.monotonic() + self.hang_s > deadline:
+                time.sleep(max(0.0, deadline - time.monotonic()))
+                raise TimeoutError("Prazo esgotado durante a chamada simulada.")
+            time.sleep(self.hang_s)
+        return self.model.generate(messages, **kwargs)
+
+    def __call__(self, messages, **kwargs):
+        return self.generate(messages, **kwargs)
+
+
+class ToolFixtures:
+    """
+    Gravação e reprodução das respostas das tools, para rodar o agente sem rede (yfinance, DuckDuckGo, BCB).
+
+    Parâmetros:
+     - path: Arquivo de fixtures.
+     - mode: "replay" (responde só com o que está gravado) ou "record" (chama a tool de verdade e grava).
+     - simulate_latency: No replay, espera a latência gravada antes de responder.
+    """
+
+    def __init__(self, path, mode="replay", simulate_latency=False):
+        if mode not in ("replay", "record"):
+            raise ValueError("mode deve ser 'replay' ou 'record'.")
+        self.path = path
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self.misses = 0
+        self._originals = {}
+        self._lock = threading.Lock()
+        self.fixtures = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+
+    @staticmethod
+    def key(kwargs):
+        return json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+
+    def _wrap(self, tool):
+        forward = tool.forward
+
+        @functools.wraps(forward)
+        def fixture_forward(**kwargs):
+            key = self.key(kwargs)
+            if self.mode == "record":
+                start = time.perf_counter()
+                result = forward(**kwargs)
+                with self._lock:
+                    self.fixtures.setdefault(tool.name, {})[key] = {
+                        "result": result, "latency_s": round(time.perf_counter() - start, 4)}
+                return result
+            entry = self.fixtures.get(tool.name, {}).get(key)
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                return f"Error: no recorded response for {tool.name}({key})"
+            if self.simulate_latency:
+                time.sleep(entry["latency_s"])
+            return entry["result"]
+
+        return fixture_forward
+
+    def install(self, tools):
+        """Substitui o forward das tools (exceto final_answer) pela gravação/reprodução."""
+        for tool in tools:
+            if tool.name == "final_answer" or tool.name in self._originals:
+                continue
+            self._originals[tool.name] = (tool, tool.forward)
+            tool.forward = self._wrap(tool)
+        return tools
+
+    def uninstall(self):
+        for tool, forward in self._originals.values():
+            tool.forward = forward
+        self._originals.clear()
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            data = json.dumps(self.fixtures, indent=2, sort_keys=True, ensure_ascii=False, default=str)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+
+
+def synthetic_speech(turns=3, speech_s=1.0, silence_s=1.0, sample_rate=16000, frequency=220.0):
+    """Sinal com `turns` falas sintéticas (tons com harmônicos) separadas por silêncio com ruído baixo."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(speech_s * sample_rate)) / sample_rate
+    envelope = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.05)
+    speech = envelope * sum(0.2 / k * np.sin(2 * np.pi * frequency * k * t) for k in (1, 2, 3))
+    silence = lambda: 0.001 * rng.standard_normal(int(silence_s * sample_rate))
+    parts = [silence()]
+    for _ in range(turns):
+        parts += [speech, silence()]
+    return np.concatenate(parts).astype(np.float32)
+
+
+class StubTranscriber:
+    """Substituto do STT.transcribe_audio: leva audio_s * rtf segundos e devolve os textos em ordem (em ciclo)."""
+
+    def __init__(self, texts=("Qual o preço da PETR4?",), rtf=0.05, sample_rate=16000):
+        self.texts = texts
+        self.rtf = rtf
+        self.sample_rate = sample_rate
+        self.calls = 0
+
+    def __call__(self, audio, *args, **kwargs):
+        time.sleep(len(audio) / self.sample_rate * self.rtf)
+        text = self.texts[self.calls % len(self.texts)]
+        self.calls += 1
+        return text
+
+
+class StubSynthesizer:
+    """Substituto do TTS.synthesize_sentences: gera silêncio frase a frase, levando duração * rtf segundos."""
+
+    def __init__(self, sample_rate=16000, seconds_per_char=0.06, rtf=0.05):
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+        self.rtf = rtf
+
+    def __call__(self, text, *args, **kwargs):
+        from TTS import split_sentences
+
+        for sentence in split_sentences(text):
+            duration = len(sentence) * self.seconds_per_char
+            time.sleep(duration * self.rtf)
+            yield np.zeros(int(duration * self.sample_rate), dtype=np.float32), self.sample_rate
+
+
+class _BCBHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        stub.requests.append(self.path)
+        time.sleep(stub.delay)
+        if stub.status is not None:
+            self._reply(stub.status, {"erro": "serviço indisponível"})
+            return
+        match = re.fullmatch(r"/dados/serie/bcdata\.sgs\.(\d+)/dados(/ultimos/(\d+))?", url.path)
+        if match is None or int(match.group(1)) not in stub.series:
+            self._reply(404, {"erro": "série não encontrada"})
+            return
+        records = stub.series[int(match.group(1))]
+        if match.group(3):
+            self._reply(200, records[-int(match.group(3)):])
+            return
+        query = parse_qs(url.query)
+        parse = lambda d: datetime.datetime.strptime(d, "%d/%m/%Y").date()
+        start = parse(query["dataInicial"][0]) if "dataInicial" in query else datetime.date.min
+        end = parse(query["dataFinal"][0]) if "dataFinal" in query else datetime.date.max
+        self._reply(200, [r for r in records if start <= parse(r["data"]) <= end])
+
+
+class FakeBCBServer(_StubServer):
+    """
+    Servidor local que imita a API SGS do Banco Central (/dados/serie/bcdata.sgs.{code}/dados[/ultimos/N]).
+
+    Parâmetros:
+     - series: {código: [{"data": "dd/mm/aaaa", "valor": "..."}]}. Se None, Selic, CDI e IPCA fictícios.
+     - delay: Atraso de cada resposta, em segundos.
+     - status: Se informado (ex.: 503), todas as respostas são esse erro.
+    """
+
+    handler_class = _BCBHandler
+
+    def __init__(self, series=None, delay=0.0, status=None, **kwargs):
+        super().__init__(**kwargs)
+        if series is None:
+            days = [datetime.date(2025, 1, 1) + datetime.timedelta(days=i) for i in range(30)]
+            series = {code: [{"data": d.strftime("%d/%m/%Y"), "valor": f"{value:.6f}"} for d in days]
+                      for code, value in ((11, 0.050788), (12, 0.050788), (433, 0.52))}
+        self.series = series
+        self.delay = delay
+        self.status = status
+
+    @property
+    def base_url(self):
+        """URL no formato esperado por bcb.BCBClient(base_url=...)."""
+        return self.url + "/dados/serie/bcdata.sgs.{code}/dados"
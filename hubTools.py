@@ -0,0 +1,54 @@
+import functools
+import threading
+
+from smolagents import Tool, load_tool
+
+
+class LazyHubTool(Tool):
+    """Tool do Hub carregada no primeiro uso (ou por warm()), com nome e entradas declarados de antemão."""
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, repo_id, name, description, inputs, output_type, **load_kwargs):
+        self.repo_id = repo_id
+        self.name = name
+        self.description = description
+        self.inputs = inputs
+        self.output_type = output_type
+        self.load_kwargs = load_kwargs
+        self._tool = None
+        self._warming = False
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def load(self):
+        with self._lock:
+            if self._tool is None:
+                self._tool = load_tool(self.repo_id, **self.load_kwargs)
+            return self._tool
+
+    def warm(self):
+        """Carrega a tool em uma thread de fundo (só a primeira chamada inicia o carregamento)."""
+        # Sem o _lock, que fica com a thread de carregamento durante todo o download
+        if self._tool is not None or self._warming:
+            return
+        self._warming = True
+        threading.Thread(target=self.load, name=f"load-{self.name}", daemon=True).start()
+
+    def forward(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def image_generation_tool():
+    """Tool agents-course/text-to-image, carregada sob demanda e compartilhada por todos os agentes do processo."""
+    return LazyHubTool(
+        "agents-course/text-to-image",
+        name="image_generator",
+        description="This tool creates an image according to a prompt, which is a text description.",
+        inputs={"prompt": {"type": "string", "description": "The image generator prompt. Don't hesitate to add "
+                                                            "details in the prompt to make the image look better, "
+                                                            "like 'high-res, photorealistic', etc."}},
+        output_type="image",
+        trust_remote_code=True,
+    )
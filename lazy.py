@@ -0,0 +1,61 @@
+import importlib
+import threading
+import types
+from concurrent.futures import Future
+
+
+class LazyModule(types.ModuleType):
+    """Módulo que só é importado de fato no primeiro acesso a um atributo."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Retorna um proxy do módulo `name`, importado apenas quando for usado pela primeira vez."""
+    return LazyModule(name)
+
+
+def warm_in_background(func, *args, name=None, **kwargs):
+    """Executa func(*args, **kwargs) em uma thread de fundo e retorna um Future com o resultado."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name or f"warm-{getattr(func, '__name__', 'task')}", daemon=True).start()
+    return future
+
+
+class Deferred:
+    """Proxy para um objeto criado em segundo plano (Future); o primeiro acesso espera ele ficar pronto."""
+
+    def __init__(self, future):
+        self._future = future
+
+    def __getattr__(self, name):
+        return getattr(self._future.result(), name)
+
+    def ready(self):
+        return self._future.done()
@@ -1,42 +1,112 @@
-import yaml
-from smolagents import CodeAgent, load_tool
-from tools.final_answer import FinalAnswerTool
-from ollamaModel import OllamaChatbotModel
-from my_tools import math_operation, get_current_time_in_timezone, internet_search
-
-# Carrega templates do prompt
-with open(r"C:\Users\amori\Documents\Codigos\Assistent\Agent\prompts.yaml", "r") as stream:
-    prompt_templates = yaml.safe_load(stream)
-
-# Instância do seu modelo local (Ollama)
-model = OllamaChatbotModel(max_tokens=2096, temperature=0.5)
-
-# Instância dos tools
-final_answer = FinalAnswerTool()
-image_generation_tool = load_tool("agents-course/text-to-image", trust_remote_code=True)
-
-# Cria o agente com a lista de tools desejadas
-agent = CodeAgent(
-    model=model,
-    tools=[
+import os
+import threading
+
+from lazy import warm_in_background
+from promptCache import load_prompt_templates
+
+
+def _warm_up(model):
+    try:
+        model.warm_up()
+    except Exception as e:  # Ollama fora do ar: o primeiro passo do agente mostra o erro completo
+        print(f"Aviso: não foi possível pré-carregar o modelo no Ollama ({e})")
+
+
+def build_agent(model=None, response_cache=True, hub_tools=True):
+    """
+    Monta o agente com o modelo local (Ollama) e as tools; os imports pesados ficam aqui dentro.
+
+    Parâmetros:
+     - model: Substitui o OllamaChatbotModel (ex.: o modelo de uma sessão do server.py).
+     - response_cache: Se False, desliga o cache de respostas em disco.
+     - hub_tools: Se False, deixa de fora as tools baixadas do Hub (agente montado sem rede).
+    """
+    from smolagents import CodeAgent
+    try:
+        from tools.final_answer import FinalAnswerTool
+    except ImportError:  # pasta tools/ do template do curso ausente: o smolagents tem a mesma tool
+        from smolagents import FinalAnswerTool
+    from ollamaModel import OllamaChatbotModel
+    from responseCache import CachedModel
+    from memoryCompaction import CompactingModel
+    from toolCache import install_run_scope
+    from tracing import install_tracing
+    from parallelTools import ParallelToolExecutor
+    from promptCache import install_prompt_cache
+    from mytools import math_operation, get_current_time_in_timezone, internet_search
+
+    # Carrega templates do prompt (AGENT_PROMPTS_FILE ou o prompts.yaml do projeto)
+    prompt_templates = load_prompt_templates()
+
+    # Instância do seu modelo local (Ollama), já carregado no servidor em segundo plano
+    if model is None:
+        model = OllamaChatbotModel(max_tokens=2096, temperature=0.5)
+        threading.Thread(target=_warm_up, args=(model,), daemon=True).start()
+        # Opcional (AGENT_REMOTE_MODEL=id ou URL de endpoint do HF): passos difíceis vão para o modelo remoto
+        if os.environ.get("AGENT_REMOTE_MODEL"):
+            try:
+                from smolagents import HfApiModel
+            except ImportError:  # smolagents >= 1.14: HfApiModel passou a se chamar InferenceClientModel
+                from smolagents import InferenceClientModel as HfApiModel
+            from modelRouter import hybrid_model
+
+            remote = HfApiModel(max_tokens=2096, temperature=0.5, model_id=os.environ["AGENT_REMOTE_MODEL"])
+            model = hybrid_model(model, remote)
+    # Respostas já vistas (mesmas mensagens e configurações) saem do cache em disco, sem chamar o modelo;
+    # todos os agentes do processo (ex.: as sessões do server.py) usam a mesma conexão SQLite
+    if response_cache:
+        model = CachedModel(model)
+    # Observações antigas e repetidas são compactadas para o histórico caber no contexto do modelo local
+    model = CompactingModel(model, budget=3000)
+
+    # Instância dos tools
+    final_answer = FinalAnswerTool()
+
+    tools = [
         final_answer,
-        image_generation_tool,
         get_current_time_in_timezone,
         math_operation,
         internet_search,
-    ],
-    max_steps=6,
-    verbosity_level=1,
-    prompt_templates=prompt_templates
-)
+    ]
+    # A tool de imagem do Hub é baixada em segundo plano e só bloqueia se usada antes disso
+    if hub_tools:
+        from hubTools import image_generation_tool
+
+        image_tool = image_generation_tool()
+        image_tool.warm()
+        tools.insert(1, image_tool)
+
+    # Opcional (AGENT_PARALLEL_TOOLS=1): expõe parallel_map para chamadas independentes de tools em paralelo
+    if os.environ.get("AGENT_PARALLEL_TOOLS") == "1":
+        tools.append(ParallelToolExecutor(tools, per_tool_limits={"internet_search": 2}).as_tool())
+
+    # Cria o agente com a lista de tools desejadas
+    agent = CodeAgent(
+        model=model,
+        tools=tools,
+        max_steps=6,
+        verbosity_level=1,
+        prompt_templates=prompt_templates
+    )
+    # Reaproveita o system prompt renderizado entre runs (prefixo estável para o cache KV do servidor)
+    install_prompt_cache(agent)
+    # Cada run começa com os caches de tools por run vazios
+    install_run_scope(agent)
+    # Spans de modelo, tools e execução de código (ligados com AGENT_TRACE=arquivo.jsonl ou .json)
+    install_tracing(agent)
+    return agent
+
 
 def main():
     print("=== Bem-vindo ao Agente Interativo ===")
+    # O agente é montado em segundo plano enquanto o primeiro comando é digitado
+    agent_ready = warm_in_background(build_agent)
     while True:
         prompt = input("\nDigite seu comando (ou 'sair' para encerrar): ")
         if prompt.strip().lower() == "sair":
             break
         try:
+            agent = agent_ready.result()
             response = agent.run(prompt)
             print("\nResposta do agente:")
             print(response)
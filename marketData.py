@@ -0,0 +1,211 @@
+import importlib.util
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from cache import MISSING, SingleFlight, TTLCache
+from lazy import lazy_import
+
+# pandas só é importado na primeira consulta, para não pesar na inicialização do agente
+pd = lazy_import("pandas")
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# Períodos da cotação do dia (get_stock_price, get_index_price): ficam só no cache em memória, com o TTL curto
+INTRADAY_PERIODS = {"1d", "5d"}
+
+
+def empty_history():
+    return pd.DataFrame(columns=COLUMNS, dtype=float)
+
+
+class YFinanceSource:
+    """Fonte de dados de mercado via yfinance, com downloads de vários tickers em uma única chamada."""
+
+    def history(self, tickers, period):
+        """Retorna {ticker: DataFrame OHLCV} para todos os tickers, em um único download."""
+        import yfinance as yf
+
+        # auto_adjust=True, como o Ticker.history usado antes: preços ajustados por dividendos e desdobramentos
+        data = yf.download(list(tickers), period=period, group_by="ticker", auto_adjust=True,
+                           progress=False, threads=True)
+        result = {}
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex):
+                frame = data[ticker] if ticker in data.columns.get_level_values(0) else empty_history()
+            else:
+                frame = data
+            result[ticker] = frame.dropna(how="all")
+        return result
+
+    def info(self, ticker):
+        import yfinance as yf
+
+        return yf.Ticker(ticker).info
+
+
+class MockMarketSource:
+    """Fonte determinística e offline (preços gerados a partir do ticker), com a interface de YFinanceSource."""
+
+    PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260,
+                   "ytd": 200, "max": 2520}
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.history_calls = []
+        self.info_calls = []
+
+    def history(self, tickers, period):
+        self.history_calls.append((tuple(tickers), period))
+        time.sleep(self.delay)
+        days = self.PERIOD_DAYS.get(period, 252)
+        index = pd.bdate_range(end=pd.Timestamp("2025-01-31"), periods=days)
+        result = {}
+        for ticker in tickers:
+            rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+            close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, days)))
+            result[ticker] = pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99,
+                                           "Close": close, "Volume": rng.integers(1e5, 1e7, days)}, index=index)
+        return result
+
+    def info(self, ticker):
+        self.info_calls.append(ticker)
+        time.sleep(self.delay)
+        return {"longName": f"{ticker} Inc.", "sector": "Technology", "industry": "Software",
+                "country": "Brazil", "marketCap": 10 ** 9, "trailingPE": 15.0}
+
+
+def _parquet_available():
+    # Só verifica se o pacote existe; o import de fato fica para a primeira leitura/escrita
+    return any(importlib.util.find_spec(name) is not None for name in ("pyarrow", "fastparquet"))
+
+
+class MarketDataService:
+    """
+    Dados de mercado das tools de ações: cache em memória por (ticker, período), downloads em lote, junção de
+    buscas simultâneas e cache em disco (Parquet) dos históricos.
+    """
+
+    def __init__(self, source=None, history_ttl=300, info_ttl=3600, disk_dir=".cache/market", disk_ttl=3600,
+                 maxsize=512):
+        """
+        Parâmetros:
+         - source: Fonte dos dados (YFinanceSource, MockMarketSource...). Se None, usa YFinanceSource.
+         - history_ttl: Validade em memória dos históricos de preço, em segundos.
+         - info_ttl: Validade das informações cadastrais (.info), em segundos.
+         - disk_dir: Pasta do cache em disco. Se None (ou sem pyarrow/fastparquet), o cache em disco é desativado.
+         - disk_ttl: Validade dos arquivos do cache em disco (só históricos de vários dias), em segundos.
+         - maxsize: Quantidade máxima de entradas em cada cache em memória.
+        """
+        self.source = source if source is not None else YFinanceSource()
+        self.history_cache = TTLCache(maxsize, history_ttl)
+        self.info_cache = TTLCache(maxsize, info_ttl)
+        self.disk_dir = disk_dir if disk_dir is not None and _parquet_available() else None
+        self.disk_ttl = disk_ttl
+        self._flights = SingleFlight()
+        self._disk_lock = threading.Lock()
+        if self.disk_dir is not None:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, ticker, period):
+        return os.path.join(self.disk_dir, f"{re.sub(r'[^A-Za-z0-9._-]', '_', ticker)}_{period}.parquet")
+
+    def _on_disk(self, period):
+        return self.disk_dir is not None and period not in INTRADAY_PERIODS
+
+    def _read_disk(self, ticker, period):
+        if not self._on_disk(period):
+            return None
+        path = self._disk_path(ticker, period)
+        try:
+            if time.time() - os.path.getmtime(path) > self.disk_ttl:
+                return None
+            return pd.read_parquet(path)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, ticker, period, frame):
+        if not self._on_disk(period):
+            return
+        path = self._disk_path(ticker, period)
+        # O cache em disco é só uma otimização: disco cheio ou sem permissão não pode derrubar a consulta
+        try:
+            with self._disk_lock:
+                frame.to_parquet(path + ".tmp")
+                os.replace(path + ".tmp", path)
+        except Exception as e:
+            print(f"Erro ao gravar o cache de {ticker} ({period}) em disco: {e}")
+            try:
+                os.remove(path + ".tmp")
+            except OSError:
+                pass
+
+    def histories(self, tickers, period="1y"):
+        """Retorna {ticker: DataFrame OHLCV}, buscando os que faltam no cache em um único download."""
+        tickers = list(dict.fromkeys(tickers))
+        result, waiting, to_fetch = {}, {}, []
+        for ticker in tickers:
+            frame = self.history_cache.get((ticker, period), MISSING)
+            if frame is MISSING:
+                frame = self._read_disk(ticker, period)
+                if frame is not None:
+                    self.history_cache.set((ticker, period), frame)
+            if frame is not None and frame is not MISSING:
+                result[ticker] = frame
+                continue
+            future, leader = self._flights.begin((ticker, period))
+            if leader:
+                to_fetch.append(ticker)
+            else:
+                waiting[ticker] = future
+
+        if to_fetch:
+            pending = list(to_fetch)
+            error = None
+            try:
+                fetched = self.source.history(to_fetch, period)
+                for ticker in to_fetch:
+                    frame = fetched.get(ticker, empty_history())
+                    # Resultados vazios não são guardados: podem ser uma falha momentânea
+                    if not frame.empty:
+                        self.history_cache.set((ticker, period), frame)
+                        self._write_disk(ticker, period, frame)
+                    result[ticker] = frame
+                    pending.remove(ticker)
+                    self._flights.finish((ticker, period), frame)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                # Quem espera por um ticker não concluído recebe o erro, em vez de esperar para sempre
+                for ticker in pending:
+                    self._flights.finish((ticker, period), error=error or RuntimeError("Busca interrompida."))
+
+        for ticker, future in waiting.items():
+            result[ticker] = future.result()
+        return {ticker: result[ticker] for ticker in tickers}
+
+    def history(self, ticker, period="1y"):
+        return self.histories([ticker], period)[ticker]
+
+    def last_close(self, ticker):
+        """Último preço de fechamento do ticker (IndexError se não houver dados)."""
+        return self.history(ticker, "1d")["Close"].iloc[-1]
+
+    def info(self, ticker):
+        info = self.info_cache.get(ticker, MISSING)
+        if info is MISSING:
+            info = self._flights.do(("info", ticker), self.source.info, ticker)
+            self.info_cache.set(ticker, info)
+        return info
+
+    def stats(self):
+        return {"history": self.history_cache.stats(), "info": self.info_cache.stats(),
+                "coalesced": self._flights.coalesced}
+
+
+# Instância usada pelas tools do mytools.py
+market_data = MarketDataService()
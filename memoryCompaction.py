@@ -0,0 +1,197 @@
+import hashlib
+import re
+import threading
+
+from promptCache import estimate_tokens
+from tracing import annotate
+
+OBSERVATION_PREFIX = "Observation:"
+# Linhas curtas ("", "---", "Price:") se repetem naturalmente e não valem a deduplicação
+_MIN_DEDUP_CHARS = 20
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _role(message):
+    role = message["role"] if isinstance(message, dict) else message.role
+    return getattr(role, "value", role)
+
+
+def _text(message):
+    """Texto da mensagem, ou None se ela tiver partes que não são texto (imagens), que não são compactadas."""
+    content = message.get("content") if isinstance(message, dict) else message.content
+    if content is None or isinstance(content, str):
+        return content or ""
+    if any(part.get("type") != "text" for part in content):
+        return None
+    return "\n".join(part.get("text", "") for part in content)
+
+
+def is_observation(message):
+    if _role(message) == "tool-response":
+        return True
+    text = _text(message)
+    return _role(message) == "user" and text is not None and text.lstrip().startswith(OBSERVATION_PREFIX)
+
+
+def truncate_text(text, max_tokens):
+    """Mantém o começo e o fim do texto (2/3 e 1/3 de max_tokens), marcando quantos tokens foram omitidos."""
+    tokens = list(re.finditer(r"\w+|[^\w\s]", text))
+    if len(tokens) <= max_tokens:
+        return text
+    head, tail = max_tokens * 2 // 3, max_tokens - max_tokens * 2 // 3
+    omitted = len(tokens) - head - tail
+    start = text[:tokens[head - 1].end()] if head else ""
+    end = text[tokens[len(tokens) - tail].start():] if tail else ""
+    return f"{start}\n[... {omitted} tokens omitidos ...]\n{end}"
+
+
+class MemoryCompactor:
+    """
+    Reduz as observações (saídas das tools) do histórico: deduplica observações e linhas repetidas, trunca as
+    antigas e, acima de budget, omite as antigas e por último trunca as recentes.
+    Dentro do budget, o prefixo do histórico só muda na observação que saiu das recentes; omitir uma observação
+    muda o prefixo a partir dela, e o cache KV do prefixo estável (promptCache) só vale até ali.
+    """
+
+    def __init__(self, budget=3000, keep_last=1, max_observation_tokens=200, summarize=None):
+        """
+        Parâmetros:
+         - budget: Tokens máximos (estimados) do histórico enviado ao modelo.
+         - keep_last: Quantidade de observações mais recentes mantidas por inteiro.
+         - max_observation_tokens: Tamanho das observações antigas depois de truncadas.
+         - summarize: Função (texto, max_tokens) -> resumo, usada no lugar do truncamento (ex.: um modelo pequeno).
+        """
+        self.budget = budget
+        self.keep_last = keep_last
+        self.max_observation_tokens = max_observation_tokens
+        self.summarize = summarize
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def _shorten(self, text):
+        if self.summarize is None:
+            return truncate_text(text, self.max_observation_tokens)
+        key = hashlib.sha256(text.encode()).hexdigest()
+        with self._lock:
+            if key not in self._summaries:
+                self._summaries[key] = self.summarize(text, self.max_observation_tokens)
+            return self._summaries[key]
+
+    def _compact_observations(self, texts, observations, recent, elided):
+        compacted = {}  # índice -> novo texto
+        seen_observations = {}  # texto normalizado -> número de uma observação mantida sem alterações
+        seen_lines = set()  # linhas que continuam no resultado (as de observações omitidas não contam)
+        stats = {"deduped": 0, "lines_deduped": 0, "truncated": 0, "elided": 0}
+        for n, i in enumerate(observations, 1):
+            if i in elided:
+                compacted[i] = f"{OBSERVATION_PREFIX}\n[Observação {n} omitida para caber no limite de contexto]"
+                stats["elided"] += 1
+                continue
+            text = texts[i]
+            normalized = _WHITESPACE.sub(" ", text).strip()
+            if normalized in seen_observations:
+                compacted[i] = f"{OBSERVATION_PREFIX}\n[Mesma saída da observação {seen_observations[normalized]}]"
+                stats["deduped"] += 1
+                continue
+
+            kept, repeated = [], 0
+            for line in text.splitlines():
+                key = line.strip()
+                if len(key) >= _MIN_DEDUP_CHARS and key in seen_lines:
+                    repeated += 1
+                    continue
+                kept.append(line)
+            if repeated:
+                text = "\n".join(kept) + f"\n[... {repeated} linhas repetidas de observações anteriores]"
+
+            if i not in recent and estimate_tokens(text) > self.max_observation_tokens:
+                # Truncada, ela não serve de referência inteira; só as linhas que sobram no texto curto contam
+                text = self._shorten(texts[i])
+                stats["truncated"] += 1
+                kept = text.splitlines()
+            else:
+                stats["lines_deduped"] += repeated
+                if not repeated:
+                    seen_observations[normalized] = n
+            seen_lines.update(line.strip() for line in kept if len(line.strip()) >= _MIN_DEDUP_CHARS)
+            if text != texts[i]:
+                compacted[i] = text
+        return compacted, stats
+
+    def compact(self, messages):
+        """Retorna (mensagens compactadas, estatísticas); as mensagens não alteradas são devolvidas como vieram."""
+        texts = [_text(m) for m in messages]
+        observations = [i for i, m in enumerate(messages) if texts[i] is not None and is_observation(m)]
+        recent = set(observations[len(observations) - self.keep_last:]) if self.keep_last else set()
+        candidates = [i for i in observations if i not in recent]
+        before = sum(estimate_tokens(t) for t in texts if t is not None)
+
+        elided = set()
+        while True:
+            compacted, stats = self._compact_observations(texts, observations, recent, elided)
+            total = sum(estimate_tokens(compacted.get(i, t)) for i, t in enumerate(texts) if t is not None)
+            if total <= self.budget or len(elided) == len(candidates):
+                break
+            # Omite a observação antiga seguinte, da mais antiga para a mais nova
+            elided.add(candidates[len(elided)])
+
+        # Último recurso: trunca as observações recentes, da mais antiga para a mais nova
+        for i in sorted(recent):
+            if total <= self.budget:
+                break
+            text = compacted.get(i, texts[i])
+            size = estimate_tokens(text)
+            # A marca de omissão ("[... N tokens omitidos ...]") conta uns 12 tokens
+            compacted[i] = truncate_text(text, max(size - (total - self.budget) - 12, 0))
+            total += estimate_tokens(compacted[i]) - size
+            stats["truncated"] += 1
+
+        result = list(messages)
+        for i, text in compacted.items():
+            result[i] = {"role": _role(messages[i]), "content": [{"type": "text", "text": text}]}
+        stats.update(tokens_before=before, tokens_after=total, messages=len(messages),
+                     over_budget=max(total - self.budget, 0))
+        return result, stats
+
+
+class CompactingModel:
+    """Envolve um modelo e compacta o histórico antes de cada chamada com um MemoryCompactor."""
+
+    def __init__(self, model, compactor=None, **compactor_kwargs):
+        self.model = model
+        self.compactor = compactor or MemoryCompactor(**compactor_kwargs)
+        self.history = []
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def generate(self, messages, **kwargs):
+        return self.model.generate(self._compact(messages), **kwargs)
+
+    def __call__(self, messages, **kwargs):
+        return self.model(self._compact(messages), **kwargs)
+
+    def _compact(self, messages):
+        if isinstance(messages, (str, dict)):
+            return messages
+        compacted, stats = self.compactor.compact(messages)
+        self.history.append(stats)
+        annotate(tokens_before=stats["tokens_before"], tokens_after=stats["tokens_after"])
+        return compacted
+
+    def report(self):
+        """Tabela com os tokens enviados em cada chamada, antes e depois da compactação."""
+        lines = [f"{'chamada':>7} {'msgs':>5} {'antes':>7} {'depois':>7} {'economia':>9} "
+                 f"{'dedup':>6} {'linhas':>7} {'trunc':>6} {'omit':>5}"]
+        for n, s in enumerate(self.history, 1):
+            saved = 1 - s["tokens_after"] / s["tokens_before"] if s["tokens_before"] else 0.0
+            lines.append(f"{n:>7} {s['messages']:>5} {s['tokens_before']:>7} {s['tokens_after']:>7} {saved:>9.0%} "
+                         f"{s['deduped']:>6} {s['lines_deduped']:>7} {s['truncated']:>6} {s['elided']:>5}")
+        before = sum(s["tokens_before"] for s in self.history)
+        after = sum(s["tokens_after"] for s in self.history)
+        if before:
+            lines.append(f"{'total':>7} {'':>5} {before:>7} {after:>7} {1 - after / before:>9.0%}")
+        over = [n for n, s in enumerate(self.history, 1) if s.get("over_budget")]
+        if over:
+            lines.append(f"chamadas acima do budget mesmo depois de compactar: {over}")
+        return "\n".join(lines)
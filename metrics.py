@@ -0,0 +1,97 @@
+import bisect
+import threading
+from collections import deque
+
+# Limites (em segundos) dos baldes do histograma: de 10 ms a ~2 min
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def percentile(values, p):
+    """Percentil p (0 a 100) por interpolação linear; None se não houver valores."""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class LatencyHistogram:
+    """
+    Histograma de latências em baldes fixos, mais uma janela das últimas amostras para os percentis.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # o último balde é "acima do maior limite"
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.recent.append(seconds)
+
+    def percentile(self, p):
+        with self._lock:
+            return percentile(list(self.recent), p)
+
+    def summary(self):
+        with self._lock:
+            recent = list(self.recent)
+            return {
+                "count": self.count,
+                "mean": self.total / self.count if self.count else None,
+                "p50": percentile(recent, 50),
+                "p95": percentile(recent, 95),
+                "max": self.max if self.count else None,
+            }
+
+
+class MetricsRegistry:
+    """Conjunto de histogramas e contadores nomeados, seguro para uso entre threads."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = LatencyHistogram()
+            return self.histograms[name]
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        return {
+            "histograms": {name: h.summary() for name, h in histograms.items()},
+            "counters": counters,
+        }
+
+    def report(self):
+        """Tabela de texto com as latências (em segundos) e os contadores."""
+        snap = self.snapshot()
+        lines = [f"{'etapa':<20} {'n':>6} {'média':>8} {'p50':>8} {'p95':>8} {'máx':>8}"]
+        fmt = lambda v: f"{v:8.3f}" if v is not None else f"{'-':>8}"
+        for name, s in sorted(snap["histograms"].items()):
+            lines.append(f"{name:<20} {s['count']:>6} {fmt(s['mean'])} {fmt(s['p50'])} {fmt(s['p95'])} {fmt(s['max'])}")
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"{name:<20} {value:>6}")
+        return "\n".join(lines)
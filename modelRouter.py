@@ -0,0 +1,262 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from time import monotonic, perf_counter
+
+from metrics import MetricsRegistry
+from promptCache import estimate_tokens
+from responseCache import normalize_messages
+from tracing import annotate
+
+
+class AllRoutesFailed(RuntimeError):
+    """Nenhuma rota conseguiu responder à chamada; a exceção da última tentativa fica em __cause__."""
+
+
+class RouteSaturated(RuntimeError):
+    """A rota já tem max_in_flight chamadas em andamento (presas em um backend travado)."""
+
+
+def _as_chat_message(model, response):
+    """Converte a resposta de uma rota (ChatMessage, texto ou {"generated_text"}) em ChatMessage com token_usage."""
+    from smolagents.models import ChatMessage, MessageRole
+    from smolagents.monitoring import TokenUsage
+
+    if isinstance(response, ChatMessage):
+        message = response
+    elif isinstance(response, str):
+        message = ChatMessage(role=MessageRole.ASSISTANT, content=response)
+    elif isinstance(response, dict) and isinstance(response.get("generated_text"), str):
+        message = ChatMessage(role=MessageRole.ASSISTANT, content=response["generated_text"])
+    else:
+        raise TypeError(f"Resposta de tipo inesperado do modelo: {type(response).__name__}.")
+    if message.token_usage is None:
+        input_tokens = getattr(model, "last_input_token_count", None)
+        output_tokens = getattr(model, "last_output_token_count", None)
+        if input_tokens is not None or output_tokens is not None:
+            message.token_usage = TokenUsage(input_tokens=input_tokens or 0, output_tokens=output_tokens or 0)
+    return message
+
+
+def _usage(message):
+    usage = message.token_usage
+    return (usage.input_tokens, usage.output_tokens) if usage is not None else (None, None)
+
+
+class Route:
+    """Um backend do roteador (ex.: Ollama local, endpoint remoto), com custo, limites e estatísticas próprias."""
+
+    def __init__(self, name, model, max_prompt_tokens=None, timeout=None, cost_per_1k_input=0.0,
+                 cost_per_1k_output=0.0, max_in_flight=4):
+        """
+        Parâmetros:
+         - name: Nome da rota nas métricas e no relatório (ex.: "local", "remote").
+         - model: Modelo com a interface do smolagents (generate/__call__).
+         - max_prompt_tokens: Maior prompt (tokens estimados) que a rota aceita.
+         - timeout: Tempo máximo de uma chamada, em segundos.
+         - cost_per_1k_input / cost_per_1k_output: Custo por mil tokens de entrada e de saída.
+         - max_in_flight: Chamadas com timeout em andamento ao mesmo tempo.
+        """
+        self.name = name
+        self.model = model
+        self.max_prompt_tokens = max_prompt_tokens
+        self.timeout = timeout
+        self.cost_per_1k_input = cost_per_1k_input
+        self.cost_per_1k_output = cost_per_1k_output
+        self.max_in_flight = max_in_flight
+        # Threads das chamadas com timeout, reaproveitadas entre chamadas; nunca há fila, porque in_flight
+        # não passa de max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"model-route-{name}")
+        self.in_flight = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.retry_at = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.saturated = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+
+    def call_cost(self, input_tokens, output_tokens):
+        return ((input_tokens or 0) * self.cost_per_1k_input + (output_tokens or 0) * self.cost_per_1k_output) / 1000
+
+    def stats(self):
+        return {"calls": self.calls, "errors": self.errors, "timeouts": self.timeouts, "saturated": self.saturated,
+                "in_flight": self.in_flight, "latency_ewma": self.latency,
+                "error_rate": self.error_rate, "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens, "cost": self.cost}
+
+
+class ModelRouter:
+    """
+    Modelo que escolhe, a cada passo do agente, qual rota responde: passos fáceis começam pela mais barata e
+    difíceis pela mais forte, rotas degradadas vão para o fim e, se uma rota falha, a chamada segue para a próxima.
+    """
+
+    def __init__(self, routes, long_prompt_tokens=2000, hard_step=3, latency_budget=None, max_error_rate=0.5,
+                 alpha=0.2, cooldown=30.0, metrics=None):
+        """
+        Parâmetros:
+         - routes: Lista de Route, da mais barata para a mais forte.
+         - long_prompt_tokens: Tamanho de prompt (tokens estimados) a partir do qual o passo é difícil.
+         - hard_step: Passo do run (0 = primeiro) a partir do qual o passo é difícil. None desliga.
+         - latency_budget: Latência média (s) acima da qual a rota é degradada. None desliga.
+         - max_error_rate: Taxa de erros recente (0 a 1) acima da qual a rota é degradada.
+         - alpha: Peso da chamada mais recente nas médias móveis de latência e de erros.
+         - cooldown: Segundos até uma rota degradada voltar à sua posição normal.
+         - metrics: MetricsRegistry compartilhado. Se None, cria um novo.
+        """
+        if not routes:
+            raise ValueError("ModelRouter precisa de ao menos uma rota.")
+        self.routes = list(routes)
+        self.long_prompt_tokens = long_prompt_tokens
+        self.hard_step = hard_step
+        self.latency_budget = latency_budget
+        self.max_error_rate = max_error_rate
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.metrics = metrics or MetricsRegistry()
+        self.last_route = None
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # model_id, temperature, max_tokens... vêm da primeira rota
+        return getattr(self.routes[0].model, name)
+
+    def _degraded(self, route, now):
+        slow = self.latency_budget is not None and route.latency is not None and route.latency > self.latency_budget
+        saturated = route.timeout is not None and route.in_flight >= route.max_in_flight
+        return saturated or ((slow or route.error_rate > self.max_error_rate) and now < route.retry_at)
+
+    def plan(self, messages):
+        """Ordem em que as rotas serão tentadas para estas mensagens, e o motivo da escolha."""
+        normalized = normalize_messages(messages)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in normalized)
+        step = sum(1 for m in normalized if m["role"] == "assistant")
+        hard = prompt_tokens >= self.long_prompt_tokens or (self.hard_step is not None and step >= self.hard_step)
+        routes = self.routes[::-1] if hard else list(self.routes)
+
+        fits = [r for r in routes if r.max_prompt_tokens is None or prompt_tokens <= r.max_prompt_tokens]
+        routes = fits or routes
+        now = monotonic()
+        with self._lock:
+            healthy = [r for r in routes if not self._degraded(r, now)]
+        ordered = healthy + [r for r in routes if r not in healthy]
+        return ordered, {"prompt_tokens": prompt_tokens, "step": step, "hard": hard,
+                         "degraded": [r.name for r in routes if r not in healthy]}
+
+    def _record(self, route, elapsed, error=None, timed_out=False, input_tokens=None, output_tokens=None):
+        with self._lock:
+            route.calls += 1
+            route.latency = elapsed if route.latency is None else route.latency + self.alpha * (elapsed - route.latency)
+            route.error_rate += self.alpha * ((1.0 if error else 0.0) - route.error_rate)
+            if timed_out:
+                route.timeouts += 1
+            elif error:
+                route.errors += 1
+            else:
+                route.input_tokens += input_tokens or 0
+                route.output_tokens += output_tokens or 0
+                route.cost += route.call_cost(input_tokens, output_tokens)
+            slow = self.latency_budget is not None and route.latency > self.latency_budget
+            if slow or route.error_rate > self.max_error_rate:
+                route.retry_at = monotonic() + self.cooldown
+        self.metrics.observe(f"route.{route.name}", elapsed)
+        self.metrics.incr(f"route.{route.name}.calls")
+        if error:
+            self.metrics.incr(f"route.{route.name}.{'timeouts' if timed_out else 'errors'}")
+
+    def _release(self, route):
+        with self._lock:
+            route.in_flight -= 1
+
+    def _invoke(self, route, method, messages, kwargs):
+        target = route.model if method == "__call__" else getattr(route.model, method)
+        if route.timeout is None:
+            return target(messages, **kwargs)
+        # A chamada só é aceita se houver thread livre no pool da rota: o prazo começa a contar quando ela começa
+        # a rodar, nunca na fila atrás de chamadas presas em um backend travado
+        with self._lock:
+            if route.in_flight >= route.max_in_flight:
+                route.saturated += 1
+                raise RouteSaturated(f"Rota {route.name} tem {route.in_flight} chamadas em andamento.")
+            route.in_flight += 1
+        deadline = monotonic() + route.timeout
+        if getattr(route.model, "supports_deadline", False):
+            # O modelo interrompe a geração e fecha a conexão ao estourar o prazo (ex.: OllamaChatbotModel)
+            kwargs = {**kwargs, "deadline": deadline}
+        future = route.executor.submit(contextvars.copy_context().run, target, messages, **kwargs)
+        future.add_done_callback(lambda _: self._release(route))
+        try:
+            return future.result(max(0.0, deadline - monotonic()))
+        except FuturesTimeout:
+            # Sem suporte a deadline, a chamada termina sozinha em segundo plano e o resultado é descartado
+            raise TimeoutError(f"Rota {route.name} não respondeu em {route.timeout}s.") from None
+
+    def _call(self, method, messages, **kwargs):
+        routes, reason = self.plan(messages)
+        error = None
+        for attempt, route in enumerate(routes):
+            start = perf_counter()
+            try:
+                response = _as_chat_message(route.model, self._invoke(route, method, messages, kwargs))
+            except RouteSaturated as e:
+                # Nem chegou a chamar o backend: não entra nas médias de latência e de erros da rota
+                self.metrics.incr(f"route.{route.name}.saturated")
+                error = e
+                continue
+            except Exception as e:
+                self._record(route, perf_counter() - start, error=e, timed_out=isinstance(e, TimeoutError))
+                error = e
+                continue
+            input_tokens, output_tokens = _usage(response)
+            self._record(route, perf_counter() - start, input_tokens=input_tokens, output_tokens=output_tokens)
+            if attempt:
+                self.metrics.incr("route_failovers")
+            self.last_route = route.name
+            self.last_input_token_count = input_tokens
+            self.last_output_token_count = output_tokens
+            annotate(route=route.name, failovers=attempt, hard=reason["hard"])
+            return response
+        self.metrics.incr("route_failures")
+        raise AllRoutesFailed(f"Nenhuma rota respondeu ({', '.join(r.name for r in routes)}).") from error
+
+    def generate(self, messages, **kwargs):
+        return self._call("generate", messages, **kwargs)
+
+    def __call__(self, messages, **kwargs):
+        return self._call("__call__", messages, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {route.name: route.stats() for route in self.routes}
+
+    def report(self):
+        """Tabela com chamadas, erros, latência e custo acumulado de cada rota."""
+        snapshot = self.metrics.snapshot()["histograms"]
+        lines = [f"{'rota':<12} {'chamadas':>8} {'erros':>6} {'timeouts':>8} {'p50':>8} {'p95':>8} "
+                 f"{'tokens in':>10} {'tokens out':>10} {'custo':>9}"]
+        fmt = lambda v: f"{v:8.3f}" if v is not None else f"{'-':>8}"
+        for name, s in self.stats().items():
+            latency = snapshot.get(f"route.{name}", {})
+            lines.append(f"{name:<12} {s['calls']:>8} {s['errors']:>6} {s['timeouts']:>8} {fmt(latency.get('p50'))} "
+                         f"{fmt(latency.get('p95'))} {s['input_tokens']:>10} {s['output_tokens']:>10} "
+                         f"{s['cost']:>9.4f}")
+        failovers = self.metrics.snapshot()["counters"].get("route_failovers", 0)
+        lines.append(f"failovers: {failovers}")
+        return "\n".join(lines)
+
+
+def hybrid_model(local, remote, local_max_prompt_tokens=6000, remote_timeout=60.0, local_timeout=120.0,
+                 remote_cost=(0.0, 0.0), **router_kwargs):
+    """Roteador com o modelo local para os passos baratos e o remoto (remote_cost por mil tokens) para os difíceis."""
+    return ModelRouter([
+        Route("local", local, max_prompt_tokens=local_max_prompt_tokens, timeout=local_timeout),
+        Route("remote", remote, timeout=remote_timeout, cost_per_1k_input=remote_cost[0],
+              cost_per_1k_output=remote_cost[1]),
+    ], **router_kwargs)
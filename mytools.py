@@ -1,11 +1,22 @@
 from smolagents import DuckDuckGoSearchTool,tool
-import yfinance as yf
+from marketData import market_data
+from toolCache import cached_tool
+import bcb
 import datetime
 import pytz
 import os
 import platform
 import time
 
+_search = None
+
+def _search_tool():
+    # Uma única instância do DuckDuckGoSearchTool para todas as buscas
+    global _search
+    if _search is None:
+        _search = DuckDuckGoSearchTool()
+    return _search
+
 # Below is an example of a tool that does nothing. Amaze us with your creativity !
 @tool
 def math_operation(arg1: float, arg2: float, operation: str) -> float:
@@ -57,10 +68,12 @@ def internet_search(query: str) -> str:
     Returns:
         The top search result.
     """
-    seach = DuckDuckGoSearchTool()
-    results = seach.forward(query)
+    results = _search_tool().forward(query)
     return results if results else "No results found."
 
+# O cache envolve a instância criada pelo @tool (e não a função), para o smolagents continuar lendo só o @tool
+internet_search = cached_tool(ttl=600, scope="run")(internet_search)
+
 
 @tool
 def get_stock_info(ticker: str) -> str:
@@ -74,8 +87,7 @@ def get_stock_info(ticker: str) -> str:
     """
     
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = market_data.info(ticker)
         return (f"Company: {info.get('longName', 'N/A')}\n"
                 f"Sector: {info.get('sector', 'N/A')}\n"
                 f"Industry: {info.get('industry', 'N/A')}\n"
@@ -85,6 +97,8 @@ def get_stock_info(ticker: str) -> str:
     except Exception as e:
         return f"Error fetching stock information: {str(e)}"
 
+get_stock_info = cached_tool(ttl=3600, normalize={"ticker": str.upper})(get_stock_info)
+
 @tool
 def get_stock_price(ticker: str) -> str:
     """
@@ -96,12 +110,13 @@ def get_stock_price(ticker: str) -> str:
         The latest stock price.
     """
     try:
-        stock = yf.Ticker(ticker)
-        price = stock.history(period="1d")["Close"].iloc[-1]
+        price = market_data.last_close(ticker)
         return f"The latest closing price for {ticker} is ${price:.2f}."
     except Exception as e:
         return f"Error fetching stock price: {str(e)}"
 
+get_stock_price = cached_tool(ttl=300, normalize={"ticker": str.upper})(get_stock_price)
+
 @tool
 def compare_stocks(ticker1: str, ticker2: str, period: str = "1y") -> str:
     """
@@ -115,8 +130,10 @@ def compare_stocks(ticker1: str, ticker2: str, period: str = "1y") -> str:
         A summary of their percentage change over the period.
     """
     try:
-        stock1 = yf.Ticker(ticker1).history(period=period)["Close"]
-        stock2 = yf.Ticker(ticker2).history(period=period)["Close"]
+        # Um único download para os dois tickers
+        histories = market_data.histories([ticker1, ticker2], period)
+        stock1 = histories[ticker1]["Close"]
+        stock2 = histories[ticker2]["Close"]
 
         if stock1.empty or stock2.empty:
             return "Insufficient data for comparison."
@@ -129,6 +146,8 @@ def compare_stocks(ticker1: str, ticker2: str, period: str = "1y") -> str:
     except Exception as e:
         return f"Error comparing stocks: {str(e)}"
 
+compare_stocks = cached_tool(ttl=300, normalize={"ticker1": str.upper, "ticker2": str.upper})(compare_stocks)
+
 @tool
 def get_index_price(index: str) -> str:
     """
@@ -140,12 +159,13 @@ def get_index_price(index: str) -> str:
         The latest closing price of the index.
     """
     try:
-        ticker = yf.Ticker(index)
-        price = ticker.history(period="1d")["Close"].iloc[-1]
+        price = market_data.last_close(index)
         return f"The latest closing price for {index} is {price:.2f}."
     except Exception as e:
         return f"Error fetching index price: {str(e)}"
 
+get_index_price = cached_tool(ttl=300, normalize={"index": str.upper})(get_index_price)
+
 @tool
 def get_interest_rates() -> str:
     """
@@ -153,16 +173,12 @@ def get_interest_rates() -> str:
     Returns:
         The latest values for Brazil's key interest rates.
     """
-    import requests
     try:
-        response = requests.get("https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados/ultimos/1?formato=json")  # SELIC
-        selic = response.json()[0]['valor']
-
-        response = requests.get("https://api.bcb.gov.br/dados/serie/bcdata.sgs.12/dados/ultimos/1?formato=json")  # CDI
-        cdi = response.json()[0]['valor']
-
-        response = requests.get("https://api.bcb.gov.br/dados/serie/bcdata.sgs.433/dados/ultimos/1?formato=json")  # IPCA
-        ipca = response.json()[0]['valor']
+        # As três séries são buscadas em paralelo e ficam em cache até o dia seguinte
+        rates = bcb.get_client().latest_many([bcb.SELIC, bcb.CDI, bcb.IPCA])
+        selic = rates[bcb.SELIC]['valor']
+        cdi = rates[bcb.CDI]['valor']
+        ipca = rates[bcb.IPCA]['valor']
 
         return (f"Selic atual: {selic}% ao ano\n"
                 f"CDI atual: {cdi}% ao ano\n"
@@ -183,15 +199,13 @@ def compare_fixed_income(amount: float, period: int, cdi_percentage: float) -> s
     Returns:
         The final amount in CDB vs. savings.
     """
-    import requests
     try:
-        # Buscar CDI atual
-        response = requests.get("https://api.bcb.gov.br/dados/serie/bcdata.sgs.12/dados/ultimos/1?formato=json")
-        cdi = float(response.json()[0]['valor']) / 100
+        # Buscar CDI e Selic atuais
+        rates = bcb.get_client().latest_many([bcb.CDI, bcb.SELIC])
+        cdi = float(rates[bcb.CDI]['valor']) / 100
 
         # Poupança rende 70% da Selic quando Selic > 8.5%
-        response = requests.get("https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados/ultimos/1?formato=json")
-        selic = float(response.json()[0]['valor']) / 100
+        selic = float(rates[bcb.SELIC]['valor']) / 100
         poupanca_rendimento = 0.7 * selic if selic > 0.085 else 0.005
 
         # Calcular rendimentos
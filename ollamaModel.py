@@ -1,27 +1,148 @@
+from time import monotonic, perf_counter
+
 import ollama
 
+from promptCache import stable_messages
+
+# O CodeAgent descarta tudo o que vem depois deste marcador, então a geração pode parar nele
+END_CODE = "<end_code>"
+
+# Papéis do smolagents que o Ollama não conhece
+ROLE_CONVERSIONS = {
+    "tool-call": "assistant",
+    "tool-response": "user",
+}
+
+
+def to_chat_messages(prompt):
+    """
+    Converte o prompt do agente (texto ou mensagens do smolagents) em mensagens de chat do Ollama, normalizadas
+    para o prefixo ser idêntico entre passos.
+    """
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    if isinstance(prompt, dict):
+        prompt = [prompt]
+
+    messages = []
+    for message in prompt:
+        # Dicts ou ChatMessage do smolagents
+        role = message["role"] if isinstance(message, dict) else message.role
+        role = getattr(role, "value", role)
+        role = ROLE_CONVERSIONS.get(role, role)
+        content = (message.get("content") if isinstance(message, dict) else message.content) or ""
+        if isinstance(content, list):
+            content = "\n".join(part.get("text", "") for part in content if part.get("type") == "text")
+        messages.append({"role": role, "content": content})
+    return stable_messages(messages)
+
+
 class OllamaChatbotModel:
-    def __init__(self, max_tokens=2096, temperature=0.5):
+    # generate aceita deadline (em monotonic()): o ModelScheduler e o ModelRouter repassam o prazo do chamador
+    supports_deadline = True
+
+    def __init__(self, max_tokens=2096, temperature=0.5, model_id="llama3.2:3b", host=None, keep_alive="30m",
+                 timeout=120, verbose=True):
+        """
+        Parâmetros:
+         - max_tokens: Máximo de tokens gerados por resposta (num_predict).
+         - temperature: Temperatura de amostragem.
+         - model_id: Modelo servido pelo Ollama.
+         - host: Endereço do servidor. Se None, usa OLLAMA_HOST ou http://localhost:11434.
+         - keep_alive: Por quanto tempo o Ollama mantém o modelo carregado entre as chamadas.
+         - timeout: Timeout das requisições HTTP em segundos.
+         - verbose: Se True, imprime os tokens à medida que chegam.
+        """
         self.max_tokens = max_tokens
         self.temperature = temperature
+        self.model_id = model_id
+        self.keep_alive = keep_alive
+        self.verbose = verbose
+        # O Client mantém um único cliente HTTP (com pool de conexões) para todas as chamadas
+        self.client = ollama.Client(host=host, timeout=timeout)
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+        self.last_stats = {}
 
-    def send_message(self, prompt: str) -> str:
-        if isinstance(prompt, (list, dict)):
-            prompt = str(prompt)
-            
-        resposta = ollama.chat(model='llama3.2:3b',
-                       messages=[{
-                           'role': 'user',
-                           'content': prompt,
-                       }])
-        return resposta['message']['content']
-
-    def generate(self, prompt: str, **kwargs) -> dict:
-        resposta = self.send_message(prompt)
-        # Aqui, encapsulamos a resposta num dict com a chave "generated_text" contendo outro dict com "content"
-        print(resposta)
-        return {"generated_text": resposta}
-
-    def __call__(self, prompt: str, **kwargs) -> dict:
-        return self.generate(prompt, **kwargs)
+    def warm_up(self):
+        """Carrega o modelo no servidor sem gerar nada, para a primeira resposta não pagar o carregamento."""
+        self.client.chat(model=self.model_id, messages=[], keep_alive=self.keep_alive)
+
+    def send_message(self, prompt, stop_sequences=None, deadline=None) -> str:
+        """Gera a resposta em streaming; levanta TimeoutError se passar do deadline (em monotonic())."""
+        stop = [END_CODE] + [s for s in (stop_sequences or []) if s != END_CODE]
+        options = {
+            "num_predict": self.max_tokens,
+            "temperature": self.temperature,
+            "stop": stop,
+        }
+
+        start = perf_counter()
+        first_token = None
+        parts = []
+        final = {}
+        stopped_early = False
+        stream = self.client.chat(model=self.model_id, messages=to_chat_messages(prompt), stream=True,
+                                  options=options, keep_alive=self.keep_alive)
+        try:
+            for chunk in stream:
+                if deadline is not None and monotonic() > deadline:
+                    raise TimeoutError(f"{self.model_id} não terminou a resposta no prazo.")
+                token = chunk["message"]["content"]
+                if token and first_token is None:
+                    first_token = perf_counter()
+                parts.append(token)
+                if self.verbose:
+                    print(token, end="", flush=True)
+                if chunk.get("done"):
+                    final = chunk
+                    break
+                # Para assim que um marcador de parada aparecer, mesmo que o servidor não tenha parado
+                tail = "".join(parts[-8:])
+                if any(s in tail for s in stop):
+                    stopped_early = True
+                    break
+        finally:
+            # Fechar o stream encerra a conexão, e o Ollama interrompe a geração
+            if hasattr(stream, "close"):
+                stream.close()
+        if self.verbose:
+            print()
+
+        text = "".join(parts)
+        for s in stop:
+            if s in text:
+                text = text[:text.index(s)]
 
+        end = perf_counter()
+        completion_tokens = final.get("eval_count") or len(parts)
+        if final.get("eval_duration"):
+            tokens_per_s = final["eval_count"] / (final["eval_duration"] / 1e9)
+        elif first_token is not None and end > first_token:
+            tokens_per_s = completion_tokens / (end - first_token)
+        else:
+            tokens_per_s = None
+        self.last_input_token_count = final.get("prompt_eval_count")
+        self.last_output_token_count = completion_tokens
+        self.last_stats = {
+            "ttft_s": first_token - start if first_token is not None else None,
+            "total_s": end - start,
+            "tokens_per_s": tokens_per_s,
+            "prompt_tokens": final.get("prompt_eval_count"),
+            "completion_tokens": completion_tokens,
+            "stopped_early": stopped_early,
+        }
+        return text
+
+    def generate(self, prompt, stop_sequences=None, deadline=None, **kwargs):
+        """Responde no formato que o CodeAgent espera: ChatMessage do assistente com token_usage."""
+        from smolagents.models import ChatMessage, MessageRole
+        from smolagents.monitoring import TokenUsage
+
+        resposta = self.send_message(prompt, stop_sequences, deadline)
+        usage = TokenUsage(input_tokens=self.last_input_token_count or 0,
+                           output_tokens=self.last_output_token_count or 0)
+        return ChatMessage(role=MessageRole.ASSISTANT, content=resposta, token_usage=usage, raw=self.last_stats)
+
+    def __call__(self, prompt, **kwargs):
+        return self.generate(prompt, **kwargs)
@@ -0,0 +1,83 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from smolagents import Tool
+
+# Tools que não fazem sentido em paralelo (encerram o run)
+EXCLUDED_TOOLS = {"final_answer"}
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool(max_workers=8):
+    """Pool de threads do processo, usado por todos os ParallelToolExecutor (um por agente/sessão)."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        return _shared_pool
+
+
+class ParallelToolExecutor:
+    """Executa chamadas independentes de tools em paralelo, com limite de chamadas simultâneas por tool."""
+
+    def __init__(self, tools, per_tool_limits=None, default_limit=4, pool=None):
+        """
+        Parâmetros:
+         - tools: Lista de tools do agente.
+         - per_tool_limits: {nome_da_tool: chamadas simultâneas}, ex.: {"internet_search": 2}.
+         - default_limit: Chamadas simultâneas das tools que não estão em per_tool_limits.
+         - pool: ThreadPoolExecutor a usar (padrão: shared_pool()).
+        """
+        self.tools = {tool.name: tool for tool in tools if tool.name not in EXCLUDED_TOOLS}
+        limits = per_tool_limits or {}
+        self._semaphores = {name: threading.BoundedSemaphore(limits.get(name, default_limit)) for name in self.tools}
+        self._pool = pool or shared_pool()
+
+    def _run(self, tool_name, kwargs):
+        with self._semaphores[tool_name]:
+            return self.tools[tool_name](**kwargs)
+
+    def submit(self, tool_name, **kwargs):
+        """Agenda uma chamada, com uma cópia do contexto (contextvars) de quem agendou, e retorna um Future."""
+        if tool_name not in self.tools:
+            raise ValueError(f"Tool '{tool_name}' não disponível. Opções: {sorted(self.tools)}")
+        return self._pool.submit(contextvars.copy_context().run, self._run, tool_name, kwargs)
+
+    def map(self, tool_name, arguments, timeout=None):
+        """Chama a tool uma vez por dict de argumentos; os resultados (ou mensagens de erro) vêm na mesma ordem."""
+        futures = [self.submit(tool_name, **kwargs) for kwargs in arguments]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout))
+            except Exception as e:
+                results.append(f"Error calling {tool_name}: {e}")
+        return results
+
+    def as_tool(self):
+        """Tool parallel_map, para o código gerado pelo agente disparar chamadas em paralelo."""
+        return ParallelMapTool(self)
+
+
+class ParallelMapTool(Tool):
+    name = "parallel_map"
+    description = (
+        "Runs the same tool several times concurrently, once per set of arguments, and returns the list of "
+        "results in the same order. Use it instead of a loop when the calls are independent of each other, "
+        "e.g. parallel_map(tool_name=\"get_stock_price\", arguments=[{\"ticker\": \"AAPL\"}, {\"ticker\": \"MSFT\"}])."
+    )
+    inputs = {
+        "tool_name": {"type": "string", "description": "Name of the tool to call."},
+        "arguments": {"type": "array", "description": "List of dicts, each with the keyword arguments of one call."},
+    }
+    output_type = "array"
+
+    def __init__(self, executor):
+        super().__init__()
+        self.executor = executor
+
+    def forward(self, tool_name, arguments):
+        return self.executor.map(tool_name, arguments)
@@ -0,0 +1,243 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from time import perf_counter
+
+import numpy as np
+
+from tracing import get_tracer
+
+# Marca o fim da sequência de trechos na fila de reprodução
+END = None
+
+
+class NullSink:
+    """Saída de áudio que só guarda os trechos recebidos, para rodar e testar sem placa de som."""
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self.sample_rate = None
+        self.chunks = []
+        self._stop = threading.Event()
+
+    def open(self, sample_rate, channels=1):
+        self.sample_rate = sample_rate
+        self._stop.clear()
+
+    def write(self, audio):
+        self.chunks.append(audio)
+        if self.realtime:
+            self._stop.wait(len(audio) / self.sample_rate)
+
+    def abort(self):
+        self._stop.set()
+
+    def close(self):
+        pass
+
+    @property
+    def audio(self):
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.float32)
+
+
+class SoundDeviceSink:
+    """Saída de áudio pelo sounddevice, com um OutputStream mantido aberto entre trechos de mesma taxa."""
+
+    def __init__(self, device=None):
+        self.device = device
+        self.sample_rate = None
+        self.channels = None
+        self._stream = None
+
+    def open(self, sample_rate, channels=1):
+        if self._stream is not None and (sample_rate, channels) == (self.sample_rate, self.channels):
+            return
+        self.close()
+        import sounddevice as sd
+        self._stream = sd.OutputStream(device=self.device, samplerate=sample_rate, channels=channels, dtype='float32')
+        self._stream.start()
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    def write(self, audio):
+        stream = self._stream
+        if stream is not None:
+            stream.write(audio.reshape(-1, self.channels))
+
+    def abort(self):
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream.close()
+            self._stream = None
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class PlaybackHandle:
+    """Reprodução em andamento: pode ser esperada (wait() ou await) ou cancelada (cancel())."""
+
+    def __init__(self):
+        self._future = Future()
+        self._cancelled = threading.Event()
+        self.started_at = perf_counter()
+        self.first_audio_s = None  # Tempo até o primeiro trecho começar a tocar
+        self.played_s = 0.0  # Segundos de áudio entregues à saída
+        self.ended_at = None  # perf_counter() do fim da reprodução
+        self._energy = 0.0
+        self._samples = 0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def done(self):
+        return self._future.done()
+
+    @property
+    def level_db(self):
+        """Nível médio (RMS, em dBFS) do áudio já tocado, ou None se nada tocou ainda."""
+        if not self._samples:
+            return None
+        return float(10 * np.log10(self._energy / self._samples + 1e-12))
+
+    def wait(self, timeout=None):
+        """Bloqueia até a reprodução terminar. Retorna True se tocou até o fim, False se foi cancelada."""
+        return self._future.result(timeout)
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+
+class AudioPlayer:
+    """Toca trechos (audio float32, sample_rate) em segundo plano, enquanto os seguintes ainda são produzidos."""
+
+    def __init__(self, sink=None, max_queue=8, block_ms=100):
+        """
+        Parâmetros:
+         - sink: Saída de áudio (SoundDeviceSink, NullSink...). Se None, usa SoundDeviceSink.
+         - max_queue: Quantidade máxima de trechos produzidos à frente da reprodução.
+         - block_ms: Tamanho dos blocos escritos na saída (quanto cancel() demora para interromper o áudio).
+        """
+        self.sink = sink if sink is not None else SoundDeviceSink()
+        self.max_queue = max_queue
+        self.block_ms = block_ms
+        self.current = None
+        self._lock = threading.Lock()
+
+    def play(self, chunks, interrupt=True):
+        """
+        Inicia a reprodução e retorna um PlaybackHandle imediatamente.
+
+        Parâmetros:
+         - chunks: Iterável de (audio, sample_rate) ou queue.Queue terminada por None.
+         - interrupt: Se True, cancela a reprodução anterior que ainda estiver tocando.
+        """
+        handle = PlaybackHandle()
+        with self._lock:
+            previous, self.current = self.current, handle
+        if previous is not None and not previous.done():
+            if interrupt:
+                previous.cancel()
+                self.sink.abort()
+            else:
+                previous.wait()
+
+        if isinstance(chunks, queue.Queue):
+            pending = chunks
+        else:
+            pending = queue.Queue(maxsize=self.max_queue)
+            threading.Thread(target=self._feed, args=(chunks, pending, handle), name="audio-feed", daemon=True).start()
+        threading.Thread(target=self._play, args=(pending, handle), name="audio-play", daemon=True).start()
+        return handle
+
+    def play_array(self, audio, sample_rate, interrupt=True):
+        return self.play([(audio, sample_rate)], interrupt=interrupt)
+
+    def stop(self):
+        """Interrompe a reprodução atual, se houver."""
+        with self._lock:
+            current = self.current
+        if current is not None and not current.done():
+            current.cancel()
+            self.sink.abort()
+
+    @staticmethod
+    def _put(pending, item, handle):
+        # Não bloqueia para sempre se a reprodução for cancelada com a fila cheia
+        while not handle.cancelled:
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _feed(self, chunks, pending, handle):
+        try:
+            for chunk in chunks:
+                if not self._put(pending, chunk, handle):
+                    break
+            else:
+                self._put(pending, END, handle)
+        except Exception as e:
+            self._put(pending, e, handle)
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+    def _play(self, pending, handle):
+        try:
+            while not handle.cancelled:
+                try:
+                    chunk = pending.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if chunk is END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                audio, sample_rate = chunk
+                audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+                self.sink.open(sample_rate)
+                if handle.first_audio_s is None:
+                    handle.first_audio_s = perf_counter() - handle.started_at
+                block = max(1, int(sample_rate * self.block_ms / 1000))
+                for start in range(0, len(audio), block):
+                    if handle.cancelled:
+                        break
+                    samples = audio[start:start + block]
+                    self.sink.write(samples)
+                    handle.played_s += len(samples) / sample_rate
+                    handle._energy += float(np.dot(samples, samples))
+                    handle._samples += len(samples)
+            handle._future.set_result(not handle.cancelled)
+        except Exception as e:
+            if handle.cancelled:
+                # Erro causado pelo abort() da saída durante a escrita
+                handle._future.set_result(False)
+            else:
+                handle._future.set_exception(e)
+        finally:
+            handle.ended_at = perf_counter()
+            get_tracer().record("playback", "play", handle.started_at, perf_counter(), played_s=handle.played_s,
+                                first_audio_s=handle.first_audio_s, cancelled=handle.cancelled)
+
+
+_default_player = None
+
+
+def get_player():
+    """Retorna o AudioPlayer compartilhado do processo (saída padrão do sounddevice)."""
+    global _default_player
+    if _default_player is None:
+        _default_player = AudioPlayer()
+    return _default_player
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+# Arquivo de templates do agente: AGENT_PROMPTS_FILE ou o prompts.yaml ao lado deste módulo
+PROMPTS_FILE = os.environ.get("AGENT_PROMPTS_FILE") or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                     "prompts.yaml")
+
+# Aproximação barata da contagem de tokens (palavras e pontuação), suficiente para comparar prompts
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# System prompts já renderizados, por (template, conjunto de tools, agentes gerenciados, imports)
+_SYSTEM_PROMPTS = {}
+_LOCK = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def _fill_missing(templates, defaults):
+    for key, value in defaults.items():
+        if key not in templates:
+            templates[key] = value
+        elif isinstance(value, dict) and isinstance(templates[key], dict):
+            _fill_missing(templates[key], value)
+    return templates
+
+
+def load_prompt_templates(path=None):
+    """Lê os templates de prompt (padrão: PROMPTS_FILE), completando os que faltam com os do CodeAgent."""
+    import importlib.resources
+
+    import yaml
+
+    with open(path or PROMPTS_FILE, "r", encoding="utf-8") as stream:
+        templates = yaml.safe_load(stream)
+    try:
+        defaults = importlib.resources.files("smolagents.prompts").joinpath("code_agent.yaml").read_text("utf-8")
+    except (ModuleNotFoundError, FileNotFoundError):
+        return templates
+    return _fill_missing(templates, yaml.safe_load(defaults))
+
+
+def estimate_tokens(text):
+    """Estimativa do número de tokens de um texto."""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def _tool_signature(tool):
+    inputs = getattr(tool, "inputs", {})
+    return (getattr(tool, "name", str(tool)), getattr(tool, "description", ""),
+            json.dumps(inputs, sort_keys=True, default=str), str(getattr(tool, "output_type", "")))
+
+
+def _prompt_key(agent):
+    tools = getattr(agent, "tools", {}) or {}
+    managed = getattr(agent, "managed_agents", {}) or {}
+    imports = getattr(agent, "authorized_imports", None) or getattr(agent, "additional_authorized_imports", None) or []
+    template = agent.prompt_templates["system_prompt"]
+    raw = json.dumps({
+        "template": hashlib.sha256(template.encode()).hexdigest(),
+        "tools": sorted(_tool_signature(t) for t in tools.values()),
+        "managed_agents": sorted((name, getattr(a, "description", "")) for name, a in managed.items()),
+        "imports": sorted(imports),
+    }, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def install_prompt_cache(agent):
+    """
+    Faz o agente reaproveitar o system prompt já renderizado para o mesmo template e tools, mantendo o prefixo
+    idêntico entre runs (cache KV do servidor).
+    """
+    render = agent.initialize_system_prompt
+
+    def initialize_system_prompt(*args, **kwargs):
+        key = _prompt_key(agent)
+        with _LOCK:
+            if key in _SYSTEM_PROMPTS:
+                stats["hits"] += 1
+                return _SYSTEM_PROMPTS[key]
+        prompt = render(*args, **kwargs)
+        with _LOCK:
+            stats["misses"] += 1
+            _SYSTEM_PROMPTS[key] = prompt
+        return prompt
+
+    agent.initialize_system_prompt = initialize_system_prompt
+    return agent
+
+
+def stable_messages(messages):
+    """Remove espaços finais e junta mensagens seguidas do mesmo papel, para o histórico não mudar entre passos."""
+    stable = []
+    for message in messages:
+        content = message["content"].rstrip()
+        if stable and stable[-1]["role"] == message["role"]:
+            stable[-1] = {"role": message["role"], "content": stable[-1]["content"] + "\n" + content}
+        else:
+            stable.append({"role": message["role"], "content": content})
+    return stable
+
+
+def serialize_chat(messages):
+    """Serialização parecida com a de um template de chat, usada para medir o prefixo comum entre passos."""
+    return "".join(f"<|{m['role']}|>\n{m['content']}<|end|>\n" for m in messages)
+
+
+def prefix_report(step_prompts):
+    """Para cada passo (prompt serializado), tokens que repetem o prefixo do anterior e tokens novos."""
+    report = []
+    previous = ""
+    for step, text in enumerate(step_prompts, start=1):
+        common = len(os.path.commonprefix([previous, text]))
+        total = estimate_tokens(text)
+        reused = estimate_tokens(text[:common])
+        report.append({"step": step, "total_tokens": total, "reused_tokens": reused, "evaluated_tokens": total - reused})
+        previous = text
+    return report
@@ -1,10 +1,167 @@
-import sounddevice as sd
+import threading
+from collections import deque
+from math import gcd
+from time import perf_counter
+
 import numpy as np
 import scipy.io.wavfile as wav
-import pygame
+
+from lazy import lazy_import
+from player import get_player
+from vad import make_vad
+
+# PortAudio e scipy.signal só são carregados quando o microfone é aberto ou o áudio é reamostrado
+sd = lazy_import("sounddevice")
+signal = lazy_import("scipy.signal")
+
+# Taxa de amostragem esperada pelo Whisper
+WHISPER_SAMPLE_RATE = 16000
+
+
+class RingBuffer:
+    """Buffer circular de amostras float32 (frames x canais); se o leitor atrasar, as mais antigas são descartadas."""
+
+    def __init__(self, capacity, channels=1):
+        self._data = np.zeros((capacity, channels), dtype=np.float32)
+        self.capacity = capacity
+        self.channels = channels
+        self._read = 0
+        self._size = 0
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._size
+
+    def write(self, frames):
+        frames = np.asarray(frames, dtype=np.float32).reshape(-1, self.channels)
+        with self._cond:
+            n = len(frames)
+            if n > self.capacity:
+                # Só cabem as últimas amostras
+                self.dropped += n - self.capacity
+                frames = frames[-self.capacity:]
+                n = self.capacity
+            overflow = self._size + n - self.capacity
+            if overflow > 0:
+                self._read = (self._read + overflow) % self.capacity
+                self._size -= overflow
+                self.dropped += overflow
+            start = (self._read + self._size) % self.capacity
+            first = min(n, self.capacity - start)
+            self._data[start:start + first] = frames[:first]
+            self._data[:n - first] = frames[first:]
+            self._size += n
+            self._cond.notify_all()
+
+    def read(self, n, timeout=None):
+        """Lê n frames (ou o restante, se o buffer fechar); None se o timeout expirar ou não houver mais nada."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size >= n or self.closed, timeout):
+                return None
+            n = min(n, self._size)
+            if n == 0:
+                return None
+            idx = (self._read + np.arange(n)) % self.capacity
+            out = self._data[idx]
+            self._read = (self._read + n) % self.capacity
+            self._size -= n
+            return out
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class SoundDeviceSource:
+    """Fonte de áudio do microfone: o callback do sounddevice alimenta um RingBuffer."""
+
+    def __init__(self, device=None, sample_rate=44100, channels=1, blocksize=1024, buffer_seconds=30):
+        self.device = device
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.buffer = RingBuffer(int(buffer_seconds * sample_rate), channels)
+        self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            print(f"Aviso do dispositivo de áudio: {status}")
+        self.buffer.write(indata)
+
+    def start(self):
+        self._stream = sd.InputStream(device=self.device, samplerate=self.sample_rate, channels=self.channels,
+                                      dtype='float32', blocksize=self.blocksize, callback=self._callback)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self.buffer.close()
+
+    def read(self, timeout=None):
+        return self.buffer.read(self.blocksize, timeout)
+
+
+class SyntheticSource:
+    """Fonte de áudio sintética com a interface de SoundDeviceSource, para rodar sem microfone."""
+
+    def __init__(self, signal, sample_rate=44100, blocksize=1024, realtime=False):
+        signal = to_float32(signal)
+        self.signal = signal.reshape(len(signal), -1)
+        self.sample_rate = sample_rate
+        self.channels = self.signal.shape[1]
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self._pos = 0
+
+    @classmethod
+    def tone(cls, duration=1.0, frequency=440.0, sample_rate=44100, amplitude=0.3, **kwargs):
+        t = np.arange(int(duration * sample_rate)) / sample_rate
+        return cls(amplitude * np.sin(2 * np.pi * frequency * t), sample_rate=sample_rate, **kwargs)
+
+    def start(self):
+        self._pos = 0
+
+    def stop(self):
+        self._pos = len(self.signal)
+
+    def read(self, timeout=None):
+        if self._pos >= len(self.signal):
+            return None
+        block = self.signal[self._pos:self._pos + self.blocksize]
+        self._pos += len(block)
+        if self.realtime:
+            threading.Event().wait(len(block) / self.sample_rate)
+        return block
+
+
+def to_float32(audio):
+    """Converte amostras inteiras (ex.: int16) para float32 em [-1, 1]; arrays float são apenas convertidos."""
+    audio = np.asarray(audio)
+    if np.issubdtype(audio.dtype, np.integer):
+        return audio.astype(np.float32) / np.iinfo(audio.dtype).max
+    return audio.astype(np.float32, copy=False)
+
+
+def to_whisper_input(audio, sample_rate):
+    """Converte um bloco de áudio (int16 ou float, mono ou multicanal) para float32 mono a 16 kHz (Whisper)."""
+    audio = to_float32(audio)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if sample_rate != WHISPER_SAMPLE_RATE:
+        g = gcd(int(sample_rate), WHISPER_SAMPLE_RATE)
+        audio = signal.resample_poly(audio, WHISPER_SAMPLE_RATE // g, int(sample_rate) // g).astype(np.float32)
+    return np.ascontiguousarray(audio)
+
 
 class ReadMic:
-    def __init__(self, duration=5, sample_rate=44100, device_index=3, output_file="audio_gravado.wav", channels=None):
+    def __init__(self, duration=5, sample_rate=44100, device_index=3, output_file="audio_gravado.wav", channels=None,
+                 source=None, blocksize=1024):
         """
         Parâmetros:
          - duration: Duração da gravação em segundos.
@@ -12,12 +169,17 @@ class ReadMic:
          - device_index: Índice do dispositivo padrão.
          - output_file: Nome do arquivo de saída.
          - channels: Número de canais. Se None, será usado 1 canal por padrão.
+         - source: Fonte de áudio (ex.: SyntheticSource). Se None, usa o microfone via sounddevice.
+         - blocksize: Quantidade de frames por bloco no modo streaming.
         """
         self.duration = duration
         self.sample_rate = sample_rate
         self.device_index = device_index
         self.output_file = output_file
         self.channels = channels  # Se None, usará 1 canal por padrão na gravação
+        self.source = source
+        self.blocksize = blocksize
+        self.last_stats = None  # Tempos da última fala capturada por utterances()
 
     @staticmethod
     def listar_dispositivos():
@@ -28,7 +190,7 @@ class ReadMic:
         for i, dev in enumerate(devices):
             print(f"Índice {i}: {dev['name']} | Entrada: {dev['max_input_channels']} canais | Saída: {dev['max_output_channels']} canais")
 
-    def gravar_com_dispositivo(self, indice_dispositivo=None, duration=None, sample_rate=None, output_file=None):
+    def gravar_com_dispositivo(self, indice_dispositivo=None, duration=None, sample_rate=None, output_file=None, salvar=True):
         """
         Grava áudio usando o dispositivo especificado.
         
@@ -37,6 +199,7 @@ class ReadMic:
          - duration: Duração da gravação. Se None, usa self.duration.
          - sample_rate: Taxa de amostragem. Se None, usa self.sample_rate.
          - output_file: Nome do arquivo de saída. Se None, usa self.output_file.
+         - salvar: Se False, apenas devolve o array gravado, sem escrever o WAV.
         """
         # Usa os valores padrão da instância, caso os argumentos não sejam passados
         if indice_dispositivo is None:
@@ -72,9 +235,157 @@ class ReadMic:
         print("Gravação finalizada.")
 
         # Salva o áudio no arquivo especificado
-        self.save_audio(audio, output_file, sample_rate)
+        if salvar:
+            self.save_audio(audio, output_file, sample_rate)
         return audio
 
+    def _open_source(self):
+        if self.source is not None:
+            return self.source
+        channels = self.channels if self.channels is not None else 1
+        return SoundDeviceSource(self.device_index, self.sample_rate, channels, self.blocksize)
+
+    def stream(self, timeout=1.0):
+        """Gera blocos float32 (frames x canais) à medida que chegam, até a fonte se esgotar."""
+        source = self._open_source()
+        source.start()
+        try:
+            while True:
+                block = source.read(timeout)
+                if block is None:
+                    break
+                yield block
+        finally:
+            source.stop()
+
+    def gravar_em_memoria(self, duration=None, output_file=None):
+        """
+        Grava via streaming e devolve o áudio pronto para o Whisper (float32 mono a 16 kHz).
+
+        Parâmetros opcionais:
+         - duration: Duração da gravação. Se None, usa self.duration.
+         - output_file: Se informado, também salva a gravação original em WAV.
+        """
+        if duration is None:
+            duration = self.duration
+        total = int(duration * self.sample_rate)
+        blocks = []
+        captured = 0
+        for block in self.stream():
+            blocks.append(block[:total - captured])
+            captured += len(blocks[-1])
+            if captured >= total:
+                break
+
+        audio = np.concatenate(blocks) if blocks else np.zeros((0, 1), dtype=np.float32)
+        if output_file is not None:
+            self.save_audio(audio, output_file)
+        # Reamostra uma única vez, já com a gravação completa
+        return to_whisper_input(audio, self.sample_rate)
+
+    def utterances(self, silence_ms=700, max_duration=15.0, start_timeout=None, pre_roll_ms=300,
+                   min_speech_ms=150, vad=None):
+        """
+        Escuta continuamente e gera (audio, stats) por fala: float32 mono a 16 kHz e os tempos da fala.
+
+        Parâmetros opcionais:
+         - silence_ms: Silêncio contínuo (ms) que encerra a fala.
+         - max_duration: Duração máxima de uma fala em segundos.
+         - start_timeout: Tempo máximo (s) esperando a fala começar. Se None, espera indefinidamente.
+         - pre_roll_ms: Áudio anterior ao início da fala que é mantido (evita cortar a primeira sílaba).
+         - min_speech_ms: Falas mais curtas que isso são descartadas como ruído.
+         - vad: Detector de voz (ver vad.py). Se None, usa make_vad(self.sample_rate).
+        """
+        if vad is None:
+            vad = make_vad(self.sample_rate)
+        frame_length = vad.frame_length
+        frame_s = frame_length / self.sample_rate
+        silence_frames = max(1, int(round(silence_ms / 1000 / frame_s)))
+        min_speech_frames = max(1, int(round(min_speech_ms / 1000 / frame_s)))
+        max_frames = int(max_duration / frame_s)
+        pre_roll = deque(maxlen=max(1, int(round(pre_roll_ms / 1000 / frame_s))))
+
+        pending = np.zeros((0, 1), dtype=np.float32)
+        frames, speech_frames, trailing = [], 0, 0
+        waited_frames = 0
+        listen_start = perf_counter()
+        speech_start = None
+
+        def finish(ended_by):
+            audio = np.concatenate(frames)
+            # Remove o silêncio final, que só serviu para decidir o fim da fala
+            if ended_by == "silence":
+                audio = audio[:len(audio) - (trailing - 1) * frame_length]
+            now = perf_counter()
+            stats = {
+                "ended_by": ended_by,
+                # Nível médio da fala (RMS, em dBFS), comparado ao da resposta tocando para separar voz de eco
+                "level_db": float(10 * np.log10(np.mean(audio ** 2) + 1e-12)),
+                "wait_s": speech_start - listen_start,
+                "speech_s": len(audio) / self.sample_rate,
+                "trailing_silence_s": trailing * frame_s,
+                "capture_s": now - speech_start,
+                "turn_s": now - listen_start,
+            }
+            start = perf_counter()
+            audio = to_whisper_input(audio, self.sample_rate)
+            stats["resample_s"] = perf_counter() - start
+            self.last_stats = stats
+            return audio, stats
+
+        for block in self.stream():
+            if block.shape[1] != pending.shape[1]:
+                pending = np.zeros((0, block.shape[1]), dtype=np.float32)
+            pending = np.concatenate([pending, block])
+            while len(pending) >= frame_length:
+                frame, pending = pending[:frame_length], pending[frame_length:]
+                speech = vad.is_speech(frame)
+
+                if speech_start is None:
+                    pre_roll.append(frame)
+                    waited_frames += 1
+                    if speech:
+                        speech_start = perf_counter()
+                        frames, speech_frames, trailing = list(pre_roll), 1, 0
+                        pre_roll.clear()
+                    elif start_timeout is not None and waited_frames * frame_s >= start_timeout:
+                        return
+                    continue
+
+                frames.append(frame)
+                if speech:
+                    speech_frames += 1
+                    trailing = 0
+                else:
+                    trailing += 1
+
+                ended_by = None
+                if trailing >= silence_frames:
+                    ended_by = "silence"
+                elif len(frames) >= max_frames:
+                    ended_by = "max_duration"
+                if ended_by is None:
+                    continue
+
+                if speech_frames >= min_speech_frames:
+                    yield finish(ended_by)
+                # Volta a esperar a próxima fala
+                frames, speech_frames, trailing = [], 0, 0
+                speech_start = None
+                waited_frames = 0
+                listen_start = perf_counter()
+
+        # A fonte acabou no meio de uma fala
+        if speech_start is not None and speech_frames >= min_speech_frames:
+            yield finish("source_end")
+
+    def gravar_ate_silencio(self, silence_ms=700, max_duration=15.0, start_timeout=10.0, **kwargs):
+        """Grava uma única fala e devolve (audio, stats), ou (None, None) se ninguém falar a tempo."""
+        for audio, stats in self.utterances(silence_ms=silence_ms, max_duration=max_duration,
+                                            start_timeout=start_timeout, **kwargs):
+            return audio, stats
+        return None, None
+
     def save_audio(self, audio_data, output_file, sample_rate=None):
         """
         Salva o áudio gravado em um arquivo WAV.
@@ -89,10 +400,13 @@ class ReadMic:
         wav.write(output_file, sample_rate, audio_data)
         print(f"Áudio gravado em {output_file}")
 
-def read_audio(file_path):
-    pygame.mixer.init()
-    pygame.mixer.music.load(file_path)
-    pygame.mixer.music.play()
+def play_chunks(chunks, player=None):
+    """Reproduz (audio, sample_rate) conforme os trechos ficam prontos e retorna um PlaybackHandle (player.py)."""
+    if player is None:
+        player = get_player()
+    return player.play(chunks)
 
-    input("Pressione Enter para sair...")
-    pygame.mixer.music.stop()
\ No newline at end of file
+def read_audio(file_path, player=None):
+    """Toca um arquivo WAV sem bloquear; retorna o PlaybackHandle da reprodução."""
+    sample_rate, audio = wav.read(file_path)
+    return play_chunks([(to_float32(audio), sample_rate)], player)
\ No newline at end of file
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_messages(messages):
+    """Forma canônica das mensagens (papel + texto com espaços colapsados), usada nas chaves do cache."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    normalized = []
+    for message in messages:
+        if not isinstance(message, dict):
+            # ChatMessage do smolagents
+            message = {"role": message.role, "content": message.content}
+        role = message["role"]
+        role = getattr(role, "value", role)
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "\n".join(part.get("text", "") for part in content if part.get("type") == "text")
+        normalized.append({"role": role, "content": _WHITESPACE.sub(" ", content).strip()})
+    return normalized
+
+
+def _hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+class ResponseCache:
+    """Cache persistente (SQLite) de respostas do modelo, com TTL, limite de tamanho (LRU) e busca por similaridade."""
+
+    def __init__(self, path=".cache/responses.sqlite", ttl=24 * 3600, max_entries=10000, max_bytes=200 * 1024 ** 2,
+                 embed_fn=None, similarity_threshold=0.97):
+        """
+        Parâmetros:
+         - path: Arquivo SQLite (":memory:" para um cache só em memória).
+         - ttl: Validade das respostas em segundos (None = não expiram).
+         - max_entries: Quantidade máxima de respostas guardadas.
+         - max_bytes: Tamanho máximo somado das respostas guardadas.
+         - embed_fn: Função texto -> vetor, para a busca por similaridade. Se None, só há busca exata.
+         - similarity_threshold: Similaridade de cosseno mínima para aceitar uma resposta de prompt parecido.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                settings TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+    def make_key(self, messages, settings):
+        """Chave do cache: hash das mensagens normalizadas junto com as configurações do modelo."""
+        return _hash({"messages": normalize_messages(messages), "settings": settings})
+
+    def _expired_before(self):
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ? AND created >= ?",
+                                   (key, self._expired_before())).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return json.loads(row[0])
+
+    def get_similar(self, text, settings):
+        """Resposta guardada cujo prompt é o mais parecido com text (acima do limiar), ou None."""
+        if self.embed_fn is None:
+            return None
+        query = np.asarray(self.embed_fn(text), dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value, embedding FROM responses WHERE settings = ? AND embedding IS NOT NULL AND created >= ?",
+                (_hash(settings), self._expired_before())).fetchall()
+        if not rows:
+            return None
+        matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        with self._lock:
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), rows[best][0]))
+            self._db.commit()
+        return json.loads(rows[best][1])
+
+    def put(self, key, value, settings, text=None):
+        payload = json.dumps(value, ensure_ascii=False)
+        embedding = None
+        if self.embed_fn is not None and text is not None:
+            vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+            embedding = (vector / (np.linalg.norm(vector) + 1e-12)).tobytes()
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (key, _hash(settings), payload, len(payload), embedding, now, now))
+            self.stats["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        removed = self._db.execute("DELETE FROM responses WHERE created < ?", (self._expired_before(),)).rowcount
+        count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        # Remove as menos acessadas até caber nos limites
+        while count > self.max_entries or (self.max_bytes is not None and size > self.max_bytes and count > 1):
+            key, entry_size = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 1").fetchone()
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            size -= entry_size
+            removed += 1
+        self.stats["evictions"] += removed
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def record(self, name):
+        # O modelo (e o cache) é compartilhado pelas sessões do servidor e pelos workers do batch
+        with self._lock:
+            self.stats[name] += 1
+
+    def hit_rate(self):
+        with self._lock:
+            total = self.stats["hits"] + self.stats["similar_hits"] + self.stats["misses"]
+            return (self.stats["hits"] + self.stats["similar_hits"]) / total if total else 0.0
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """ResponseCache padrão do processo: uma única conexão SQLite para todos os CachedModel."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResponseCache()
+        return _shared
+
+
+def _dump_response(response):
+    if isinstance(response, (dict, str)):
+        return {"type": "raw", "data": response}
+    # ChatMessage do smolagents (ex.: resposta do HfApiModel)
+    return {"type": "chat_message", "role": str(getattr(response.role, "value", response.role)),
+            "content": response.content}
+
+
+def _load_response(stored):
+    if stored["type"] == "raw":
+        return stored["data"]
+    from smolagents.models import ChatMessage
+    return ChatMessage(role=stored["role"], content=stored["content"])
+
+
+class CachedModel:
+    """
+    Envolve um modelo (OllamaChatbotModel, HfApiModel...) e devolve respostas já vistas sem chamar o modelo.
+    Só a geração é reaproveitada: o código do passo (e as tools) continua sendo executado.
+    """
+
+    def __init__(self, model, cache=None):
+        self.model = model
+        self.cache = cache if cache is not None else shared_cache()
+        self.last_hit = False
+
+    def __getattr__(self, name):
+        # Atributos não definidos aqui (model_id, last_input_token_count...) vêm do modelo envolvido
+        return getattr(self.model, name)
+
+    def _settings(self, kwargs):
+        return {
+            "model": type(self.model).__name__,
+            "model_id": getattr(self.model, "model_id", None),
+            "temperature": getattr(self.model, "temperature", None),
+            "max_tokens": getattr(self.model, "max_tokens", None),
+            "kwargs": {k: v for k, v in kwargs.items() if k != "tools_to_call_from"},
+        }
+
+    def generate(self, messages, **kwargs):
+        return self(messages, **kwargs)
+
+    def __call__(self, messages, **kwargs):
+        settings = self._settings(kwargs)
+        key = self.cache.make_key(messages, settings)
+        # Para a similaridade, o system prompt (igual para todos) só diluiria a comparação
+        text = "\n".join(m["content"] for m in normalize_messages(messages) if m["role"] != "system")
+
+        stored = self.cache.get(key)
+        if stored is not None:
+            self.cache.record("hits")
+        else:
+            stored = self.cache.get_similar(text, settings)
+            if stored is not None:
+                self.cache.record("similar_hits")
+        if stored is not None:
+            self.last_hit = True
+            self.__dict__["last_input_token_count"] = 0
+            self.__dict__["last_output_token_count"] = 0
+            return _load_response(stored)
+
+        self.cache.record("misses")
+        self.last_hit = False
+        self.__dict__.pop("last_input_token_count", None)
+        self.__dict__.pop("last_output_token_count", None)
+        response = self.model(messages, **kwargs)
+        self.cache.put(key, _dump_response(response), settings, text)
+        return response
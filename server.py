@@ -0,0 +1,470 @@
+import argparse
+import importlib
+import json
+import re
+import sys
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, TimeoutError as FuturesTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, perf_counter
+
+from metrics import MetricsRegistry
+
+
+class SchedulerBusy(Exception):
+    """A fila do agendador está cheia: o cliente deve tentar de novo mais tarde."""
+
+
+class SessionBusy(Exception):
+    """A sessão já está executando uma tarefa."""
+
+
+class ModelScheduler:
+    """
+    Distribui as chamadas de modelo das sessões, em rodízio, entre max_concurrency instâncias do modelo.
+    Acima de max_queue chamadas pendentes, novas chamadas são recusadas (SchedulerBusy).
+    """
+
+    def __init__(self, model_factory, max_concurrency=2, max_queue=64, timeout=120.0, metrics=None):
+        """
+        Parâmetros:
+         - model_factory: Função sem argumentos que cria uma instância do modelo (ex.: OllamaChatbotModel).
+         - max_concurrency: Chamadas de modelo simultâneas.
+         - max_queue: Chamadas aguardando vaga, somando todas as sessões.
+         - timeout: Tempo máximo padrão de uma chamada (fila + geração), em segundos.
+         - metrics: MetricsRegistry compartilhado. Se None, cria um novo.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.metrics = metrics or MetricsRegistry()
+        self.models = [model_factory() for _ in range(max_concurrency)]
+        self.max_depth = 0
+        self._queues = OrderedDict()  # sessão -> deque de chamadas; a ordem é a vez de cada sessão
+        self._depth = 0
+        self._running = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._workers = [threading.Thread(target=self._work, args=(model,), name=f"model-slot-{i}", daemon=True)
+                         for i, model in enumerate(self.models)]
+        for worker in self._workers:
+            worker.start()
+
+    def depth(self):
+        """Chamadas aguardando vaga."""
+        with self._cond:
+            return self._depth
+
+    def stats(self):
+        with self._cond:
+            return {"queue_depth": self._depth, "max_queue_depth": self.max_depth, "running": self._running,
+                    "sessions_waiting": len(self._queues), "max_concurrency": self.max_concurrency}
+
+    def _next_call(self):
+        # Rodízio: atende a primeira sessão da fila e a manda para o fim se ainda tiver chamadas pendentes
+        session_id, calls = next(iter(self._queues.items()))
+        call = calls.popleft()
+        if calls:
+            self._queues.move_to_end(session_id)
+        else:
+            del self._queues[session_id]
+        self._depth -= 1
+        return call
+
+    def _work(self, model):
+        while True:
+            with self._cond:
+                while not self._queues and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                call = self._next_call()
+                if not call["future"].set_running_or_notify_cancel():
+                    continue  # desistiu (timeout) enquanto esperava na fila
+                if call["deadline"] is not None and monotonic() >= call["deadline"]:
+                    # O prazo acabou na fila: não gasta a vaga com uma resposta que ninguém vai ler
+                    call["future"].set_exception(TimeoutError("Tempo esgotado aguardando o modelo."))
+                    self.metrics.incr("model_calls_expired")
+                    continue
+                self._running += 1
+
+            self.metrics.observe("queue_wait", perf_counter() - call["enqueued"])
+            start = perf_counter()
+            kwargs = call["kwargs"]
+            if call["deadline"] is not None and getattr(model, "supports_deadline", False):
+                # O modelo interrompe a geração (e fecha o stream) quando o chamador desiste
+                kwargs = {**kwargs, "deadline": call["deadline"]}
+            try:
+                response = getattr(model, call["method"])(*call["args"], **kwargs)
+                usage = {name: getattr(model, name, None)
+                         for name in ("last_input_token_count", "last_output_token_count", "last_stats")}
+                call["future"].set_result((response, usage))
+            except BaseException as e:
+                call["future"].set_exception(e)
+            finally:
+                self.metrics.observe("model_call", perf_counter() - start)
+                self.metrics.incr("model_calls")
+                with self._cond:
+                    self._running -= 1
+
+    def submit(self, session_id, method, *args, deadline=None, **kwargs):
+        """
+        Enfileira model.<method>(*args, **kwargs) para a sessão e retorna um Future com (resposta, uso).
+        Passado o deadline (em monotonic()), a chamada é descartada da fila ou interrompida (supports_deadline).
+        """
+        call = {"method": method, "args": args, "kwargs": kwargs, "future": Future(), "enqueued": perf_counter(),
+                "deadline": deadline}
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ModelScheduler encerrado.")
+            if self._depth >= self.max_queue:
+                self.metrics.incr("model_calls_rejected")
+                raise SchedulerBusy(f"{self._depth} chamadas de modelo na fila")
+            self._queues.setdefault(session_id, deque()).append(call)
+            self._depth += 1
+            self.max_depth = max(self.max_depth, self._depth)
+            self._cond.notify()
+        return call["future"]
+
+    def call(self, session_id, method, *args, timeout=None, **kwargs):
+        """Enfileira a chamada e espera o resultado. Levanta TimeoutError se passar de timeout segundos."""
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(session_id, method, *args, deadline=monotonic() + timeout, **kwargs)
+        try:
+            return future.result(timeout)
+        except (FuturesTimeout, CancelledError):
+            # Se ainda estava na fila, a vaga fica livre para outra chamada; se já estava gerando, o modelo
+            # para no prazo (supports_deadline) e libera a vaga
+            future.cancel()
+            self.metrics.incr("model_calls_timeout")
+            raise TimeoutError("Tempo esgotado aguardando o modelo.") from None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for calls in self._queues.values():
+                for call in calls:
+                    call["future"].cancel()
+            self._queues.clear()
+            self._depth = 0
+            self._cond.notify_all()
+
+
+class ScheduledModel:
+    """Modelo de uma sessão: cada chamada passa pelo ModelScheduler, dentro do prazo da tarefa em andamento."""
+
+    def __init__(self, scheduler, session_id):
+        self.scheduler = scheduler
+        self.session_id = session_id
+        self.deadline = None
+        self.timed_out = False
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+        self.last_stats = {}
+
+    def __getattr__(self, name):
+        # model_id, temperature, max_tokens... vêm de uma das instâncias do agendador
+        return getattr(self.scheduler.models[0], name)
+
+    def _call(self, method, *args, **kwargs):
+        timeout = None
+        if self.deadline is not None:
+            timeout = self.deadline - monotonic()
+            if timeout <= 0:
+                self.timed_out = True
+                raise TimeoutError("Tempo da sessão esgotado.")
+        try:
+            response, usage = self.scheduler.call(self.session_id, method, *args, timeout=timeout, **kwargs)
+        except TimeoutError:
+            self.timed_out = True
+            raise
+        for name, value in usage.items():
+            setattr(self, name, value)
+        return response
+
+    def generate(self, messages, **kwargs):
+        return self._call("generate", messages, **kwargs)
+
+    def __call__(self, messages, **kwargs):
+        return self._call("__call__", messages, **kwargs)
+
+
+class Session:
+    """Uma conversa: agente com memória própria, executando uma tarefa por vez."""
+
+    def __init__(self, session_id, agent, model):
+        self.id = session_id
+        self.agent = agent
+        self.model = model
+        self.runs = 0
+        self.last_used = monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self._lock.locked()
+
+    def run(self, task, timeout=None):
+        """Executa a tarefa mantendo a memória das anteriores. Levanta SessionBusy ou TimeoutError."""
+        if not self._lock.acquire(blocking=False):
+            raise SessionBusy(f"Sessão {self.id} já está executando uma tarefa.")
+        try:
+            self.model.deadline = monotonic() + timeout if timeout is not None else None
+            self.model.timed_out = False
+            # A primeira tarefa começa com a memória vazia; as seguintes continuam a conversa
+            result = self.agent.run(task, reset=self.runs == 0)
+            if self.model.timed_out:
+                raise TimeoutError("Tempo da sessão esgotado.")
+            self.runs += 1
+            return result
+        except Exception:
+            if self.model.timed_out:
+                raise TimeoutError("Tempo da sessão esgotado.") from None
+            raise
+        finally:
+            self.model.deadline = None
+            self.last_used = monotonic()
+            self._lock.release()
+
+
+class SessionManager:
+    """Cria e guarda as sessões. Sessões ociosas há mais de idle_ttl segundos são descartadas."""
+
+    def __init__(self, agent_factory, scheduler, max_sessions=100, idle_ttl=1800):
+        """
+        Parâmetros:
+         - agent_factory: Função model -> agente (ex.: main.build_agent), chamada uma vez por sessão.
+         - scheduler: ModelScheduler compartilhado entre as sessões.
+         - max_sessions: Sessões simultâneas; acima disso, a mais antiga ociosa é descartada.
+         - idle_ttl: Tempo, em segundos, que uma sessão sem uso é mantida.
+        """
+        self.agent_factory = agent_factory
+        self.scheduler = scheduler
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _evict_locked(self):
+        now = monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if not session.busy and now - session.last_used > self.idle_ttl:
+                del self._sessions[session_id]
+        idle = [sid for sid, s in self._sessions.items() if not s.busy]
+        while len(self._sessions) >= self.max_sessions and idle:
+            del self._sessions[idle.pop(0)]
+        if len(self._sessions) >= self.max_sessions:
+            raise SchedulerBusy(f"{len(self._sessions)} sessões ativas")
+
+    def create(self, session_id=None):
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            self._evict_locked()
+        model = ScheduledModel(self.scheduler, session_id)
+        session = Session(session_id, self.agent_factory(model), model)
+        with self._lock:
+            self._sessions[session_id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+_SESSION_PATH = re.compile(r"/sessions/([\w-]+)(/run)?")
+
+
+class _AgentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload=None, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def do_GET(self):
+        app = self.server.app
+        if self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._reply(200, app.snapshot())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        match = _SESSION_PATH.fullmatch(self.path)
+        if match and not match.group(2) and self.server.app.sessions.delete(match.group(1)):
+            self._reply(204)
+        else:
+            self._reply(404, {"error": "sessão não encontrada"})
+
+    def do_POST(self):
+        app = self.server.app
+        try:
+            body = self._body()
+        except ValueError:
+            self._reply(400, {"error": "JSON inválido"})
+            return
+
+        try:
+            if self.path == "/sessions":
+                self._reply(201, {"session_id": app.sessions.create().id})
+                return
+            match = _SESSION_PATH.fullmatch(self.path)
+            if self.path == "/run":
+                # Sem session_id, cria uma sessão nova e devolve o id para as próximas mensagens
+                session_id = body.get("session_id")
+                session = app.sessions.get(session_id) if session_id else None
+                session = session or app.sessions.create(session_id)
+            elif match and match.group(2):
+                session = app.sessions.get(match.group(1))
+                if session is None:
+                    self._reply(404, {"error": "sessão não encontrada"})
+                    return
+            else:
+                self._reply(404, {"error": "not found"})
+                return
+            if not body.get("task"):
+                self._reply(400, {"error": "campo 'task' obrigatório"})
+                return
+            self._reply(200, app.run(session, body["task"], body.get("timeout")))
+        except SchedulerBusy as e:
+            app.metrics.incr("requests_rejected")
+            self._reply(429, {"error": f"servidor ocupado: {e}"}, {"Retry-After": "1"})
+        except SessionBusy as e:
+            app.metrics.incr("requests_rejected")
+            self._reply(409, {"error": str(e)})
+        except TimeoutError as e:
+            app.metrics.incr("requests_timeout")
+            self._reply(504, {"error": str(e)})
+        except Exception as e:
+            app.metrics.incr("requests_error")
+            self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Muitos clientes conectando ao mesmo tempo não devem estourar a fila de conexões do socket
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Cliente que desistiu e fechou a conexão não é erro do servidor
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class AgentServer:
+    """
+    Servidor HTTP local com uma sessão (agente com memória própria) por conversa.
+
+    Rotas:
+     - POST /sessions -> {"session_id"}
+     - POST /sessions/<id>/run {"task", "timeout"?} -> {"session_id", "result", "elapsed_s", ...}
+     - POST /run {"task", "session_id"?} (cria a sessão se necessário)
+     - DELETE /sessions/<id>
+     - GET /metrics, GET /health
+    """
+
+    def __init__(self, sessions, host="127.0.0.1", port=8000, session_timeout=300.0):
+        self.sessions = sessions
+        self.scheduler = sessions.scheduler
+        self.metrics = self.scheduler.metrics
+        self.session_timeout = session_timeout
+        self._server = _HTTPServer((host, port), _AgentHandler)
+        self._server.app = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def run(self, session, task, timeout=None):
+        timeout = self.session_timeout if timeout is None else min(float(timeout), self.session_timeout)
+        start = perf_counter()
+        try:
+            result = session.run(task, timeout)
+        finally:
+            self.metrics.observe("request", perf_counter() - start)
+        self.metrics.incr("requests_ok")
+        return {"session_id": session.id, "result": result, "elapsed_s": round(perf_counter() - start, 4),
+                "input_tokens": session.model.last_input_token_count,
+                "output_tokens": session.model.last_output_token_count}
+
+    def snapshot(self):
+        return {"scheduler": self.scheduler.stats(), "sessions": len(self.sessions), **self.metrics.snapshot()}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="agent-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.scheduler.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP do agente com uma sessão por conversa.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--factory", default="main:build_agent", help="Função model -> agente, em modulo:função.")
+    parser.add_argument("--ollama-host", default=None, help="Servidor Ollama (padrão: OLLAMA_HOST ou localhost).")
+    parser.add_argument("--concurrency", type=int, default=2, help="Chamadas de modelo simultâneas.")
+    parser.add_argument("--max-queue", type=int, default=64, help="Chamadas de modelo aguardando vaga.")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Tempo máximo de uma tarefa, em segundos.")
+    args = parser.parse_args()
+
+    from ollamaModel import OllamaChatbotModel
+
+    module_name, _, attr = args.factory.partition(":")
+    agent_factory = getattr(importlib.import_module(module_name), attr or "build_agent")
+    scheduler = ModelScheduler(lambda: OllamaChatbotModel(host=args.ollama_host, verbose=False),
+                               max_concurrency=args.concurrency, max_queue=args.max_queue, timeout=args.timeout)
+    server = AgentServer(SessionManager(agent_factory, scheduler), args.host, args.port, session_timeout=args.timeout)
+    print(f"Servidor do agente em {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.metrics.report())
+
+
+if __name__ == "__main__":
+    main()
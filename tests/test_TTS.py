@@ -0,0 +1,18 @@
+from TTS import split_sentences
+
+
+def test_split_sentences_on_sentence_end():
+    assert split_sentences("O preço subiu. A Selic caiu! E agora?\nFim") == [
+        "O preço subiu.", "A Selic caiu!", "E agora?", "Fim"]
+
+
+def test_split_sentences_keeps_abbreviations_and_initials():
+    text = "O Sr. Silva falou com a Dra. Ana na Av. Paulista. J. Souza confirmou."
+    assert split_sentences(text) == ["O Sr. Silva falou com a Dra. Ana na Av. Paulista.", "J. Souza confirmou."]
+
+
+def test_split_sentences_breaks_long_sentences_at_commas():
+    text = ", ".join(["palavra"] * 60) + "."
+    sentences = split_sentences(text, max_chars=100)
+    assert all(len(s) <= 101 for s in sentences)
+    assert " ".join(sentences).replace(" ", "") == text.replace(" ", "")
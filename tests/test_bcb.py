@@ -0,0 +1,90 @@
+import datetime
+import json
+import time
+
+import pytest
+import requests
+
+from bcb import SELIC, BCBClient
+from fakes import FakeBCBServer
+
+
+@pytest.fixture
+def server():
+    with FakeBCBServer() as server:
+        yield server
+
+
+def client_for(server, cache_file=None):
+    return BCBClient(base_url=server.base_url, cache_file=cache_file)
+
+
+def test_daily_cache_hit(server, tmp_path):
+    cache_file = str(tmp_path / "bcb.json")
+    client = client_for(server, cache_file)
+    first = client.latest(SELIC)
+    assert client.latest(SELIC) == first == {"data": "30/01/2025", "valor": "0.050788"}
+    assert len(server.requests) == 1
+    assert client.stats == {"fresh": 1, "stale": 0, "fetches": 1}
+
+    # O cache do dia sobrevive ao processo
+    assert client_for(server, cache_file).latest(SELIC) == first
+    assert len(server.requests) == 1
+
+
+def write_yesterday(path, value):
+    yesterday = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+    path.write_text(json.dumps({str(SELIC): {"value": value, "day": yesterday}}), encoding="utf-8")
+
+
+def test_stale_value_is_returned_then_refreshed(server, tmp_path):
+    cache_file = tmp_path / "bcb.json"
+    old = {"data": "29/01/2025", "valor": "0.040000"}
+    write_yesterday(cache_file, old)
+    server.delay = 0.2
+    client = client_for(server, str(cache_file))
+
+    start = time.perf_counter()
+    assert client.latest(SELIC) == old
+    assert time.perf_counter() - start < 0.2
+    assert client.stats["stale"] == 1
+
+    deadline = time.monotonic() + 5
+    while client.stats["fetches"] == 0 or json.loads(cache_file.read_text())[str(SELIC)]["value"] == old:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    assert client.latest(SELIC) == {"data": "30/01/2025", "valor": "0.050788"}
+    assert client.stats["fresh"] == 1
+
+
+def test_server_error_without_cache_raises(server):
+    server.status = 503
+    with pytest.raises(requests.RequestException):
+        client_for(server).latest(SELIC)
+    # Retry do adapter: a requisição original mais 2 tentativas
+    assert len(server.requests) == 3
+
+
+def test_server_error_keeps_serving_the_stale_value(server, tmp_path, capsys):
+    cache_file = tmp_path / "bcb.json"
+    old = {"data": "29/01/2025", "valor": "0.040000"}
+    write_yesterday(cache_file, old)
+    server.status = 500
+    client = client_for(server, str(cache_file))
+    assert client.latest(SELIC) == old
+
+    deadline = time.monotonic() + 5
+    while "Erro ao atualizar a série" not in capsys.readouterr().out:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert client.latest(SELIC) == old
+    assert json.loads(cache_file.read_text())[str(SELIC)]["value"] == old
+
+
+def test_latest_many_fetches_in_parallel(server):
+    server.delay = 0.2
+    client = client_for(server)
+    start = time.perf_counter()
+    values = client.latest_many([11, 12, 433])
+    assert time.perf_counter() - start < 0.5
+    assert values[433] == {"data": "30/01/2025", "valor": "0.520000"}
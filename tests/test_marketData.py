@@ -0,0 +1,25 @@
+import os
+
+from marketData import MarketDataService, MockMarketSource
+
+
+def test_quote_period_is_not_served_from_disk(tmp_path):
+    first = MarketDataService(MockMarketSource(), disk_dir=str(tmp_path))
+    first.last_close("PETR4.SA")
+    first.history("PETR4.SA", "1y")
+    assert sorted(os.listdir(tmp_path)) == ["PETR4.SA_1y.parquet"]
+
+    # Outro processo (cache em memória vazio): o histórico vem do disco, a cotação vem da fonte
+    source = MockMarketSource()
+    second = MarketDataService(source, disk_dir=str(tmp_path))
+    second.history("PETR4.SA", "1y")
+    second.last_close("PETR4.SA")
+    assert source.history_calls == [(("PETR4.SA",), "1d")]
+
+
+def test_batched_download_and_memory_cache():
+    source = MockMarketSource()
+    service = MarketDataService(source, disk_dir=None)
+    service.histories(["AAPL", "MSFT"], "1mo")
+    service.histories(["MSFT", "AAPL"], "1mo")
+    assert source.history_calls == [(("AAPL", "MSFT"), "1mo")]
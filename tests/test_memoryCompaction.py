@@ -0,0 +1,44 @@
+from memoryCompaction import CompactingModel, MemoryCompactor, _text
+from promptCache import estimate_tokens
+
+
+def observation(step, lines=40):
+    return "Observation:\n" + "\n".join(f"passo {step}, linha {i}: valor {step * 1000 + i}" for i in range(lines))
+
+
+def history(steps, lines=40, system="Você é um agente."):
+    messages = [{"role": "system", "content": system}, {"role": "user", "content": "Tarefa"}]
+    for step in range(steps):
+        messages.append({"role": "assistant", "content": f"Code:\nprint({step})"})
+        messages.append({"role": "user", "content": observation(step, lines)})
+    return messages
+
+
+def tokens(messages):
+    return sum(estimate_tokens(_text(m)) for m in messages)
+
+
+def test_old_observations_keep_their_compacted_form_between_steps():
+    compactor = MemoryCompactor(budget=10_000, keep_last=1, max_observation_tokens=50)
+    first, _ = compactor.compact(history(3))
+    second, _ = compactor.compact(history(4))
+    # Dentro do budget, só muda a observação que saiu das recentes: o prefixo anterior fica byte a byte igual
+    assert second[:len(first) - 1] == first[:-1]
+
+
+def test_newest_observation_is_truncated_as_last_resort():
+    compactor = MemoryCompactor(budget=300, keep_last=1, max_observation_tokens=50)
+    messages = history(3, lines=100)
+    compacted, stats = compactor.compact(messages)
+    assert stats["elided"] == 2
+    assert stats["tokens_after"] == tokens(compacted) <= 300
+    assert stats["over_budget"] == 0
+    newest = _text(compacted[-1])
+    assert newest.startswith("Observation:") and "tokens omitidos" in newest
+
+
+def test_reports_when_budget_cannot_be_met():
+    model = CompactingModel(lambda messages, **kwargs: messages, budget=100)
+    compacted = model(history(2, system="regra " * 500))
+    assert model.history[-1]["over_budget"] == tokens(compacted) - 100 > 0
+    assert "acima do budget" in model.report()
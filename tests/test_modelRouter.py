@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from fakes import StubChatModel
+from modelRouter import AllRoutesFailed, ModelRouter, Route
+
+MESSAGES = [{"role": "user", "content": "Qual o preço da PETR4?"}]
+
+
+class BrokenModel:
+    def generate(self, messages, **kwargs):
+        raise ConnectionError("backend fora do ar")
+
+
+def remote(**kwargs):
+    return Route("remote", StubChatModel(("remote",), model_id="remote"), **kwargs)
+
+
+def test_failover_on_exception():
+    router = ModelRouter([Route("local", BrokenModel()), remote()])
+    assert router.generate(MESSAGES).content == "remote"
+    assert router.last_route == "remote"
+    assert router.stats()["local"]["errors"] == 1
+    assert router.metrics.counters["route_failovers"] == 1
+
+
+def test_failover_on_timeout():
+    router = ModelRouter([Route("local", StubChatModel(("local",), latency=1.0), timeout=0.05), remote()])
+    start = time.perf_counter()
+    assert router.generate(MESSAGES).content == "remote"
+    assert time.perf_counter() - start < 0.5
+    assert router.stats()["local"]["timeouts"] == 1
+
+
+def test_all_routes_failing_raises():
+    router = ModelRouter([Route("local", BrokenModel())])
+    with pytest.raises(AllRoutesFailed) as info:
+        router.generate(MESSAGES)
+    assert isinstance(info.value.__cause__, ConnectionError)
+
+
+def test_route_with_errors_is_demoted_until_cooldown():
+    router = ModelRouter([Route("local", BrokenModel()), remote()], max_error_rate=0.5, alpha=1.0, cooldown=0.2)
+    router.generate(MESSAGES)
+    routes, reason = router.plan(MESSAGES)
+    assert [r.name for r in routes] == ["remote", "local"] and reason["degraded"] == ["local"]
+    time.sleep(0.25)
+    assert [r.name for r in router.plan(MESSAGES)[0]] == ["local", "remote"]
+
+
+def test_slow_route_is_demoted():
+    local = Route("local", StubChatModel(("local",), latency=0.05))
+    router = ModelRouter([local, remote()], latency_budget=0.01, cooldown=30.0)
+    assert router.generate(MESSAGES).content == "local"
+    assert [r.name for r in router.plan(MESSAGES)[0]] == ["remote", "local"]
+    assert router.generate(MESSAGES).content == "remote"
+
+
+def test_route_with_hung_calls_is_demoted_without_waiting():
+    local = Route("local", StubChatModel(("local",), latency=0.5), timeout=0.05, max_in_flight=1)
+    router = ModelRouter([local, remote()], max_error_rate=1.0)
+    router.generate(MESSAGES)  # estoura o timeout e deixa a chamada presa no pool da rota
+    assert router.plan(MESSAGES)[1]["degraded"] == ["local"]
+    start = time.perf_counter()
+    assert router.generate(MESSAGES).content == "remote"
+    assert time.perf_counter() - start < 0.05
+    assert router.stats()["local"]["calls"] == 1
+    time.sleep(0.5)
+    assert router.stats()["local"]["in_flight"] == 0 and not router.plan(MESSAGES)[1]["degraded"]
+
+
+def test_cost_is_accounted_per_route():
+    local = Route("local", BrokenModel(), cost_per_1k_input=10.0)
+    paid = remote(cost_per_1k_input=0.5, cost_per_1k_output=1.5)
+    router = ModelRouter([local, paid])
+    for _ in range(3):
+        response = router.generate(MESSAGES)
+    usage = response.token_usage
+    stats = router.stats()
+    assert stats["remote"]["input_tokens"] == 3 * usage.input_tokens
+    assert stats["remote"]["output_tokens"] == 3 * usage.output_tokens
+    assert stats["remote"]["cost"] == pytest.approx(3 * (usage.input_tokens * 0.5 + usage.output_tokens * 1.5) / 1000)
+    # Chamadas que falharam não são cobradas
+    assert stats["local"]["cost"] == 0.0 and stats["local"]["input_tokens"] == 0
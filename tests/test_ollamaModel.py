@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from smolagents.models import ChatMessage, MessageRole
+
+from fakes import OllamaStubServer
+from ollamaModel import OllamaChatbotModel
+
+REPLY = "Thought: somar\n<code>\nfinal_answer(2 + 2)\n</code><end_code>\nObservation: isto não deve aparecer"
+
+
+@pytest.fixture
+def stub():
+    with OllamaStubServer(replies=(REPLY,), token_delay=0.01) as server:
+        yield server
+
+
+def model_for(server):
+    return OllamaChatbotModel(model_id="stub", host=server.url, verbose=False)
+
+
+def test_streamed_text_is_assembled_up_to_end_code(stub):
+    model = model_for(stub)
+    text = model.send_message([{"role": "user", "content": "quanto é 2 + 2?"}])
+    assert text == "Thought: somar\n<code>\nfinal_answer(2 + 2)\n</code>"
+    assert stub.requests[0]["body"]["options"]["stop"][0] == "<end_code>"
+
+
+def test_client_stops_at_end_code_when_server_ignores_stop():
+    with OllamaStubServer(replies=(REPLY,), token_delay=0.01, honor_stop=False) as server:
+        model = model_for(server)
+        text = model.send_message("quanto é 2 + 2?")
+        assert text.endswith("</code>")
+        assert "Observation" not in text
+        assert model.last_stats["stopped_early"] is True
+        deadline = time.monotonic() + 2
+        while not server.cancelled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.cancelled == 1
+
+
+def test_ttft_and_token_counts_are_recorded(stub):
+    model = model_for(stub)
+    model.send_message([{"role": "system", "content": "seja breve"}, {"role": "user", "content": "quanto é 2 + 2?"}])
+    stats = model.last_stats
+    assert stats["ttft_s"] is not None and 0 < stats["ttft_s"] <= stats["total_s"]
+    assert model.last_input_token_count == 7  # palavras do prompt, como conta o stub
+    assert model.last_output_token_count == stats["completion_tokens"] > 0
+    assert stats["tokens_per_s"] is not None
+
+
+def test_generate_returns_assistant_chat_message_with_usage(stub):
+    model = model_for(stub)
+    prompt = [ChatMessage(role=MessageRole.USER, content=[{"type": "text", "text": "quanto é 2 + 2?"}])]
+    message = model.generate(prompt, stop_sequences=["Observation:"])
+    assert isinstance(message, ChatMessage)
+    assert message.role == MessageRole.ASSISTANT
+    assert message.content.endswith("</code>")
+    assert message.token_usage.input_tokens == model.last_input_token_count
+    assert message.token_usage.output_tokens == model.last_output_token_count
+    assert stub.requests[0]["body"]["messages"] == [{"role": "user", "content": "quanto é 2 + 2?"}]
+
+
+def test_generate_stops_streaming_after_deadline():
+    with OllamaStubServer(replies=(REPLY,), token_delay=0.05) as server:
+        with pytest.raises(TimeoutError):
+            model_for(server).generate("quanto é 2 + 2?", deadline=time.monotonic() + 0.1)
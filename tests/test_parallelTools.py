@@ -0,0 +1,29 @@
+from smolagents import tool
+
+from parallelTools import ParallelToolExecutor
+
+
+@tool
+def echo(text: str) -> str:
+    """
+    Repete o texto.
+
+    Args:
+        text: Texto a repetir.
+    """
+    if text == "boom":
+        raise RuntimeError("falhou")
+    return text.upper()
+
+
+def test_executors_share_one_pool():
+    first = ParallelToolExecutor([echo])
+    second = ParallelToolExecutor([echo])
+    assert first._pool is second._pool
+
+
+def test_map_keeps_order_and_isolates_errors():
+    executor = ParallelToolExecutor([echo])
+    results = executor.map("echo", [{"text": "a"}, {"text": "boom"}, {"text": "c"}])
+    assert results[0] == "A" and results[2] == "C"
+    assert results[1].startswith("Error calling echo")
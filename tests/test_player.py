@@ -0,0 +1,90 @@
+import asyncio
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from player import AudioPlayer, NullSink
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds, value=0.1):
+    return np.full(int(seconds * SAMPLE_RATE), value, dtype=np.float32), SAMPLE_RATE
+
+
+def test_plays_every_chunk_in_order():
+    sink = NullSink()
+    handle = AudioPlayer(sink).play([tone(0.1, 0.1), tone(0.2, 0.2)])
+    assert handle.wait(5) is True
+    assert len(sink.audio) == int(0.3 * SAMPLE_RATE)
+    assert sink.audio[0] == pytest.approx(0.1) and sink.audio[-1] == pytest.approx(0.2)
+    assert handle.first_audio_s is not None
+    assert handle.played_s == pytest.approx(0.3)
+
+
+def test_stop_interrupts_playback():
+    player = AudioPlayer(NullSink(realtime=True), block_ms=20)
+    handle = player.play([tone(2.0)])
+    time.sleep(0.2)
+    player.stop()
+    assert handle.wait(1) is False
+    assert handle.cancelled
+    assert handle.played_s < 1.0
+
+
+def test_new_play_interrupts_the_previous_one():
+    player = AudioPlayer(NullSink(realtime=True), block_ms=20)
+    first = player.play([tone(2.0)])
+    time.sleep(0.1)
+    second = player.play([tone(0.1)])
+    assert first.wait(1) is False
+    assert second.wait(2) is True
+
+
+def test_play_without_interrupt_waits_for_the_previous_one():
+    player = AudioPlayer(NullSink(realtime=True), block_ms=20)
+    first = player.play([tone(0.2)])
+    second = player.play([tone(0.1)], interrupt=False)
+    assert first.done()
+    assert first.wait() is True
+    assert second.wait(2) is True
+
+
+def test_cancel_stops_an_endless_producer():
+    closed = []
+
+    def chunks():
+        try:
+            for _ in itertools.count():
+                yield tone(0.05)
+        finally:
+            closed.append(True)
+
+    player = AudioPlayer(NullSink(realtime=True), max_queue=2, block_ms=20)
+    handle = player.play(chunks())
+    time.sleep(0.1)
+    handle.cancel()
+    assert handle.wait(1) is False
+    deadline = time.monotonic() + 2
+    while not closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert closed
+
+
+def test_producer_error_is_raised_by_wait():
+    def chunks():
+        yield tone(0.05)
+        raise RuntimeError("falha no TTS")
+
+    handle = AudioPlayer(NullSink()).play(chunks())
+    with pytest.raises(RuntimeError, match="falha no TTS"):
+        handle.wait(2)
+
+
+def test_handle_can_be_awaited():
+    async def main():
+        return await AudioPlayer(NullSink()).play([tone(0.05)])
+
+    assert asyncio.run(main()) is True
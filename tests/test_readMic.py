@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+
+from readMic import RingBuffer, ReadMic, SyntheticSource
+
+
+def frames(start, n):
+    return np.arange(start, start + n, dtype=np.float32).reshape(-1, 1)
+
+
+def test_ring_buffer_reads_in_order_across_wraparound():
+    buf = RingBuffer(8)
+    buf.write(frames(0, 6))
+    assert buf.read(4)[:, 0].tolist() == [0, 1, 2, 3]
+    buf.write(frames(6, 5))
+    assert len(buf) == 7
+    assert buf.read(7)[:, 0].tolist() == [4, 5, 6, 7, 8, 9, 10]
+    assert buf.dropped == 0
+
+
+def test_ring_buffer_overwrites_oldest_when_full():
+    buf = RingBuffer(8)
+    buf.write(frames(0, 6))
+    buf.write(frames(6, 5))
+    assert buf.dropped == 3
+    assert buf.read(8)[:, 0].tolist() == list(range(3, 11))
+
+
+def test_ring_buffer_keeps_only_the_tail_of_an_oversized_write():
+    buf = RingBuffer(4)
+    buf.write(frames(0, 10))
+    assert buf.dropped == 6
+    assert buf.read(4)[:, 0].tolist() == [6, 7, 8, 9]
+
+
+def test_ring_buffer_read_waits_for_writer_and_returns_rest_after_close():
+    buf = RingBuffer(16)
+    timer = threading.Timer(0.05, buf.write, args=(frames(0, 4),))
+    timer.start()
+    assert buf.read(4, timeout=2)[:, 0].tolist() == [0, 1, 2, 3]
+    assert buf.read(4, timeout=0.01) is None
+
+    buf.write(frames(4, 2))
+    buf.close()
+    assert buf.read(4)[:, 0].tolist() == [4, 5]
+    assert buf.read(4) is None
+
+
+def test_gravar_em_memoria_returns_16khz_mono_without_a_file():
+    source = SyntheticSource.tone(duration=1.0, sample_rate=44100, blocksize=1024)
+    audio = ReadMic(duration=0.5, sample_rate=44100, source=source).gravar_em_memoria()
+    assert audio.dtype == np.float32
+    assert audio.ndim == 1
+    assert abs(len(audio) - 8000) <= 1
@@ -0,0 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import StubChatModel
+from responseCache import CachedModel, ResponseCache, shared_cache
+
+
+def test_cached_models_share_the_process_cache():
+    assert CachedModel(StubChatModel()).cache is CachedModel(StubChatModel()).cache is shared_cache()
+
+
+def test_stats_are_exact_under_concurrent_calls():
+    cache = ResponseCache(":memory:")
+    model = CachedModel(StubChatModel(lambda messages: messages[-1]["content"]), cache=cache)
+    prompts = [[{"role": "user", "content": f"pergunta {i % 10}"}] for i in range(200)]
+    with ThreadPoolExecutor(8) as pool:
+        replies = list(pool.map(lambda m: model(m).content, prompts))
+    assert replies == [m[0]["content"] for m in prompts]
+    assert cache.stats["hits"] + cache.stats["misses"] == 200
+    assert cache.stats["misses"] >= 10
+    assert cache.stats["stores"] == cache.stats["misses"]
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from fakes import StubAgent, StubChatModel
+from server import AgentServer, ModelScheduler, SchedulerBusy, SessionManager
+
+
+class GatedModel:
+    """Modelo que segura a primeira chamada até o gate abrir e registra a ordem das chamadas."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.order = []
+
+    def generate(self, label, **kwargs):
+        if not self.order:
+            self.gate.wait(5)
+        self.order.append(label)
+        return label
+
+    def __call__(self, messages, **kwargs):
+        return self.generate(messages[-1]["content"], **kwargs)
+
+
+def hold_slot(scheduler, model):
+    """Ocupa a única vaga do agendador com uma chamada presa no gate."""
+    future = scheduler.submit("holder", "generate", "hold")
+    while scheduler.stats()["running"] == 0:
+        time.sleep(0.001)
+    return future
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read() or b"{}")
+
+
+def test_scheduler_round_robins_between_sessions():
+    model = GatedModel()
+    scheduler = ModelScheduler(lambda: model, max_concurrency=1)
+    try:
+        hold = hold_slot(scheduler, model)
+        futures = [scheduler.submit("a", "generate", f"a{i}") for i in range(3)]
+        futures += [scheduler.submit("b", "generate", "b0"), scheduler.submit("c", "generate", "c0")]
+        model.gate.set()
+        for future in [hold, *futures]:
+            future.result(5)
+        # A sessão "a" chegou primeiro com três chamadas, mas não passa na frente das outras
+        assert model.order == ["hold", "a0", "b0", "c0", "a1", "a2"]
+    finally:
+        model.gate.set()
+        scheduler.close()
+
+
+def test_scheduler_rejects_calls_above_max_queue():
+    model = GatedModel()
+    scheduler = ModelScheduler(lambda: model, max_concurrency=1, max_queue=1)
+    try:
+        hold_slot(scheduler, model)
+        scheduler.submit("a", "generate", "queued")
+        with pytest.raises(SchedulerBusy):
+            scheduler.submit("b", "generate", "rejected")
+        assert scheduler.metrics.counters["model_calls_rejected"] == 1
+        assert scheduler.stats()["queue_depth"] == 1
+    finally:
+        model.gate.set()
+        scheduler.close()
+
+
+def test_full_queue_returns_429_with_retry_after():
+    scheduler = ModelScheduler(StubChatModel, max_concurrency=1, max_queue=0)
+    with AgentServer(SessionManager(StubAgent, scheduler), port=0) as server:
+        status, headers, body = post(server.url + "/run", {"task": "oi"})
+    assert status == 429
+    assert headers["Retry-After"] == "1"
+    assert "ocupado" in body["error"]
+
+
+def test_session_limit_returns_429_while_sessions_are_busy():
+    model = GatedModel()
+    scheduler = ModelScheduler(lambda: model, max_concurrency=1)
+    sessions = SessionManager(lambda m: StubAgent(m, steps=1), scheduler, max_sessions=1)
+    with AgentServer(sessions, port=0) as server:
+        busy = threading.Thread(target=post, args=(server.url + "/run", {"task": "longa"}))
+        busy.start()
+        while scheduler.stats()["running"] == 0:
+            time.sleep(0.001)
+        status, _, _ = post(server.url + "/sessions", {})
+        model.gate.set()
+        busy.join(5)
+    assert status == 429
+
+
+def test_session_timeout_returns_504_and_frees_the_session():
+    scheduler = ModelScheduler(lambda: StubChatModel(latency=0.3), max_concurrency=1)
+    with AgentServer(SessionManager(StubAgent, scheduler), port=0, session_timeout=0.1) as server:
+        start = time.perf_counter()
+        status, _, body = post(server.url + "/run", {"task": "oi", "session_id": "lenta"})
+        elapsed = time.perf_counter() - start
+        assert status == 504
+        assert elapsed < 0.3
+        assert server.metrics.counters["requests_timeout"] == 1
+        # O prazo pedido pelo cliente também vale, limitado pelo da sessão
+        status, _, body = post(server.url + "/run", {"task": "oi", "session_id": "lenta", "timeout": 5})
+        assert status == 504
+        assert not server.sessions.get("lenta").busy
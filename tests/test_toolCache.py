@@ -0,0 +1,91 @@
+import threading
+import time
+
+from smolagents import tool
+
+from toolCache import _RUN_ID, cached_tool, end_run, tool_cache_stats
+
+
+def test_function_receives_normalized_arguments():
+    calls = []
+
+    @cached_tool(ttl=60, normalize={"ticker": str.upper})
+    def price(ticker):
+        calls.append(ticker)
+        return f"preço de {ticker}"
+
+    assert price(" petr4.sa ") == price("PETR4.SA") == "preço de PETR4.SA"
+    assert calls == ["PETR4.SA"]
+
+
+def test_cache_wraps_a_tool_instance_without_decorating_the_function():
+    calls = []
+
+    @tool
+    def lookup(query: str) -> str:
+        """Busca.
+
+        Args:
+            query: Termo buscado.
+        """
+        calls.append(query)
+        return query.upper()
+
+    cached = cached_tool(ttl=60)(lookup)
+    assert cached is lookup
+    assert lookup(query="a  b") == lookup(query="a b") == "A B"
+    assert calls == ["a b"]
+    assert tool_cache_stats()[f"{__name__}.test_cache_wraps_a_tool_instance_without_decorating_the_function"
+                              ".<locals>.lookup"]["hits"] == 1
+
+
+def test_same_named_tools_from_different_modules_keep_separate_entries():
+    def make(module, value):
+        def get_price():
+            return value
+        get_price.__module__ = module
+        return cached_tool(ttl=60)(get_price)
+
+    first, second = make("tools_a", 1), make("tools_b", 2)
+    assert (first(), second()) == (1, 2)
+    names = [name for name in tool_cache_stats() if name.endswith(".make.<locals>.get_price")]
+    assert sorted(name.split(".")[0] for name in names) == ["tools_a", "tools_b"]
+
+
+def test_run_scope_is_per_run_and_dropped_at_the_end():
+    calls = []
+
+    @cached_tool(ttl=60, scope="run")
+    def search(query):
+        calls.append(query)
+        return query
+
+    for run_id in (1001, 1002):
+        token = _RUN_ID.set(run_id)
+        try:
+            search("x")
+            search("x")
+        finally:
+            _RUN_ID.reset(token)
+    assert calls == ["x", "x"]
+    assert search.cache.stats()["size"] == 2
+    end_run(1001)
+    assert search.cache.stats()["size"] == 1
+
+
+def test_concurrent_identical_calls_run_once():
+    calls = []
+
+    @cached_tool(ttl=60)
+    def slow(key):
+        calls.append(key)
+        time.sleep(0.2)
+        return key
+
+    threads = [threading.Thread(target=slow, args=("k",)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == ["k"]
+    assert slow.cache_flights.coalesced == 4
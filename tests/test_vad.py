@@ -0,0 +1,54 @@
+import numpy as np
+
+from readMic import ReadMic, SyntheticSource
+from vad import EnergyVAD
+
+SAMPLE_RATE = 16000
+
+
+def noise(seconds, amplitude, seed=0):
+    return np.random.default_rng(seed).normal(0, amplitude, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+
+def frames_of(vad, audio):
+    n = len(audio) // vad.frame_length
+    return [audio[i * vad.frame_length:(i + 1) * vad.frame_length] for i in range(n)]
+
+
+def test_speech_from_the_first_frame_is_detected():
+    vad = EnergyVAD(SAMPLE_RATE)
+    assert all(vad.is_speech(f) for f in frames_of(vad, noise(0.3, 0.2)))
+
+
+def test_silence_is_not_speech_and_floor_tracks_room_noise():
+    vad = EnergyVAD(SAMPLE_RATE)
+    # Ambiente bem mais ruidoso que o piso inicial: no começo conta como fala, depois vira ruído de fundo
+    decisions = [vad.is_speech(f) for f in frames_of(vad, noise(20.0, 0.01))]
+    assert not any(decisions[-50:])
+    assert vad.is_speech(frames_of(vad, noise(0.03, 0.3, seed=1))[0])
+
+
+def utterances(signal, **kwargs):
+    source = SyntheticSource(signal, sample_rate=SAMPLE_RATE, blocksize=480)
+    mic = ReadMic(sample_rate=SAMPLE_RATE, channels=1, source=source)
+    return list(mic.utterances(vad=EnergyVAD(SAMPLE_RATE), **kwargs))
+
+
+def test_endpointing_splits_utterances_on_trailing_silence():
+    quiet = 0.0005
+    signal = np.concatenate([noise(0.5, quiet), noise(0.6, 0.2, 1), noise(1.0, quiet, 2),
+                             noise(0.9, 0.2, 3), noise(1.0, quiet, 4)])
+    found = utterances(signal, silence_ms=500)
+    assert [s["ended_by"] for _, s in found] == ["silence", "silence"]
+    # A fala volta sem o silêncio final (só o pre-roll e um quadro de folga)
+    assert abs(found[0][1]["speech_s"] - 0.6) < 0.4
+    assert abs(found[1][1]["speech_s"] - 0.9) < 0.4
+
+
+def test_short_clicks_are_discarded_and_max_duration_cuts_long_speech():
+    quiet = 0.0005
+    signal = np.concatenate([noise(0.5, quiet), noise(0.06, 0.2, 1), noise(1.0, quiet, 2),
+                             noise(2.0, 0.2, 3), noise(0.5, quiet, 4)])
+    found = utterances(signal, silence_ms=300, min_speech_ms=150, max_duration=1.0)
+    assert found[0][1]["ended_by"] == "max_duration"
+    assert all(s["speech_s"] <= 1.0 + 1e-6 for _, s in found)
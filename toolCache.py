@@ -0,0 +1,189 @@
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from cache import MISSING, SingleFlight, TTLCache
+from tracing import annotate
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Caches de todas as funções decoradas, para end_run() e tool_cache_stats()
+_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+# Run do agente em andamento no contexto atual (definido por install_run_scope); None fora de um run
+_RUN_ID = contextvars.ContextVar("tool_cache_run", default=None)
+_RUN_IDS = itertools.count(1)
+
+
+def _default_normalize(value):
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _is_error(result):
+    # As tools devolvem erros como texto em vez de levantar exceções; esses resultados não são guardados
+    return isinstance(result, str) and result.startswith(("Error", "Erro"))
+
+
+def cached_tool(ttl=300, maxsize=128, scope="global", normalize=None, cache_if=None):
+    """
+    Memoização de tools, aplicada à instância criada pelo @tool (o smolagents avisa sobre decorators extras):
+
+        @tool
+        def get_stock_price(ticker: str) -> str:
+            ...
+
+        get_stock_price = cached_tool(ttl=300, normalize={"ticker": str.upper})(get_stock_price)
+
+    Parâmetros:
+     - ttl: Validade de cada resultado em segundos.
+     - maxsize: Quantidade máxima de resultados guardados (LRU).
+     - scope: "global" (vale entre runs do agente) ou "run" (entradas descartadas ao fim de cada run).
+     - normalize: {nome_do_argumento: função}; a tool recebe os argumentos já normalizados.
+     - cache_if: Função resultado -> bool que decide se o resultado é guardado. Por padrão, erros não são.
+    """
+    if scope not in ("global", "run"):
+        raise ValueError("scope deve ser 'global' ou 'run'.")
+    normalize = normalize or {}
+    cache_if = cache_if or (lambda result: not _is_error(result))
+
+    def decorator(target):
+        # Instância de Tool: o cache envolve o forward da instância
+        tool = target if hasattr(target, "forward") and hasattr(target, "inputs") else None
+        func = tool.forward if tool is not None else target
+        original = inspect.unwrap(func)
+        signature = inspect.signature(original)
+        cache = TTLCache(maxsize, ttl)
+        flights = SingleFlight()
+
+        def bind(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            for name, value in bound.arguments.items():
+                value = _default_normalize(value)
+                if name in normalize:
+                    value = normalize[name](value)
+                bound.arguments[name] = value
+            return bound
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = bind(args, kwargs)
+            args, kwargs = bound.args, bound.kwargs
+            key = json.dumps(bound.arguments, sort_keys=True, default=repr)
+            if scope == "run":
+                # Runs simultâneos (workers do batch, sessões do servidor) não veem os resultados uns dos outros
+                key = (_RUN_ID.get(), key)
+            result = cache.get(key, MISSING)
+            if result is not MISSING:
+                annotate(cache="hit")
+                return result
+            # Chamadas simultâneas com os mesmos argumentos compartilham uma única execução
+            leader = []
+
+            def call():
+                leader.append(True)
+                return func(*args, **kwargs)
+
+            result = flights.do(key, call)
+            annotate(cache="miss" if leader else "coalesced")
+            if cache_if(result):
+                cache.set(key, result)
+            return result
+
+        wrapper.cache = cache
+        wrapper.cache_scope = scope
+        wrapper.cache_flights = flights
+        with _REGISTRY_LOCK:
+            _REGISTRY[f"{original.__module__}.{original.__qualname__}"] = wrapper
+        if tool is not None:
+            tool.forward = wrapper
+            return tool
+        return wrapper
+
+    return decorator
+
+
+def current_run():
+    """Id do run do agente em andamento no contexto atual (None fora de um run instalado)."""
+    return _RUN_ID.get()
+
+
+def end_run(run_id):
+    """Descarta os resultados das tools com scope="run" guardados pelo run run_id."""
+    with _REGISTRY_LOCK:
+        wrappers = list(_REGISTRY.values())
+    for wrapper in wrappers:
+        if wrapper.cache_scope == "run":
+            wrapper.cache.remove_if(lambda key: key[0] == run_id)
+
+
+class ContextExecutor:
+    """
+    Envolve o python_executor do CodeAgent para o código do passo (e as tools) rodar com o contexto (contextvars)
+    de quem chamou o agente; o LocalPythonExecutor roda o código em uma thread nova, sem copiar o contexto.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.timeout_seconds = getattr(executor, "timeout_seconds", None)
+        if self.timeout_seconds is not None:
+            executor.timeout_seconds = None
+
+    def __getattr__(self, name):
+        return getattr(self.executor, name)
+
+    def __call__(self, code, *args, **kwargs):
+        if self.timeout_seconds is None:
+            return self.executor(code, *args, **kwargs)
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="code")
+        try:
+            future = pool.submit(contextvars.copy_context().run, self.executor, code, *args, **kwargs)
+            try:
+                return future.result(self.timeout_seconds)
+            except FuturesTimeout:
+                from smolagents.local_python_executor import ExecutionTimeoutError
+
+                raise ExecutionTimeoutError(f"Code execution exceeded the maximum execution time of "
+                                            f"{self.timeout_seconds} seconds") from None
+        finally:
+            # Como no smolagents, o código que estourou o tempo termina sozinho em segundo plano
+            pool.shutdown(wait=False)
+
+
+def install_run_scope(agent):
+    """Dá a cada agent.run() um run próprio (em uma ContextVar) nos caches de scope="run", descartado ao fim."""
+    if hasattr(agent, "python_executor") and not isinstance(agent.python_executor, ContextExecutor):
+        agent.python_executor = ContextExecutor(agent.python_executor)
+    run = agent.run
+
+    @functools.wraps(run)
+    def run_with_scope(*args, **kwargs):
+        run_id = next(_RUN_IDS)
+        token = _RUN_ID.set(run_id)
+        try:
+            return run(*args, **kwargs)
+        finally:
+            _RUN_ID.reset(token)
+            end_run(run_id)
+
+    agent.run = run_with_scope
+    return agent
+
+
+def tool_cache_stats():
+    """Acertos, erros de cache e chamadas coalescidas de cada tool decorada."""
+    with _REGISTRY_LOCK:
+        wrappers = dict(_REGISTRY)
+    return {name: {**w.cache.stats(), "coalesced": w.cache_flights.coalesced, "scope": w.cache_scope}
+            for name, w in wrappers.items()}
@@ -0,0 +1,343 @@
+import argparse
+import atexit
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from time import perf_counter
+
+from metrics import percentile
+
+
+class Span:
+    """Intervalo de tempo de uma etapa, com atributos (tokens, argumentos, cache...) e o span pai no contexto."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, tracer, kind, name, attrs):
+        self.tracer = tracer
+        self.kind = kind
+        self.name = name or kind
+        self.attrs = attrs
+        self.id = next(Span._ids)
+        self.parent = None
+        self.error = None
+        self.start = None
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        stack = self.tracer._stack.get()
+        self.parent = stack[-1].id if stack else None
+        self.tracer._stack.set(stack + (self,))
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = perf_counter()
+        stack = self.tracer._stack.get()
+        if stack and stack[-1] is self:
+            self.tracer._stack.set(stack[:-1])
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    """Coleta spans e os exporta em JSONL (um por linha) ou Chrome trace (.json, chrome://tracing ou Perfetto)."""
+
+    def __init__(self, path=None, format=None, keep=True):
+        """
+        Parâmetros:
+         - path: Arquivo de saída. Se None, o tracer fica desligado.
+         - format: "jsonl" ou "chrome". Se None, "chrome" para arquivos .json e "jsonl" para os demais.
+         - keep: Mantém os spans em memória (tracer.spans), necessário para o formato chrome.
+        """
+        self.path = path
+        self.enabled = path is not None
+        self.format = format or ("chrome" if path and path.endswith(".json") else "jsonl")
+        self.keep = keep or self.format == "chrome"
+        self.spans = []
+        # Pilha de spans abertos como tupla imutável: um contexto copiado para outra thread parte da pilha de
+        # quem o copiou, e o que ele empilha não aparece para o original
+        self._stack = contextvars.ContextVar(f"tracing_stack_{id(self)}", default=())
+        self._lock = threading.Lock()
+        self._epoch = perf_counter()
+        self._wall_epoch = time.time()
+        self._file = None
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if self.format == "jsonl":
+                self._file = open(path, "a", encoding="utf-8")
+
+    def current(self):
+        """Span aberto mais interno do contexto atual (ou um span vazio)."""
+        stack = self._stack.get()
+        return stack[-1] if stack else _NOOP
+
+    def span(self, kind, name=None, **attrs):
+        """Context manager que mede o bloco: `with tracer.span("tool", "get_stock_price", ticker="PETR4") as s:`."""
+        if not self.enabled:
+            return _NOOP
+        return Span(self, kind, name, attrs)
+
+    def record(self, kind, name, start, end, **attrs):
+        """Registra um span já medido (start e end de perf_counter()), para etapas que não cabem em um `with`."""
+        if not self.enabled:
+            return
+        span = Span(self, kind, name, attrs)
+        span.start, span.end = start, end
+        self._finish(span)
+
+    def _to_dict(self, span):
+        return {
+            "id": span.id,
+            "parent": span.parent,
+            "kind": span.kind,
+            "name": span.name,
+            "start": self._wall_epoch + (span.start - self._epoch),
+            "duration_s": span.end - span.start,
+            "thread": threading.current_thread().name,
+            "error": span.error,
+            "attrs": span.attrs,
+        }
+
+    def _finish(self, span):
+        record = self._to_dict(span)
+        with self._lock:
+            if self.keep:
+                self.spans.append(record)
+            if self._file is not None:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+    def chrome_events(self):
+        """Spans no formato de eventos completos ("ph": "X") do Chrome trace."""
+        with self._lock:
+            spans = list(self.spans)
+        threads = {}
+        events = []
+        for s in spans:
+            tid = threads.setdefault(s["thread"], len(threads) + 1)
+            args = {**s["attrs"], **({"error": s["error"]} if s["error"] else {})}
+            events.append({"name": s["name"], "cat": s["kind"], "ph": "X", "pid": os.getpid(), "tid": tid,
+                           "ts": (s["start"] - self._wall_epoch) * 1e6, "dur": s["duration_s"] * 1e6,
+                           "args": json.loads(json.dumps(args, default=str))})
+        events += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                   for name, tid in threads.items()]
+        return events
+
+    def flush(self):
+        if not self.enabled:
+            return
+        if self.format == "chrome":
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, f)
+            os.replace(tmp, self.path)
+        elif self._file is not None:
+            with self._lock:
+                self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Tracer do processo. É ligado definindo AGENT_TRACE com o arquivo de saída (ex.: traces/run.jsonl)."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(os.environ.get("AGENT_TRACE") or None)
+            atexit.register(_tracer.close)
+        return _tracer
+
+
+def set_tracer(tracer):
+    """Troca o tracer do processo (ex.: Tracer("trace.json") em um benchmark). Retorna o anterior."""
+    global _tracer
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+        return previous
+
+
+def span(kind, name=None, **attrs):
+    return get_tracer().span(kind, name, **attrs)
+
+
+def annotate(**attrs):
+    """Acrescenta atributos ao span aberto no contexto atual (ex.: cache="hit" dentro do span de uma tool)."""
+    get_tracer().current().set(**attrs)
+
+
+def _token_counts(model, response):
+    usage = getattr(response, "token_usage", None)
+    if usage is not None:
+        return usage.input_tokens, usage.output_tokens
+    return getattr(model, "last_input_token_count", None), getattr(model, "last_output_token_count", None)
+
+
+class TracedModel:
+    """Envolve o modelo do agente e registra cada geração como um span "model", com tokens e acerto de cache."""
+
+    def __init__(self, model):
+        self.model = model
+        self.step = 0
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def generate(self, messages, **kwargs):
+        return self._call(self.model.generate, messages, **kwargs)
+
+    def __call__(self, messages, **kwargs):
+        return self._call(self.model, messages, **kwargs)
+
+    def _call(self, method, messages, **kwargs):
+        self.step += 1
+        with span("model", getattr(self.model, "model_id", None) or type(self.model).__name__, step=self.step,
+                  messages=len(messages) if isinstance(messages, list) else 1) as s:
+            response = method(messages, **kwargs)
+            input_tokens, output_tokens = _token_counts(self.model, response)
+            s.set(input_tokens=input_tokens, output_tokens=output_tokens)
+            if hasattr(self.model, "last_hit"):
+                s.set(cache="hit" if self.model.last_hit else "miss")
+            stats = getattr(self.model, "last_stats", None)
+            if isinstance(stats, dict) and stats.get("ttft_s") is not None:
+                s.set(ttft_s=stats["ttft_s"])
+            return response
+
+
+class TracedExecutor:
+    """Envolve o python_executor do CodeAgent e registra cada execução de código como um span "code"."""
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    def __getattr__(self, name):
+        return getattr(self.executor, name)
+
+    def __call__(self, code, *args, **kwargs):
+        with span("code", "python_executor", lines=code.count("\n") + 1) as s:
+            result = self.executor(code, *args, **kwargs)
+            s.set(final_answer=bool(getattr(result, "is_final_answer", False)))
+            return result
+
+
+def _trace_tool(tool):
+    forward = tool.forward
+    if getattr(forward, "_traced", False):
+        # Tool compartilhada entre agentes (ex.: as do mytools) já instrumentada por outro install_tracing
+        return
+
+    @functools.wraps(forward)
+    def traced_forward(*args, **kwargs):
+        with span("tool", tool.name, args=kwargs or list(args)) as s:
+            result = forward(*args, **kwargs)
+            # As tools devolvem erros como texto em vez de levantar exceções
+            if isinstance(result, str) and result.startswith(("Error", "Erro")):
+                s.set(error_result=result[:200])
+            return result
+
+    traced_forward._traced = True
+    tool.forward = traced_forward
+
+
+def install_tracing(agent):
+    """Instrumenta o agente com spans "run", "model", "tool" (com argumentos e status do cache) e "code"."""
+    agent.model = TracedModel(agent.model)
+    for tool in getattr(agent, "tools", {}).values():
+        _trace_tool(tool)
+    if hasattr(agent, "python_executor"):
+        agent.python_executor = TracedExecutor(agent.python_executor)
+
+    run = agent.run
+
+    @functools.wraps(run)
+    def traced_run(task, *args, **kwargs):
+        agent.model.step = 0
+        with span("run", "agent.run", task=task[:200]):
+            return run(task, *args, **kwargs)
+
+    agent.run = traced_run
+    return agent
+
+
+def load_spans(path):
+    """Lê spans de um arquivo JSONL ou Chrome trace."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [{"kind": e["cat"], "name": e["name"], "duration_s": e["dur"] / 1e6,
+                     "error": e["args"].get("error"), "attrs": e["args"]}
+                    for e in json.load(f)["traceEvents"] if e.get("ph") == "X"]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(spans, by_name=False):
+    """Contagem, total, p50, p95 e máximo da duração (s) por tipo de span (ou por tipo e nome)."""
+    groups = {}
+    for s in spans:
+        key = f"{s['kind']}:{s['name']}" if by_name else s["kind"]
+        groups.setdefault(key, []).append(s)
+    summary = {}
+    for key, group in groups.items():
+        durations = [s["duration_s"] for s in group]
+        summary[key] = {
+            "count": len(group),
+            "total_s": sum(durations),
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "max": max(durations),
+            "errors": sum(1 for s in group if s.get("error") or s["attrs"].get("error_result")),
+            "cache_hits": sum(1 for s in group if s["attrs"].get("cache") in ("hit", "coalesced")),
+        }
+    return summary
+
+
+def report(summary):
+    lines = [f"{'span':<36} {'n':>6} {'total':>9} {'p50':>8} {'p95':>8} {'máx':>8} {'erros':>6} {'cache':>6}"]
+    for key, s in sorted(summary.items(), key=lambda item: -item[1]["total_s"]):
+        lines.append(f"{key[:36]:<36} {s['count']:>6} {s['total_s']:9.3f} {s['p50']:8.3f} {s['p95']:8.3f} "
+                     f"{s['max']:8.3f} {s['errors']:>6} {s['cache_hits']:>6}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo de um arquivo de trace (JSONL ou Chrome trace).")
+    parser.add_argument("trace_file")
+    parser.add_argument("--by-name", action="store_true", help="Agrupa por tipo e nome (ex.: tool:get_stock_price).")
+    args = parser.parse_args()
+    print(report(summarize(load_spans(args.trace_file), by_name=args.by_name)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:  # dependência opcional
+    webrtcvad = None
+
+
+class EnergyVAD:
+    """Detector de voz por energia: fala é um quadro margin_db acima do piso de ruído adaptativo."""
+
+    def __init__(self, sample_rate, frame_ms=30, margin_db=10.0, min_level_db=-50.0, noise_alpha=0.05,
+                 initial_noise_db=-60.0):
+        """
+        Parâmetros:
+         - sample_rate: Taxa de amostragem dos quadros recebidos.
+         - frame_ms: Duração de cada quadro analisado, em milissegundos.
+         - margin_db: Quanto acima do piso de ruído a energia precisa estar para contar como fala.
+         - min_level_db: Energia mínima absoluta para contar como fala (evita disparos em silêncio digital).
+         - noise_alpha: Velocidade de adaptação do piso de ruído (0 a 1).
+         - initial_noise_db: Piso de ruído inicial, em dBFS.
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_level_db = min_level_db
+        self.noise_alpha = noise_alpha
+        self.initial_noise_db = initial_noise_db
+        self.noise_db = initial_noise_db
+
+    def reset(self):
+        self.noise_db = self.initial_noise_db
+
+    def is_speech(self, frame):
+        frame = np.asarray(frame, dtype=np.float32)
+        if frame.ndim > 1:
+            frame = frame.mean(axis=1)
+        level_db = 10 * np.log10(np.mean(frame ** 2) + 1e-12)
+        speech = level_db > max(self.noise_db + self.margin_db, self.min_level_db)
+        # Nos quadros de fala o piso sobe bem devagar: corrige um ambiente mais ruidoso que o piso inicial
+        alpha = self.noise_alpha if not speech else self.noise_alpha / 20
+        self.noise_db += alpha * (level_db - self.noise_db)
+        return bool(speech)
+
+
+class WebRTCVAD:
+    """Adaptador para o webrtcvad (opcional). Aceita apenas 8, 16, 32 ou 48 kHz e quadros de 10, 20 ou 30 ms."""
+
+    SUPPORTED_RATES = (8000, 16000, 32000, 48000)
+
+    def __init__(self, sample_rate, frame_ms=30, aggressiveness=2):
+        if webrtcvad is None:
+            raise ImportError("webrtcvad não está instalado. Use 'pip install webrtcvad' ou o EnergyVAD.")
+        if sample_rate not in self.SUPPORTED_RATES or frame_ms not in (10, 20, 30):
+            raise ValueError(f"webrtcvad não suporta {sample_rate} Hz com quadros de {frame_ms} ms.")
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def reset(self):
+        pass
+
+    def is_speech(self, frame):
+        frame = np.asarray(frame, dtype=np.float32)
+        if frame.ndim > 1:
+            frame = frame.mean(axis=1)
+        pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        return self._vad.is_speech(pcm, self.sample_rate)
+
+
+def make_vad(sample_rate, frame_ms=30, backend="auto"):
+    """
+    Cria o detector de voz. backend: "energy", "webrtc" ou "auto" (webrtc quando instalado e compatível com a taxa).
+    """
+    if backend == "webrtc":
+        return WebRTCVAD(sample_rate, frame_ms)
+    if backend == "auto" and webrtcvad is not None and sample_rate in WebRTCVAD.SUPPORTED_RATES:
+        return WebRTCVAD(sample_rate, frame_ms)
+    return EnergyVAD(sample_rate, frame_ms)
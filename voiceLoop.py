@@ -0,0 +1,156 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from metrics import MetricsRegistry
+
+# Marca o fim do fluxo entre as etapas
+END = None
+
+STAGES = ("capture", "stt", "agent", "tts", "playback")
+# Etapas que dependem só do processamento (captura e reprodução acompanham a duração das falas)
+PROCESSING_STAGES = ("stt", "agent", "tts")
+
+
+class VoiceLoop:
+    """
+    Loop de voz contínuo (captura -> transcrição -> agente -> síntese -> reprodução), com uma tarefa asyncio
+    por etapa ligada à seguinte por uma fila limitada, para etapas de turnos diferentes se sobreporem.
+    """
+
+    def __init__(self, agent, read_mic, transcribe, synthesize, player, queue_size=2, barge_in=True,
+                 metrics=None, capture_kwargs=None, barge_in_min_s=0.5, barge_in_margin_db=0.0):
+        """
+        Parâmetros:
+         - agent: Objeto com run(texto) (ex.: CodeAgent).
+         - read_mic: Instância de ReadMic; as falas vêm de read_mic.utterances().
+         - transcribe: Função audio -> texto (ex.: STT.transcribe_audio).
+         - synthesize: Função texto -> iterável de (audio, sample_rate) (ex.: TTS.synthesize_sentences).
+         - player: AudioPlayer usado na reprodução.
+         - queue_size: Capacidade das filas entre etapas (backpressure).
+         - barge_in: Se True, uma nova fala interrompe a resposta que estiver tocando.
+         - metrics: MetricsRegistry onde as latências por etapa são registradas.
+         - capture_kwargs: Argumentos repassados a read_mic.utterances().
+         - barge_in_min_s / barge_in_margin_db: Duração e nível acima do áudio tocado para uma fala não ser eco.
+        """
+        self.agent = agent
+        self.read_mic = read_mic
+        self.transcribe = transcribe
+        self.synthesize = synthesize
+        self.player = player
+        self.queue_size = queue_size
+        self.barge_in = barge_in
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.capture_kwargs = capture_kwargs or {}
+        self.barge_in_min_s = barge_in_min_s
+        self.barge_in_margin_db = barge_in_margin_db
+        self._executors = {}
+        self._stopping = False
+
+    async def _offload(self, stage, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executors[stage], func, *args)
+
+    def _observe(self, stage, start):
+        self.metrics.observe(stage, perf_counter() - start)
+
+    def _is_echo(self, stats):
+        # A fala começou antes do fim da reprodução: pode ser o áudio do TTS voltando pelo microfone
+        handle = getattr(self.player, "current", None)
+        if handle is None or handle.level_db is None:
+            return False
+        speech_start = perf_counter() - stats["capture_s"]
+        if handle.ended_at is not None and handle.ended_at < speech_start:
+            return False
+        return (stats["speech_s"] < self.barge_in_min_s
+                or stats["level_db"] < handle.level_db + self.barge_in_margin_db)
+
+    async def _capture(self, out, max_turns):
+        utterances = self.read_mic.utterances(**self.capture_kwargs)
+        turns = 0
+        try:
+            while not self._stopping and (max_turns is None or turns < max_turns):
+                item = await self._offload("capture", next, utterances, END)
+                if item is END:
+                    break
+                audio, stats = item
+                if self._is_echo(stats):
+                    # Eco (ou fala curta e baixa demais) durante a resposta: não interrompe nem vira um novo turno
+                    self.metrics.incr("echo_rejected")
+                    continue
+                if self.barge_in:
+                    self.player.stop()
+                turns += 1
+                self.metrics.observe("capture", stats["capture_s"])
+                await out.put({"turn": turns, "audio": audio, "speech_end": perf_counter()})
+        finally:
+            await self._offload("capture", utterances.close)
+            await out.put(END)
+
+    async def _stt(self, inp, out):
+        while (turn := await inp.get()) is not END:
+            start = perf_counter()
+            turn["text"] = await self._offload("stt", self.transcribe, turn.pop("audio"))
+            self._observe("stt", start)
+            print(f"[{turn['turn']}] Você: {turn['text']}")
+            await out.put(turn)
+        await out.put(END)
+
+    async def _agent(self, inp, out):
+        while (turn := await inp.get()) is not END:
+            start = perf_counter()
+            try:
+                # agent.run é resolvido no executor: um agente ainda sendo montado (lazy.Deferred) não trava o loop
+                response = await self._offload("agent", lambda text: self.agent.run(text), turn["text"])
+            except Exception as e:
+                self.metrics.incr("agent_errors")
+                response = f"Erro ao processar o comando: {e}"
+            self._observe("agent", start)
+            # Verifica se é uma lista e junta os elementos com quebra de linha
+            turn["response"] = "\n".join(map(str, response)) if isinstance(response, list) else str(response)
+            print(f"[{turn['turn']}] Agente: {turn['response']}")
+            await out.put(turn)
+        await out.put(END)
+
+    async def _speak(self, inp):
+        while (turn := await inp.get()) is not END:
+            start = perf_counter()
+            # A síntese roda na thread de alimentação do player, frase a frase
+            handle = self.player.play(self.synthesize(turn["response"]))
+            completed = await handle
+            if handle.first_audio_s is not None:
+                self.metrics.observe("tts", handle.first_audio_s)
+                # Do fim da fala do usuário até o primeiro áudio da resposta
+                self.metrics.observe("turn", start + handle.first_audio_s - turn["speech_end"])
+            self._observe("playback", start)
+            self.metrics.incr("turns_completed" if completed else "turns_interrupted")
+
+    async def run(self, max_turns=None):
+        """Roda o loop até max_turns falas (ou indefinidamente) e retorna o MetricsRegistry."""
+        self._stopping = False
+        self._executors = {name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"voice-{name}")
+                           for name in ("capture", "stt", "agent")}
+        to_stt = asyncio.Queue(self.queue_size)
+        to_agent = asyncio.Queue(self.queue_size)
+        to_tts = asyncio.Queue(self.queue_size)
+        try:
+            await asyncio.gather(
+                self._capture(to_stt, max_turns),
+                self._stt(to_stt, to_agent),
+                self._agent(to_agent, to_tts),
+                self._speak(to_tts),
+            )
+        finally:
+            for executor in self._executors.values():
+                executor.shutdown(wait=False)
+        return self.metrics
+
+    def stop(self):
+        """Pede o fim do loop após a fala em captura."""
+        self._stopping = True
+
+    def bottleneck(self):
+        """Etapa de processamento com maior latência média até agora (a que limita o tempo de cada turno)."""
+        snap = self.metrics.snapshot()["histograms"]
+        stages = {name: s["mean"] for name, s in snap.items() if name in PROCESSING_STAGES and s["mean"] is not None}
+        return max(stages, key=stages.get) if stages else None